@@ -0,0 +1,624 @@
+# benchmarks.py
+
+# this file holds small stand-alone benchmarks for the PlayWise data structures
+# run it directly: python benchmarks.py
+# the numbers quoted in documentation/PlayWise_Design.md come from these functions
+
+import contextlib
+import gc
+import heapq
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from journal import Journal
+from play_analytics import PlayAnalytics
+from play_order import ShuffledOrder
+from playback_history import PlaybackHistory
+from playlist_engine import Playlist, SongNode
+from song_lookup import SongLookup
+from song_registry import SongRegistry
+from rating_store import RatingStore
+import rating_store
+import fuzzy_search
+import pinned_songs
+import sort_utils
+
+# helper that measures how many bytes a builder function allocates (and keeps alive)
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current
+
+# helper that times a function call and returns (seconds, result)
+def measure_time(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+# helper that produces n fake songs, artists repeat the way they do in a real catalog
+def fake_songs(n, artists=5000):
+    for i in range(n):
+        # the f-strings build fresh string objects every time, like reading rows from a file
+        yield f"Song {i}", f"Artist {i % artists}", 120 + i % 300
+
+# helper that makes an empty playlist and lookup sharing a fresh registry, so the songs of
+# one benchmark aren't kept alive by the default registry after it is done
+def library():
+    registry = SongRegistry()
+    return Playlist("bench", registry), SongLookup(registry)
+
+# ======================
+# SONG NODE MEMORY FOOTPRINT
+# ======================
+
+# the same fields as SongNode, kept in a per-song __dict__ (the layout before __slots__)
+class DictSongNode:
+    def __init__(self, title, artist, duration):
+        self.id = None
+        self.title = title
+        self.artist = sys.intern(artist)
+        self.duration = duration
+        self.pinned = False
+        self.prev = None
+        self.next = None
+        self.left = None
+        self.right = None
+        self.parent = None
+        self.priority = random.random()
+        self.count = 1
+
+# SongNode without interning, so every song holds its own copy of the artist string
+class UninternedSongNode(SongNode):
+    __slots__ = ()
+
+    def __init__(self, title, artist, duration):
+        SongNode.__init__(self, title, artist, duration)
+        self.artist = artist
+
+# compares the bytes per song of dict-based and slotted nodes with the same fields,
+# and of slotted nodes with and without interned artists
+def benchmark_song_memory(n=1_000_000):
+    def build(node_class):
+        def run():
+            return [node_class(title, artist, duration) for title, artist, duration in fake_songs(n)]
+        return run
+
+    dict_bytes = measure_memory(build(DictSongNode))
+    plain_bytes = measure_memory(build(UninternedSongNode))
+    slotted_bytes = measure_memory(build(SongNode))
+
+    print(f"\nSong node memory for {n:,} songs (12 fields each)")
+    print("-" * 40)
+    print(f"dict-based nodes     : {dict_bytes / 2**20:8.1f} MiB ({dict_bytes / n:.0f} B/song)")
+    print(f"slotted, own artists : {plain_bytes / 2**20:8.1f} MiB ({plain_bytes / n:.0f} B/song)")
+    print(f"slotted, interned    : {slotted_bytes / 2**20:8.1f} MiB ({slotted_bytes / n:.0f} B/song)")
+
+# ======================
+# BULK INGEST
+# ======================
+
+# compares calling add_song + lookup.add_song per row with one add_songs call
+def benchmark_bulk_ingest(n=1_000_000):
+    rows = [(title, artist, f"{duration // 60}:{duration % 60:02d}") for title, artist, duration in fake_songs(n)]
+
+    def one_by_one():
+        playlist, lookup = library()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for title, artist, duration in rows:
+                lookup.add_song(playlist.add_song(title, artist, duration))
+
+    def bulk():
+        playlist, lookup = library()
+        with contextlib.redirect_stdout(io.StringIO()):
+            playlist.add_songs(iter(rows), lookup=lookup)
+
+    single_time, _ = measure_time(one_by_one)
+    bulk_time, _ = measure_time(bulk)
+
+    print(f"\nIngest of {n:,} songs (with lookup sync)")
+    print("-" * 40)
+    print(f"add_song loop : {single_time:6.2f} s")
+    print(f"add_songs     : {bulk_time:6.2f} s")
+
+# ======================
+# MERGE SORT
+# ======================
+
+# helper that builds a shuffled playlist of n songs without printing
+def shuffled_playlist(n, seed=7):
+    rows = [(title, artist, f"{duration // 60}:{duration % 60:02d}") for title, artist, duration in fake_songs(n)]
+    random.Random(seed).shuffle(rows)
+    playlist = Playlist("bench", SongRegistry())
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs(rows)
+    return playlist
+
+# compares the iterative bottom-up merge sort with the old recursive one
+# the recursive version only works below the recursion limit, so it is timed on a small list
+def benchmark_merge_sort(small=900, large=1_000_000):
+    print("\nMerge sort by title (linked list)")
+    print("-" * 40)
+
+    for name, sort in (("recursive", sort_utils.merge_sort_recursive), ("bottom-up", sort_utils.merge_sort)):
+        repeats = 200
+        total = 0.0
+        for _ in range(repeats):
+            playlist = shuffled_playlist(small)
+            elapsed, _ = measure_time(sort, playlist.head, 'title')
+            total += elapsed
+        print(f"{name:<10} n={small:<9,} : {total / repeats * 1000:8.2f} ms")
+
+    playlist = shuffled_playlist(large)
+    try:
+        sort_utils.merge_sort_recursive(shuffled_playlist(5000).head, 'title')
+        print("recursive  n=5,000     : ok")
+    except RecursionError:
+        print(f"recursive  n=5,000     : RecursionError (limit {sys.getrecursionlimit()})")
+    elapsed, _ = measure_time(sort_utils.merge_sort, playlist.head, 'title')
+    print(f"bottom-up  n={large:<9,} : {elapsed:8.2f} s")
+
+# compares the three sort_playlist algorithms on the same shuffled playlist
+def benchmark_sort_algorithms(n=200_000):
+    print(f"\nsort_playlist by title, {n:,} songs")
+    print("-" * 40)
+    for algorithm in ('merge', 'quick', 'timsort'):
+        playlist = shuffled_playlist(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, _ = measure_time(sort_utils.sort_playlist, playlist, 'title', algorithm)
+        print(f"{algorithm:<8}: {elapsed:6.2f} s")
+
+# ======================
+# RATING AGGREGATION
+# ======================
+
+# times compaction and aggregation of m per-user ratings over a catalog of song objects
+def benchmark_rating_aggregation(m=10_000_000, songs=100_000, users=1_000_000):
+    if rating_store.np is None:
+        print("\nRating aggregation benchmark needs numpy, skipped.")
+        return
+    np = rating_store.np
+
+    store = RatingStore()
+    indexes = [store.register_song(SongNode(title, artist, duration)) for title, artist, duration in fake_songs(songs)]
+    rng = np.random.default_rng(3)
+    store.add_ratings(rng.integers(0, users, m), rng.integers(0, len(indexes), m), rng.integers(1, 6, m))
+
+    compact_time, _ = measure_time(store.compact)
+    aggregate_time, aggregates = measure_time(store.aggregate)
+
+    print(f"\nRating aggregation, {len(store):,} ratings over {songs:,} songs")
+    print("-" * 40)
+    print(f"compact (dedupe user/song) : {compact_time:6.2f} s")
+    print(f"aggregate (count/mean/bayes): {aggregate_time:6.3f} s")
+    print(f"global mean {aggregates.global_mean:.3f}, prior weight {aggregates.prior_weight:.1f}")
+
+# ======================
+# AUTOCOMPLETE
+# ======================
+
+# compares prefix queries on the sorted prefix index with a linear scan over song_map
+def benchmark_autocomplete(n=1_000_000, queries=200, k=10):
+    playlist, lookup = library()
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs(((title, artist, "3:00") for title, artist, _ in fake_songs(n)), lookup=lookup)
+    prefixes = [f"song {random.Random(i).randrange(n)}"[:8] for i in range(queries)]
+
+    def linear_scan(prefix):
+        matches = sorted(key for key in lookup.song_map if key.startswith(prefix))
+        return [lookup.get(key) for key in matches[:k]]
+
+    build_time, _ = measure_time(lookup.autocomplete, "warm up", k)
+    index_time, _ = measure_time(lambda: [lookup.autocomplete(prefix, k) for prefix in prefixes])
+    scan_time, _ = measure_time(lambda: [linear_scan(prefix) for prefix in prefixes[:10]])
+
+    print(f"\nAutocomplete top-{k}, {n:,} titles")
+    print("-" * 40)
+    print(f"prefix index build (once) : {build_time:8.2f} s")
+    print(f"prefix index per query    : {index_time / queries * 1000:8.3f} ms")
+    print(f"linear scan per query     : {scan_time / 10 * 1000:8.1f} ms")
+
+# compares lookup.query (smallest index first) with a walk over the whole playlist
+def benchmark_query(n=1_000_000, queries=100):
+    playlist, lookup = library()
+    rows = ((title, artist, f"{duration // 60}:{duration % 60:02d}") for title, artist, duration in fake_songs(n))
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs(rows, lookup=lookup)
+    rng = random.Random(5)
+    cases = [(f"Artist {rng.randrange(5000)}", 180 + rng.randrange(60), 240 + rng.randrange(60)) for _ in range(queries)]
+
+    def walk(artist, low, high):
+        artist = artist.lower()
+        return [song for song in playlist if song.artist.lower() == artist and low <= song.duration <= high]
+
+    build_time, _ = measure_time(lookup.query, min_duration=0)
+    artist_time, _ = measure_time(lambda: [lookup.query(artist=a, min_duration=lo, max_duration=hi) for a, lo, hi in cases])
+    range_time, _ = measure_time(lambda: [lookup.query(min_duration=lo, max_duration=lo + 1) for _, lo, _ in cases])
+    walk_time, _ = measure_time(lambda: [walk(*case) for case in cases[:3]])
+
+    print(f"\nQuery artist + duration range, {n:,} songs")
+    print("-" * 40)
+    print(f"duration index build (once)  : {build_time:8.2f} s")
+    print(f"query, artist + range        : {artist_time / queries * 1000:8.3f} ms")
+    print(f"query, 2-second range only   : {range_time / queries * 1000:8.3f} ms")
+    print(f"playlist walk                : {walk_time / 3 * 1000:8.1f} ms")
+
+# ======================
+# PLAYBACK HISTORY
+# ======================
+
+# compares an unbounded list of song ids with the ring buffer that spills to disk
+def benchmark_playback_history(n=1_000_000, capacity=10_000):
+    rng = random.Random(9)
+    song_ids = [rng.randrange(100_000) for _ in range(n)]
+
+    def unbounded():
+        stack = []
+        for song_id in song_ids:
+            stack.append(song_id)
+        return stack
+
+    def ring():
+        history = PlaybackHistory(SongRegistry(), capacity)
+        for song_id in song_ids:
+            history.record_play(song_id)
+        return history
+
+    list_bytes = measure_memory(unbounded)
+    ring_bytes = measure_memory(ring)
+    ring_time, history = measure_time(ring)
+    with contextlib.redirect_stdout(io.StringIO()):
+        page_time, _ = measure_time(history.show_history, n - 20, 20)
+        undo_time, _ = measure_time(lambda: [history.undo_last_play() for _ in range(capacity)])
+    history.close()
+
+    print(f"\nPlayback history, {n:,} plays (ring of {capacity:,})")
+    print("-" * 40)
+    print(f"unbounded list memory   : {list_bytes / 2**20:8.1f} MiB")
+    print(f"ring buffer memory      : {ring_bytes / 2**20:8.1f} MiB (older plays on disk)")
+    print(f"record_play             : {ring_time / n * 1e6:8.2f} us per play")
+    print(f"oldest page (20 plays)  : {page_time * 1000:8.2f} ms")
+    print(f"undo, incl. disk reads  : {undo_time / capacity * 1e6:8.2f} us per undo")
+
+# compares scanning the whole history against the binary searches and per-song play chains,
+# on a history that is mostly on disk (one play every 3 minutes, 1000 songs)
+def benchmark_history_queries(n=1_000_000, songs=1000, queries=200):
+    rng = random.Random(10)
+    playlist, _ = library()
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs((f"Song {i}", f"Artist {i % 50}", "3:00") for i in range(songs))
+    history = PlaybackHistory(playlist.registry)
+    start = 1_700_000_000.0
+    for i in range(n):
+        history.record_play(rng.randrange(songs), start + 180 * i)
+    times = [start + rng.uniform(0, 180 * n) for _ in range(queries)]
+    targets = [rng.randrange(songs) for _ in range(queries)]
+
+    def scan_at(t):
+        for song_id, timestamp in history.entries():
+            if timestamp <= t:
+                return song_id
+
+    def scan_last(song_id, k):
+        return [timestamp for played, timestamp in history.entries() if played == song_id][:k]
+
+    scan_time, _ = measure_time(lambda: [scan_at(t) for t in times[:5]])
+    at_time, _ = measure_time(lambda: [history.playing_at(t) for t in times])
+    range_time, _ = measure_time(lambda: [list(history.plays_between(t, t + 3600)) for t in times])
+    scan_last_time, _ = measure_time(lambda: [scan_last(song_id, 10) for song_id in targets[:5]])
+    last_time, _ = measure_time(lambda: [list(history.last_plays(song_id, 10)) for song_id in targets])
+    history.close()
+
+    print(f"\nHistory queries, {n:,} plays ({history.spilled:,} on disk)")
+    print("-" * 40)
+    print(f"playing at T, scan      : {scan_time / 5 * 1000:8.2f} ms per query")
+    print(f"playing at T, bisect    : {at_time / queries * 1000:8.3f} ms per query")
+    print(f"plays in a 1 hour range : {range_time / queries * 1000:8.3f} ms per query")
+    print(f"last 10 plays, scan     : {scan_last_time / 5 * 1000:8.2f} ms per query")
+    print(f"last 10 plays, chain    : {last_time / queries * 1000:8.3f} ms per query")
+
+# ======================
+# PLAY ANALYTICS
+# ======================
+
+# feeds a skewed stream of plays (a few songs are played far more often) into the analytics,
+# one play at a time and in batches, and compares top-k with counting the whole history
+def benchmark_play_analytics(n=1_000_000, songs=100_000, batch=50_000, k=10):
+    rng = random.Random(11)
+    weights = [1 / (i + 1) for i in range(songs)]
+    song_ids = rng.choices(range(songs), weights, k=n)
+    timestamps = [1_700_000_000.0 + i for i in range(n)]
+
+    def one_by_one(mode):
+        analytics = PlayAnalytics(SongRegistry(), mode)
+        record = analytics.record
+        for song_id, timestamp in zip(song_ids, timestamps):
+            record(song_id, timestamp)
+        return analytics
+
+    def batched(mode):
+        analytics = PlayAnalytics(SongRegistry(), mode)
+        for i in range(0, n, batch):
+            analytics.record_many(song_ids[i:i + batch], timestamps[i:i + batch])
+        return analytics
+
+    single_time, exact = measure_time(one_by_one, "exact")
+    batch_time, _ = measure_time(batched, "exact")
+    sketch_single_time, _ = measure_time(one_by_one, "space_saving")
+    sketch_batch_time, sketch = measure_time(batched, "space_saving")
+    scan_time, _ = measure_time(lambda: Counter(song_ids).most_common(k))
+    top_time, _ = measure_time(lambda: [exact.top_played(k) for _ in range(10)])
+    trending_time, _ = measure_time(lambda: [exact.top_trending(k, timestamps[-1]) for _ in range(10)])
+    exact_top = [song_id for song_id, _ in heapq.nlargest(k, exact.counts.items(), key=lambda item: item[1])]
+    sketch_top = [song_id for song_id, _ in heapq.nlargest(k, sketch.counts.items(), key=lambda item: item[1])]
+
+    print(f"\nPlay analytics, {n:,} plays over {songs:,} songs (batches of {batch:,})")
+    print("-" * 40)
+    print(f"exact, one at a time    : {n / single_time:12,.0f} plays/s")
+    print(f"exact, batched          : {n / batch_time:12,.0f} plays/s")
+    print(f"space-saving, one/time  : {n / sketch_single_time:12,.0f} plays/s")
+    print(f"space-saving, batched   : {n / sketch_batch_time:12,.0f} plays/s ({len(sketch.counts):,} counters)")
+    print(f"top {k}, counting history: {scan_time * 1000:8.1f} ms")
+    print(f"top {k}, from counters   : {top_time / 10 * 1000:8.1f} ms (trending {trending_time / 10 * 1000:.1f} ms)")
+    print(f"space-saving top {k} exact: {sketch_top == exact_top}")
+
+# ======================
+# SHUFFLE
+# ======================
+
+# this is how PlayWise shuffled before: the data of the unpinned songs was shuffled and copied
+# into the nodes, so every node changed its content instead of its position
+def field_copy_shuffle(playlist, seed=None):
+    unpinned_nodes = [current for current in playlist if not current.pinned]
+    shuffled = [(node.title, node.artist, node.duration) for node in unpinned_nodes]
+    random.Random(seed).shuffle(shuffled)
+    with playlist.batch():
+        for current, (title, artist, duration) in zip(unpinned_nodes, shuffled):
+            playlist.update_song(current, title, artist, duration)
+
+# compares shuffling by copying song fields with relinking the nodes, with 1% of the songs pinned
+def benchmark_shuffle(n=1_000_000, pinned=0.01):
+    playlist, lookup = library()
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs(((title, artist, "3:00") for title, artist, _ in fake_songs(n)), lookup=lookup)
+    playlist.subscribe(lookup.playlist_changed)
+    rng = random.Random(13)
+    for index in rng.sample(range(n), int(n * pinned)):
+        playlist.set_pinned(playlist.get(index))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        copy_time, _ = measure_time(field_copy_shuffle, playlist, 1)
+        relink_time, _ = measure_time(pinned_songs.shuffle_with_pins, playlist, 1)
+
+    print(f"\nShuffle, {n:,} songs ({int(n * pinned):,} pinned, lookup subscribed)")
+    print("-" * 40)
+    print(f"copy song fields        : {copy_time:8.2f} s")
+    print(f"relink nodes            : {relink_time:8.2f} s")
+
+# compares shuffling the whole playlist with the lazy shuffled play order, for radio-style
+# playback that only needs the next songs (1% pinned, the first `played` songs of the cycle)
+def benchmark_play_order(n=1_000_000, played=100_000, pinned=0.01):
+    playlist, _ = library()
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs((f"Song {i}", f"Artist {i % 5000}", "3:00") for i in range(n))
+    rng = random.Random(14)
+    for index in rng.sample(range(n), int(n * pinned)):
+        playlist.set_pinned(playlist.get(index))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        shuffle_time, _ = measure_time(pinned_songs.shuffle_with_pins, playlist, 1)
+
+    print(f"\nShuffled play order, {n:,} songs ({int(n * pinned):,} pinned), first {played:,} songs")
+    print("-" * 40)
+    print(f"shuffle the playlist    : {shuffle_time:8.2f} s before the first song")
+    for method in ("fisher_yates", "feistel"):
+        order = ShuffledOrder(playlist, 1, method)
+        first_time, _ = measure_time(next, order)
+        play_time, _ = measure_time(lambda: [next(order) for _ in range(played - 1)])
+
+        # memory held by the iterator itself after the same number of songs
+        order = ShuffledOrder(playlist, 1, method)
+        tracemalloc.start()
+        for _ in range(played):
+            next(order)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{method:<13} first song: {first_time * 1000:6.2f} ms, then {play_time / (played - 1) * 1e6:5.2f} us "
+              f"per song, {memory / 2**20:5.1f} MiB")
+
+# helper that counts songs closer than `gap` songs to the previous song by the same artist
+def artist_gap_violations(playlist, gap):
+    last = {}
+    violations = 0
+    for position, song in enumerate(playlist):
+        if position - last.get(song.artist, -gap - 1) <= gap:
+            violations += 1
+        last[song.artist] = position
+    return violations
+
+# helper that returns how far the running average duration strays from the overall average
+def duration_drift(playlist, skip=100):
+    durations = [song.duration for song in playlist]
+    average = sum(durations) / len(durations)
+    total = 0
+    drift = 0.0
+    for position, duration in enumerate(durations, 1):
+        total += duration
+        if position >= skip:
+            drift = max(drift, abs(total / position - average))
+    return drift
+
+# compares the plain shuffle with the smart shuffle on a catalog where a few artists have
+# many songs (1% pinned, at least 3 songs between two songs by the same artist)
+def benchmark_smart_shuffle(n=1_000_000, artists=5000, gap=3, pinned=0.01):
+    rng = random.Random(15)
+    weights = [1 / (i + 1) for i in range(artists)]
+    rows = [(f"Song {i}", f"Artist {artist}", f"{rng.randint(1, 9)}:{rng.randint(0, 59):02d}")
+            for i, artist in enumerate(rng.choices(range(artists), weights, k=n))]
+    playlist, _ = library()
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs(rows)
+    for index in rng.sample(range(n), int(n * pinned)):
+        playlist.set_pinned(playlist.get(index))
+
+    print(f"\nSmart shuffle, {n:,} songs by {artists:,} artists ({int(n * pinned):,} pinned, gap {gap})")
+    print("-" * 40)
+    with contextlib.redirect_stdout(io.StringIO()):
+        plain_time, _ = measure_time(pinned_songs.shuffle_with_pins, playlist, 1)
+    print(f"plain shuffle           : {plain_time:6.2f} s, {artist_gap_violations(playlist, gap):,} songs too close, "
+          f"average drifts {duration_drift(playlist):.1f} s")
+    for balance in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            smart_time, _ = measure_time(pinned_songs.smart_shuffle, playlist, gap, balance, 1)
+        label = "smart + durations" if balance else "smart shuffle"
+        print(f"{label:<24}: {smart_time:6.2f} s, {artist_gap_violations(playlist, gap):,} songs too close, "
+              f"average drifts {duration_drift(playlist):.1f} s")
+
+# ======================
+# JOURNAL
+# ======================
+
+# measures how fast changes can be journaled with group commit against one fsync per change,
+# and how long a restart takes after many logged edits, with and without snapshots
+def benchmark_journal(songs=1000, plays=200_000, synced=2000, edits=500_000):
+    directory = tempfile.mkdtemp()
+    rng = random.Random(12)
+
+    def session(path, **options):
+        playlist, _ = library()
+        history = PlaybackHistory(playlist.registry)
+        journal = Journal(os.path.join(directory, path), playlist, history, **options)
+        journal.open()
+        return playlist, history, journal
+
+    def play(count, grouped):
+        playlist, history, journal = session(f"plays-{count}")
+        playlist.add_songs((f"Song {i}", f"Artist {i % 50}", "3:00") for i in range(songs))
+        start = time.perf_counter()
+        with journal.grouped() if grouped else contextlib.nullcontext():
+            for _ in range(count):
+                history.record_play(rng.randrange(songs))
+        journal.close()
+        history.close()
+        return time.perf_counter() - start
+
+    def edit(path, **options):
+        playlist, history, journal = session(path, **options)
+        playlist.add_songs((f"Song {i}", f"Artist {i % 50}", "3:00") for i in range(songs))
+        with journal.grouped():
+            for i in range(edits):
+                if i % 4:
+                    playlist.move_song(rng.randrange(songs), rng.randrange(songs))
+                else:
+                    playlist.update_song(playlist.get(rng.randrange(songs)), title=f"Song {i}")
+        journal.close()
+        history.close()
+
+    def restart(path):
+        playlist, history, journal = session(path)
+        journal.close()
+        history.close()
+        return playlist.size
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            grouped_time = play(plays, grouped=True)
+            synced_time = play(synced, grouped=False)
+            edit("no-snapshots", compact_bytes=None)
+            edit("snapshots")
+            full_time, _ = measure_time(restart, "no-snapshots")
+            snapshot_time, _ = measure_time(restart, "snapshots")
+        full_size = os.path.getsize(os.path.join(directory, "no-snapshots"))
+        snapshot_size = sum(os.path.getsize(os.path.join(directory, "snapshots" + suffix))
+                            for suffix in ("", ".snapshot"))
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"\nJournal ({songs:,} songs)")
+    print("-" * 40)
+    print(f"plays, grouped()        : {plays / grouped_time:12,.0f} per second")
+    print(f"plays, fsync each       : {synced / synced_time:12,.0f} per second")
+    print(f"restart after {edits:,} edits, journal only : {full_time:6.2f} s ({full_size / 2**20:.1f} MiB)")
+    print(f"restart after {edits:,} edits, snapshots    : {snapshot_time:6.2f} s ({snapshot_size / 2**20:.1f} MiB)")
+
+# ======================
+# FUZZY SEARCH
+# ======================
+
+# helper that produces n songs with titles made of random words, so titles share trigrams
+# the way real ones do ("song 123" titles would all look alike to a trigram index)
+def worded_songs(n, artists=5000, seed=3):
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bcdfghjklmnprstvwz" for v in "aeiou"] + ["an", "el", "in", "or", "us"]
+    words = sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(20_000)})
+    names = [f"{rng.choice(words)} {rng.choice(words)}".title() for _ in range(artists)]
+    for i in range(n):
+        yield " ".join(rng.choice(words) for _ in range(rng.randint(2, 4))).title(), names[i % artists], "3:00"
+
+# helper that makes up to `typos` random edits (insert, delete or replace a letter)
+def misspell(text, rng, typos=2):
+    letters = list(text)
+    for _ in range(typos):
+        i = rng.randrange(len(letters))
+        edit = rng.randrange(3)
+        if edit == 0:
+            letters.insert(i, rng.choice("aeioulnrst"))
+        elif edit == 1 and len(letters) > 1:
+            del letters[i]
+        else:
+            letters[i] = rng.choice("aeioulnrst")
+    return "".join(letters)
+
+# compares the trigram index against edit distance over every title, on misspelled titles
+def benchmark_fuzzy_search(n=1_000_000, queries=200, k=5):
+    playlist, lookup = library()
+    with contextlib.redirect_stdout(io.StringIO()):
+        playlist.add_songs(worded_songs(n), lookup=lookup)
+    rng = random.Random(11)
+    titles = list(lookup.song_map)
+    targets = [titles[rng.randrange(len(titles))] for _ in range(queries)]
+    typed = [misspell(title, rng) for title in targets]
+
+    def linear_scan(query):
+        distances = ((fuzzy_search.bounded_edit_distance(query, title, 2), title) for title in titles)
+        return sorted(match for match in distances if match[0] <= 2)[:k]
+
+    build_time, _ = measure_time(lookup.search_fuzzy, "warm up", k)
+    index_time, results = measure_time(lambda: [lookup.search_fuzzy(query, k) for query in typed])
+    scan_time, _ = measure_time(lambda: [linear_scan(query) for query in typed[:3]])
+    found = sum(any(song.title.lower() == target for song, _ in result) for target, result in zip(targets, results))
+
+    print(f"\nFuzzy search (2 typos), {n:,} titles")
+    print("-" * 40)
+    print(f"trigram index build (once): {build_time:8.2f} s")
+    print(f"trigram index per query   : {index_time / queries * 1000:8.2f} ms")
+    print(f"linear scan per query     : {scan_time / 3 * 1000:8.0f} ms")
+    print(f"intended title in top-{k}  : {found / queries:8.1%}")
+
+if __name__ == "__main__":
+    benchmark_song_memory()
+    benchmark_bulk_ingest()
+    benchmark_merge_sort()
+    benchmark_sort_algorithms()
+    benchmark_rating_aggregation()
+    benchmark_autocomplete()
+    benchmark_query()
+    benchmark_playback_history()
+    benchmark_history_queries()
+    benchmark_play_analytics()
+    benchmark_journal()
+    benchmark_shuffle()
+    benchmark_play_order()
+    benchmark_smart_shuffle()
+    benchmark_fuzzy_search()
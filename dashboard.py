@@ -16,20 +16,16 @@ def export_snapshot(playlist, filename="dashboard.txt"):
             file.write("Songs:\n")
             file.write("-" * 40 + "\n")
 
-            current = playlist.head
-            index = 1
             total_duration = 0
             song_list = []
 
-            while current:
+            for index, current in enumerate(playlist, 1):
                 minutes = current.duration // 60
                 seconds = current.duration % 60
                 formatted_duration = f"{minutes}:{seconds:02d}"
                 file.write(f"{index}. {current.title} by {current.artist} ({formatted_duration})\n")
                 total_duration += current.duration
                 song_list.append((current.title, current.artist, current.duration))
-                current = current.next
-                index += 1
 
             file.write("-" * 40 + "\n")
 
@@ -0,0 +1,159 @@
+# fuzzy_search.py
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+
+# this class is an inverted index from character trigrams to the texts that contain them
+# a misspelled query still shares most of its trigrams with the right text, so candidates
+# are found without scanning every key, then re-ranked by a bounded edit distance
+# several items can share one text (e.g. all songs by the same artist)
+class TrigramIndex:
+    def __init__(self):
+        self.postings = {}    # trigram -> array of text ids (ascending, may hold deleted ids)
+        self.texts = []       # text id -> normalized text, or None once deleted
+        self.items = []       # text id -> list of items with that text
+        self.sizes = array('H')  # text id -> number of trigrams in the text
+        self.text_ids = {}    # normalized text -> text id
+        self.deleted = 0      # number of deleted text ids still present in the postings
+
+    # adds an item under a text
+    def add(self, text, item):
+        """
+        Time Complexity: O(t), t = length of the text (one posting per trigram)
+        Space Complexity: O(t)
+        """
+        text = normalize(text)
+        text_id = self.text_ids.get(text)
+        if text_id is not None:
+            self.items[text_id].append(item)
+            return
+
+        text_id = self.text_ids[text] = len(self.texts)
+        self.texts.append(text)
+        self.items.append([item])
+        grams = trigrams(text)
+        self.sizes.append(min(len(grams), 0xFFFF))
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('I')
+            posting.append(text_id)
+
+    # removes an item from a text (the text is dropped once it has no items left)
+    def remove(self, text, item):
+        """
+        Time Complexity: O(k), k = items sharing the text (postings are cleaned up lazily)
+        Space Complexity: O(1)
+        """
+        text_id = self.text_ids.get(normalize(text))
+        if text_id is None:
+            return
+        items = self.items[text_id]
+        for i, existing in enumerate(items):
+            if existing == item:
+                del items[i]
+                break
+        if not items:
+            del self.text_ids[self.texts[text_id]]
+            self.texts[text_id] = None
+            self.deleted += 1
+            if self.deleted > len(self.text_ids):
+                self._rebuild()
+
+    # finds up to `limit` texts close to the query
+    # returns a list of (items, distance, similarity), best first, where distance is the
+    # edit distance capped at max_distance + 1 and similarity is the trigram overlap (0..1)
+    def search(self, query, limit=10, max_distance=2, candidates=50):
+        """
+        Time Complexity: O(p + c * log P + r * t^2), p = postings read from the rarest trigrams,
+                         c = candidates, P = longest posting, r = candidates re-ranked, t = text length
+        Space Complexity: O(c)
+        """
+        query = normalize(query)
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        # a text within max_distance edits keeps at least len(grams) - 3 * max_distance trigrams,
+        # so it must appear in one of the (3 * max_distance + 1) rarest trigram lists
+        # (very short queries have fewer trigrams than that, so they only find texts sharing one)
+        needed = max(1, len(grams) - 3 * max_distance)
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        probe, rest = lists[:len(lists) - needed + 1], lists[len(lists) - needed + 1:]
+
+        counts = Counter(chain.from_iterable(probe))
+
+        # count the remaining (longer) lists by binary search instead of reading them,
+        # dropping candidates that can no longer reach `needed` even if they are in every list left
+        for remaining, posting in enumerate(rest):
+            size = len(posting)
+            survivors = Counter()
+            for text_id, shared in counts.items():
+                i = bisect_left(posting, text_id)
+                if i < size and posting[i] == text_id:
+                    shared += 1
+                if shared + len(rest) - remaining - 1 >= needed:
+                    survivors[text_id] = shared
+            counts = survivors
+
+        scored = []
+        for text_id, shared in counts.items():
+            text = self.texts[text_id]
+            if shared < needed or text is None:
+                continue
+            similarity = shared / (len(grams) + self.sizes[text_id] - shared)
+            scored.append((similarity, text_id))
+        scored.sort(reverse=True)
+
+        results = []
+        for similarity, text_id in scored[:candidates]:
+            distance = bounded_edit_distance(query, self.texts[text_id], max_distance)
+            results.append((distance, -similarity, text_id))
+        results.sort()
+        return [(self.items[text_id], distance, -negative) for distance, negative, text_id in results[:limit]]
+
+    # drops deleted ids from the postings and renumbers the texts
+    def _rebuild(self):
+        """
+        Time Complexity: O(total trigrams)
+        Space Complexity: O(total trigrams)
+        """
+        entries = [(text, items) for text, items in zip(self.texts, self.items) if text is not None]
+        self.__init__()
+        for text, items in entries:
+            for item in items:
+                self.add(text, item)
+
+# lowercases and collapses whitespace, so "  The  Rip" and "the rip" are the same text
+def normalize(text):
+    return " ".join(text.lower().split())
+
+# returns the set of character trigrams of a normalized text, padded so that short words
+# and word starts get trigrams of their own ("rip" -> "  r", " ri", "rip", "ip ")
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Levenshtein distance that gives up once it is sure to exceed `bound`
+# returns bound + 1 in that case, so it costs O(len(a) * len(b)) at most and usually much less
+def bounded_edit_distance(a, b, bound):
+    """
+    Time Complexity: O(len(a) * len(b)) worst case
+    Space Complexity: O(len(b))
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1,                         # deletion
+                               current[j - 1] + 1,                      # insertion
+                               previous[j - 1] + (char_a != char_b)))   # substitution
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return min(previous[-1], bound + 1)
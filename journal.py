@@ -0,0 +1,447 @@
+# journal.py
+
+import contextlib
+import os
+import struct
+import zlib
+from array import array
+from itertools import islice
+
+from playlist_events import INSERT, DELETE, MOVE, REORDER, REVERSE, UPDATE, PIN
+from playlist_engine import SongNode
+
+MAGIC = b"PWJ1"
+FILE_HEADER = struct.Struct("<4sQ")  # magic, generation (a journal only applies to its own snapshot)
+FRAME = struct.Struct("<BII")        # record kind, payload length, crc32 of the payload
+SONG = struct.Struct("<IIII")        # song id, duration, title length, artist length (then the utf-8 text)
+PAIR = struct.Struct("<II")          # (position, count) before SONGS, (song id, position) for MOVE_SONG
+PLAY = struct.Struct("<Id")          # song id, timestamp
+RATING = struct.Struct("<IIB")       # user id, song id, score
+NEXT = struct.Struct("<I")           # next song id the registry hands out
+PIN_FLAG = struct.Struct("<IB")      # song id, 1 if pinned / 0 if unpinned
+
+GROUP_SIZE = 256          # records written with a single fsync at most
+COMPACT_BYTES = 8 << 20   # journal size that triggers a snapshot (or twice the snapshot, if larger)
+SNAPSHOT_CHUNK = 50_000   # songs / plays / ratings per snapshot record
+
+# record kinds
+SONGS = 1         # songs added at a position
+DELETE_SONGS = 2  # songs deleted, by id
+MOVE_SONG = 3     # a song moved to a position
+ORDER = 4         # the whole play order, by id (sort, shuffle)
+UPDATE_SONG = 5   # new title / artist / duration of a song
+PLAYS = 6         # songs played, with timestamps
+UNDO_PLAY = 7     # the last play was undone
+RATINGS = 8       # listener ratings
+UNRATE = 9        # every rating of a song removed
+NEXT_ID = 10      # ids below this belong to songs that were removed
+REVERSE_ORDER = 11  # the play direction was flipped (no payload)
+PINS = 12         # songs pinned or unpinned
+
+# this class makes PlayWise survive a restart: it is a write-ahead journal of every playlist
+# change, play and rating, in a compact binary format (a small frame with a checksum, then the
+# record), and it replays the journal into fresh objects at startup
+# every change is synced before the call that made it returns; the records of one call (a batch,
+# a bulk import) or of a grouped() block share one fsync (group commit), and once
+# the journal grows past the last snapshot it is compacted: the current state is written as a
+# new snapshot and the journal starts over, so startup replays the state, not its whole history
+# snapshots are written to a temporary file and renamed, and carry a generation number that
+# the journal must match, so a crash at any point leaves either the old or the new pair
+class Journal:
+    def __init__(self, path, playlist, history=None, rating_store=None, rating_tree=None,
+                 group_size=GROUP_SIZE, compact_bytes=COMPACT_BYTES):
+        self.path = path                          # the journal file
+        self.snapshot_path = path + ".snapshot"   # the last snapshot
+        self.playlist = playlist
+        self.registry = playlist.registry
+        self.history = history
+        self.rating_store = rating_store
+        self.rating_tree = rating_tree            # rebuilt from the rating store after a replay
+        self.group_size = group_size
+        self.compact_bytes = compact_bytes        # None turns compaction off
+        self.file = None
+        self.generation = 0
+        self.buffer = bytearray()                 # records waiting for the next group commit
+        self.pending = 0                          # number of records in the buffer
+        self.group_depth = 0                      # > 0 inside grouped(), records wait for the end of the group
+        self.size = 0                             # bytes in the journal file
+        self.snapshot_size = 0                    # bytes in the snapshot file
+
+    # replays the snapshot and the journal, then starts recording every change
+    # returns the number of records replayed (0 on a first start)
+    def open(self):
+        """
+        Time Complexity: O(s + j), s = snapshot size, j = journal size
+        Space Complexity: O(SNAPSHOT_CHUNK) besides the restored state
+        """
+        replayed = 0
+        generation = 0
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "rb") as file:
+                    generation = self._read_header(file)
+                    if generation is None:
+                        raise ValueError(f"'{self.snapshot_path}' is not a PlayWise snapshot")
+                    replayed += self._replay(file)
+                self.snapshot_size = os.path.getsize(self.snapshot_path)
+
+            self.file = open(self.path, "r+b" if os.path.exists(self.path) else "w+b")
+            if self._read_header(self.file) == generation:
+                replayed += self._replay(self.file)
+                # anything after the last complete record is a group that was cut off by a crash
+                self.size = self.file.tell()
+                self.file.truncate()
+                self.generation = generation
+            else:
+                # empty, or left over from before the snapshot was written: the snapshot covers it
+                self._reset(generation)
+
+            if replayed and self.rating_store is not None and self.rating_tree is not None:
+                self.rating_store.update_index(self.rating_tree)
+
+        self.playlist.subscribe(self.playlist_changed)
+        if self.history is not None:
+            self.history.subscribe(self.play_recorded)
+        if self.rating_store is not None:
+            self.rating_store.subscribe(self.rating_changed)
+        return replayed
+
+    # writes the records still waiting for their group and stops recording
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.playlist.unsubscribe(self.playlist_changed)
+        if self.history is not None:
+            self.history.unsubscribe(self.play_recorded)
+        if self.rating_store is not None:
+            self.rating_store.unsubscribe(self.rating_changed)
+        self.file.close()
+        self.file = None
+
+    # shares one fsync between every change made inside the block (e.g. importing a listening log)
+    # the changes are durable once the outermost block ends, a crash inside it may lose them
+    @contextlib.contextmanager
+    def grouped(self):
+        """
+        Time Complexity: O(1), plus one write + fsync per GROUP_SIZE records when the block ends
+        Space Complexity: O(group)
+        """
+        self.group_depth += 1
+        try:
+            yield self
+        finally:
+            self.group_depth -= 1
+            self._commit()
+
+    # ======================
+    # RECORDING (LISTENERS)
+    # ======================
+
+    # subscribed to the playlist, turns its events into records
+    def playlist_changed(self, events):
+        """
+        Time Complexity: O(k + r log n), k = songs in the events, r = runs of adjacent songs
+                         (O(n) for REORDER, which records the whole order)
+        Space Complexity: O(k)
+        """
+        playlist = self.playlist
+        positioned = 0  # records that carry a position
+        for event in events:
+            if event.kind == INSERT:
+                for index, run in self._runs(event.songs):
+                    self._append(SONGS, PAIR.pack(index, len(run)) + b"".join(map(_pack_song, run)))
+                    positioned += 1
+            elif event.kind == DELETE:
+                self._append(DELETE_SONGS, array('I', (song.id for song in event.songs)).tobytes())
+            elif event.kind == MOVE:
+                for song in event.songs:
+                    self._append(MOVE_SONG, PAIR.pack(song.id, playlist.index_of(song)))
+                    positioned += 1
+            elif event.kind == REORDER:
+                self._append_order()
+            elif event.kind == REVERSE:
+                self._append(REVERSE_ORDER, b"")
+            elif event.kind == UPDATE:
+                for song in event.songs:
+                    self._append(UPDATE_SONG, _pack_song(song))
+            elif event.kind == PIN:
+                self._append(PINS, b"".join(PIN_FLAG.pack(song.id, song.pinned) for song in event.songs))
+
+        # the positions of a batch are read after the whole batch ran, so they may not be the
+        # positions the songs had in between (a batch merges two moves into one event, so this
+        # also holds for a single event); recording the final order makes the replay exact
+        if positioned > 1 or (positioned and len(events) > 1):
+            self._append_order()
+        self._commit()
+
+    # subscribed to the playback history, count is 1 for a play and -1 for an undo
+    def play_recorded(self, song_id, timestamp, count):
+        if count > 0:
+            self._append(PLAYS, PLAY.pack(song_id, timestamp))
+        else:
+            self._append(UNDO_PLAY, b"")
+        self._commit()
+
+    # subscribed to the rating store, gets every rating of one change (a bulk add is one call)
+    # score is None when every rating of the song was removed
+    def rating_changed(self, ratings):
+        """
+        Time Complexity: O(k), k = ratings in the change, one fsync per call
+        Space Complexity: O(min(k, SNAPSHOT_CHUNK))
+        """
+        rows = []
+        for user_id, song, score in ratings:
+            if score is None:
+                self._append_ratings(rows)
+                rows = []
+                self._append(UNRATE, NEXT.pack(song.id))
+            else:
+                rows.append(RATING.pack(user_id, song.id, score))
+                if len(rows) == SNAPSHOT_CHUNK:
+                    self._append_ratings(rows)
+                    rows = []
+        self._append_ratings(rows)
+        self._commit()
+
+    def _append_ratings(self, rows):
+        if rows:
+            self._append(RATINGS, b"".join(rows))
+
+    # splits songs into runs that sit next to each other in the playlist, with the first position
+    # (a bulk import is then one record per chunk, with one index lookup each)
+    def _runs(self, songs):
+        step = "prev" if self.playlist.reversed else "next"
+        run = []
+        for song in songs:
+            if run and getattr(run[-1], step) is not song:
+                yield self.playlist.index_of(run[0]), run
+                run = []
+            run.append(song)
+        if run:
+            yield self.playlist.index_of(run[0]), run
+
+    def _append_order(self):
+        self._append(ORDER, array('I', (song.id for song in self.playlist)).tobytes())
+
+    # adds a record to the current group, a full group is written right away
+    def _append(self, kind, payload):
+        """
+        Time Complexity: O(len(payload)), plus one write + fsync per group
+        Space Complexity: O(group)
+        """
+        self.buffer += FRAME.pack(kind, len(payload), zlib.crc32(payload))
+        self.buffer += payload
+        self.pending += 1
+        if self.pending >= self.group_size:
+            self.flush()
+
+    # called when a listener is done with a change: the change is acknowledged once the call
+    # that made it returns, so its records are synced now unless a grouped() block is open
+    # compaction is only decided here, after every record of the change is written: a snapshot
+    # taken halfway would already hold the whole change, and the rest of its records would then
+    # be replayed on top of it
+    def _commit(self):
+        if self.group_depth:
+            return
+        self.flush()
+        if self.compact_bytes is not None and self.size > max(self.compact_bytes, 2 * self.snapshot_size):
+            self.compact()
+
+    # writes the current group with a single fsync (the group commit)
+    def flush(self):
+        """
+        Time Complexity: O(group)
+        Space Complexity: O(1)
+        """
+        if not self.buffer:
+            return
+        self.file.write(self.buffer)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size += len(self.buffer)
+        self.buffer = bytearray()
+        self.pending = 0
+
+    # ======================
+    # SNAPSHOTS (COMPACTION)
+    # ======================
+
+    # writes the current state as a new snapshot and starts an empty journal
+    def compact(self):
+        """
+        Time Complexity: O(n + p + m), n = songs, p = plays, m = ratings
+        Space Complexity: O(SNAPSHOT_CHUNK)
+        """
+        self.flush()
+        generation = self.generation + 1
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(FILE_HEADER.pack(MAGIC, generation))
+            for kind, payload in self._snapshot_records():
+                file.write(FRAME.pack(kind, len(payload), zlib.crc32(payload)))
+                file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_path)
+        _sync_directory(self.snapshot_path)
+        self.snapshot_size = os.path.getsize(self.snapshot_path)
+        self._reset(generation)
+
+    # the records that rebuild the current state: songs in play order, pins, plays, ratings
+    def _snapshot_records(self):
+        songs = iter(self.playlist)
+        position = 0
+        while True:
+            chunk = list(islice(songs, SNAPSHOT_CHUNK))
+            if not chunk:
+                break
+            yield SONGS, PAIR.pack(position, len(chunk)) + b"".join(map(_pack_song, chunk))
+            position += len(chunk)
+        yield NEXT_ID, NEXT.pack(len(self.registry.songs))
+
+        pinned = [PIN_FLAG.pack(song.id, True) for song in self.playlist.pinned_songs]
+        for start in range(0, len(pinned), SNAPSHOT_CHUNK):
+            yield PINS, b"".join(pinned[start:start + SNAPSHOT_CHUNK])
+
+        if self.history is not None:
+            plays = self.history.entries_from(0)
+            while True:
+                chunk = list(islice(plays, SNAPSHOT_CHUNK))
+                if not chunk:
+                    break
+                yield PLAYS, b"".join(PLAY.pack(song_id, timestamp) for song_id, timestamp in chunk)
+
+        if self.rating_store is not None:
+            store = self.rating_store
+            store.compact()
+            rows = [RATING.pack(user_id, store.songs[index].id, score)
+                    for user_id, index, score in zip(store.user_ids, store.song_indexes, store.scores)
+                    if store.songs[index] is not None]
+            for start in range(0, len(rows), SNAPSHOT_CHUNK):
+                yield RATINGS, b"".join(rows[start:start + SNAPSHOT_CHUNK])
+
+    # empties the journal and marks it as belonging to a snapshot generation
+    def _reset(self, generation):
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(FILE_HEADER.pack(MAGIC, generation))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.generation = generation
+        self.size = FILE_HEADER.size
+
+    # ======================
+    # REPLAY
+    # ======================
+
+    # returns the generation in a file header, or None if the file has no valid header
+    def _read_header(self, file):
+        header = file.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            return None
+        magic, generation = FILE_HEADER.unpack(header)
+        return generation if magic == MAGIC else None
+
+    # applies every complete record, stops at the first torn or corrupted one
+    # the file is left positioned after the last record applied
+    def _replay(self, file):
+        """
+        Time Complexity: O(file size)
+        Space Complexity: O(largest record)
+        """
+        replayed = 0
+        while True:
+            start = file.tell()
+            frame = file.read(FRAME.size)
+            if len(frame) < FRAME.size:
+                file.seek(start)
+                return replayed
+            kind, length, checksum = FRAME.unpack(frame)
+            payload = file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                file.seek(start)
+                return replayed
+            self._apply(kind, payload)
+            replayed += 1
+
+    # applies one record to the playlist, history or ratings
+    def _apply(self, kind, payload):
+        registry, playlist = self.registry, self.playlist
+        if kind == SONGS:
+            index, count = PAIR.unpack_from(payload)
+            nodes = []
+            for song_id, title, artist, duration in _unpack_songs(payload, PAIR.size, count):
+                node = SongNode(title, artist, duration)
+                registry.restore(node, song_id)
+                nodes.append(node)
+            playlist.restore_songs(nodes, index)
+        elif kind == DELETE_SONGS:
+            for song in list(registry.resolve(array('I', payload))):
+                playlist.delete_song(playlist.index_of(song))
+        elif kind == MOVE_SONG:
+            song_id, index = PAIR.unpack(payload)
+            song = registry.get(song_id)
+            if song is not None:
+                playlist.move_song(playlist.index_of(song), min(index, playlist.size - 1))
+        elif kind == ORDER:
+            playlist.relink(list(registry.resolve(array('I', payload))))
+        elif kind == UPDATE_SONG:
+            song_id, title, artist, duration = next(_unpack_songs(payload, 0, 1))
+            song = registry.get(song_id)
+            if song is not None:
+                playlist.update_song(song, title, artist, duration)
+        elif kind == PLAYS and self.history is not None:
+            for song_id, timestamp in PLAY.iter_unpack(payload):
+                self.history.record_play(song_id, timestamp)
+        elif kind == UNDO_PLAY and self.history is not None:
+            self.history.undo_last_play()
+        elif kind == RATINGS and self.rating_store is not None:
+            store = self.rating_store
+            rows = [(user_id, registry.get(song_id), score) for user_id, song_id, score in RATING.iter_unpack(payload)]
+            rows = [row for row in rows if row[1] is not None]
+            store.add_ratings([row[0] for row in rows], [store.register_song(row[1]) for row in rows],
+                              [row[2] for row in rows])
+        elif kind == UNRATE and self.rating_store is not None:
+            song = registry.get(NEXT.unpack(payload)[0])
+            if song is not None:
+                self.rating_store.remove_song(song)
+        elif kind == NEXT_ID:
+            registry.reserve(NEXT.unpack(payload)[0])
+        elif kind == REVERSE_ORDER:
+            playlist.reverse_playlist()
+        elif kind == PINS:
+            for song_id, pinned in PIN_FLAG.iter_unpack(payload):
+                song = registry.get(song_id)
+                if song is not None:
+                    playlist.set_pinned(song, bool(pinned))
+
+# encodes a song as its id, duration and utf-8 title and artist
+def _pack_song(song):
+    title = song.title.encode("utf-8")
+    artist = song.artist.encode("utf-8")
+    return SONG.pack(song.id, song.duration, len(title), len(artist)) + title + artist
+
+# decodes `count` songs written by _pack_song, starting at `offset`
+def _unpack_songs(payload, offset, count):
+    for _ in range(count):
+        song_id, duration, title_length, artist_length = SONG.unpack_from(payload, offset)
+        offset += SONG.size
+        title = payload[offset:offset + title_length].decode("utf-8")
+        offset += title_length
+        artist = payload[offset:offset + artist_length].decode("utf-8")
+        offset += artist_length
+        yield song_id, title, artist, duration
+
+# makes a rename durable by syncing its directory (not possible on every platform)
+def _sync_directory(path):
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
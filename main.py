@@ -1,12 +1,19 @@
 from playlist_engine import Playlist, handle_playlist_operations
 from playback_history import PlaybackHistory, handle_playback_history
+from play_analytics import PlayAnalytics
+from journal import Journal
 from song_rating_tree import RatingBST, handle_song_ratings
+from rating_store import RatingStore
+from recommender import SimilarSongs
 from song_lookup import SongLookup, handle_song_lookup
+from song_registry import SongRegistry
 from sort_utils import handle_sort_menu
 from dashboard import handle_dashboard_export
 from pinned_songs import handle_shuffle_menu
 from playlist_summary import handle_summary_export
 
+JOURNAL_PATH = "playwise.journal"  # everything PlayWise needs to survive a restart (plus a .snapshot file)
+
 # This function shows the main menu options for the user
 def show_main_menu():
     print("\nWelcome to the PlayWise Smart Music Engine")
@@ -24,10 +31,23 @@ def show_main_menu():
 
 # Main function that runs the music engine
 def main():
-    playlist = Playlist("Playwise Playlist 1")
-    history = PlaybackHistory()
-    rating_tree = RatingBST()
-    lookup = SongLookup()
+    registry = SongRegistry()  # one id per song, shared by every module below
+    playlist = Playlist("Playwise Playlist 1", registry)
+    history = PlaybackHistory(registry)
+    analytics = PlayAnalytics(registry)
+    rating_tree = RatingBST(registry)
+    rating_store = RatingStore()
+    lookup = SongLookup(registry)
+    recommender = SimilarSongs(rating_store, rating_tree, lookup)
+
+    # the lookup and the ratings follow every change to the playlist
+    playlist.subscribe(lookup.playlist_changed)
+    playlist.subscribe(rating_tree.playlist_changed)
+    playlist.subscribe(rating_store.playlist_changed)
+    playlist.subscribe(analytics.playlist_changed)
+
+    # play counts and trending scores are updated on every play and undo
+    history.subscribe(analytics.record)
 
     demo_songs = [
         ("Red Eyes", "The War on Drugs", "4:59"),
@@ -41,10 +61,24 @@ def main():
         ("First Breath After Coma", "Explosions in the Sky", "9:33"),
         ("Heartbeats", "José González", "2:40"),
     ]
-    for title, artist, duration in demo_songs:
-        playlist.add_song(title, artist, duration)
-        lookup.add_song(playlist.tail)
 
+    # the journal replays the last session (the demo playlist is only added on a first start)
+    # and from then on records every change, play and rating
+    journal = Journal(JOURNAL_PATH, playlist, history, rating_store, rating_tree)
+    if journal.open():
+        print(f"📂 Restored '{playlist.name}': {playlist.size} songs, {len(history)} plays, "
+              f"{len(rating_store)} ratings.")
+    else:
+        playlist.add_songs(demo_songs)
+
+    try:
+        run_menu(playlist, history, analytics, rating_tree, rating_store, recommender, lookup)
+    finally:
+        journal.close()
+        history.close()
+
+# the main menu loop
+def run_menu(playlist, history, analytics, rating_tree, rating_store, recommender, lookup):
     while True:
         show_main_menu()
         choice = input("Enter your choice: ")
@@ -53,10 +87,10 @@ def main():
             handle_playlist_operations(playlist, lookup)
             
         elif choice == "2":
-            handle_playback_history(playlist, history)
+            handle_playback_history(playlist, history, analytics)
 
         elif choice == "3":
-            handle_song_ratings(playlist, rating_tree)
+            handle_song_ratings(playlist, rating_tree, rating_store, recommender)
 
         elif choice == "4":
             handle_song_lookup(lookup)
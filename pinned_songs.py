@@ -1,20 +1,22 @@
 # pinned_shuffle.py
 
+import heapq
 import random
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+from play_order import ShuffledOrder
 
 # this function marks a song as pinned so it doesn't move when shuffling
 def mark_song_pinned(playlist, index):
     """
-    Time Complexity: O(n), n = index
+    Time Complexity: O(log n)
     Space Complexity: O(1)
     """
-    current = playlist.head
-    for _ in range(index):
-        if current:
-            current = current.next
+    current = playlist.get(index)
 
     if current:
-        current.pinned = True
+        playlist.set_pinned(current, True)
         print(f"'{current.title}' has been pinned at position {index + 1}.")
     else:
         print("Invalid index. Cannot pin.")
@@ -22,57 +24,256 @@ def mark_song_pinned(playlist, index):
 # this function unpins a song so it becomes eligible for shuffling again
 def unmark_song_pinned(playlist, index):
     """
-    Time Complexity: O(n), n = index
+    Time Complexity: O(log n)
     Space Complexity: O(1)
     """
-    current = playlist.head
-    for _ in range(index):
-        if current:
-            current = current.next
+    current = playlist.get(index)
 
     if current:
-        current.pinned = False
+        playlist.set_pinned(current, False)
         print(f"'{current.title}' has been unpinned from position {index + 1}.")
     else:
         print("Invalid index. Cannot unpin.")
 
 # this shuffles only unpinned songs while keeping pinned ones fixed in place
-def shuffle_with_pins(playlist):
+# the song nodes are relinked in the new order and their data is never copied, so the lookup,
+# the ratings and the history keep pointing at the same songs; a seed repeats a shuffle
+def shuffle_with_pins(playlist, seed=None):
     """
-    Time Complexity: O(n)
+    Time Complexity: O(n + p log n), p = pinned songs
     Space Complexity: O(n)
     """
-    current = playlist.head
-    unpinned_nodes = []
-
-    # collect all unpinned songs into a list
-    while current:
-        if not current.pinned:
-            unpinned_nodes.append(current)
-        current = current.next
+    # pinned positions come from the playlist's pin index instead of checking every song
+    pinned = sorted(playlist.index_of(song) for song in playlist.pinned_songs)
+    order = list(playlist)
 
     # if less than 2 unpinned songs, no need to shuffle
-    if len(unpinned_nodes) < 2:
+    if len(order) - len(pinned) < 2:
         print("Not enough unpinned songs to shuffle.")
-        return
-
-    # randomly shuffle the unpinned songs
-    random.shuffle(unpinned_nodes)
-
-    # reassign the shuffled data back to their original positions
-    current = playlist.head
-    i = 0
-    while current:
-        if not current.pinned:
-            # assign data from shuffled list
-            shuffled = unpinned_nodes[i]
-            current.title = shuffled.title
-            current.artist = shuffled.artist
-            current.duration = shuffled.duration
-            i += 1
-        current = current.next
+        return False
+
+    # cut the unpinned songs out between the pinned positions and shuffle them
+    unpinned = []
+    start = 0
+    for position in pinned + [len(order)]:
+        unpinned += order[start:position]
+        start = position + 1
+    random.Random(seed).shuffle(unpinned)
+
+    # fill the gaps between the pinned songs with the shuffled ones, then relink once
+    taken = 0
+    start = 0
+    for position in pinned + [len(order)]:
+        gap = position - start
+        order[start:position] = unpinned[taken:taken + gap]
+        taken += gap
+        start = position + 1
+    playlist.relink(order)
 
     print("Shuffling complete. Pinned songs were kept in place.")
+    return True
+
+# this shuffles the unpinned songs so that two songs by the same artist have at least
+# `min_gap` other songs between them (pinned songs stay fixed, and count as neighbours too)
+# positions are filled from first to last: a max-heap hands out the artist with the most songs
+# left (random among equals), an artist that was just played, or is pinned close by, waits in
+# a second heap until the position where it is allowed again; taking the artist with the most
+# songs left first is what keeps the gap possible to the end when one artist dominates
+# a pin also blocks its artist from the positions just before it, so an artist with more songs
+# left than fit after its next pin gets a deadline (the last position its next song can take
+# for the rest to fit in before the pin); a third heap keeps the deadlines, and once the
+# earliest ones leave no slack the artist that is due first plays ahead of the others
+# with balance_durations, each pick takes the artist's shortest or longest song, whichever
+# brings the average so far closer to the playlist average
+# returns the number of songs closer than min_gap to the previous song by their artist in the
+# result, pinned songs included (0 when the gap always holds); without pins that only happens
+# when no order can keep it, with pins the deadlines are a heuristic
+def smart_shuffle(playlist, min_gap=3, balance_durations=False, seed=None):
+    """
+    Time Complexity: O((n + p) log a + n d log p), a = artists, p = pinned songs,
+                     d = deadlines within min_gap of a position (usually a few)
+                     (plus O(n log s) to sort each artist's s songs when balancing durations)
+    Space Complexity: O(n)
+    """
+    rng = random.Random(seed)
+    pinned = sorted(((playlist.index_of(song), song) for song in playlist.pinned_songs), key=lambda pin: pin[0])
+    order = list(playlist)
+    if len(order) - len(pinned) < 2:
+        print("Not enough unpinned songs to shuffle.")
+        return 0
+
+    # group the unpinned songs by artist, and note where each artist is pinned
+    pinned_positions = {position for position, _ in pinned}
+    pin_positions = [position for position, _ in pinned]  # sorted
+    by_artist = {}
+    for position, song in enumerate(order):
+        if position not in pinned_positions:
+            by_artist.setdefault(song.artist, []).append(song)
+    pins = {}
+    for position, song in pinned:
+        pins.setdefault(song.artist, []).append(position)
+    for songs in by_artist.values():
+        if balance_durations:
+            songs.sort(key=lambda song: song.duration)
+        else:
+            rng.shuffle(songs)
+    queues = {artist: deque(songs) for artist, songs in by_artist.items()}
+
+    last = {}          # artist -> last position it was played at
+    # earliest position >= position where an artist can go, given its last song and its pins
+    # (it only reads state, so probing an artist that is then not placed changes nothing)
+    def earliest(artist, position):
+        position = max(position, last.get(artist, -min_gap - 1) + min_gap + 1)
+        artist_pins = pins.get(artist)
+        if artist_pins:
+            i = bisect_left(artist_pins, position - min_gap)  # first pin whose block reaches position
+            while i < len(artist_pins) and artist_pins[i] - min_gap <= position:
+                position = artist_pins[i] + min_gap + 1
+                i += 1
+        return position
+
+    # fits_after[artist][i]: how many of the artist's songs fit after its i-th pin at most,
+    # one every min_gap + 1 positions in the stretches that its later pins leave open
+    size = len(order)
+    fits_after = {}
+    for artist, artist_pins in pins.items():
+        fits = [0] * len(artist_pins)
+        for i in range(len(artist_pins) - 1, -1, -1):
+            end = artist_pins[i + 1] - min_gap if i + 1 < len(artist_pins) else size
+            stretch = end - (artist_pins[i] + min_gap + 1)
+            fits[i] = max(0, stretch + min_gap) // (min_gap + 1) + (fits[i + 1] if i + 1 < len(fits) else 0)
+        fits_after[artist] = fits
+
+    # returns (deadline, True): the last position the artist's next song can take so that the
+    # songs that don't fit after its next pin still fit before it, or (position, False) when nothing
+    # is due before that pin: a position to look again, at or before any later deadline
+    # (None once no pin is ahead)
+    def deadline(artist, position):
+        artist_pins = pins[artist]
+        i = bisect_left(artist_pins, position + min_gap + 1)
+        if i == len(artist_pins):
+            return None
+        pin = artist_pins[i]
+        before = len(queues[artist]) - fits_after[artist][i]
+        if before <= 0:
+            return pin + min_gap + 1, False
+        return pin - min_gap - 1 - (before - 1) * (min_gap + 1), True
+
+    # every artist with songs left has one live entry, in ready or in waiting; entries left
+    # behind when an artist is taken through its deadline are skipped when they come up
+    live = {}
+    def push(heap, key, tie, artist):
+        entry = (key, tie, artist)
+        live[artist] = entry
+        heapq.heappush(heap, entry)
+
+    ready = []         # (-songs left, tie breaker, artist), max-heap by songs left
+    waiting = []       # (position it may be played again, tie breaker, artist)
+    deadlines = []     # (deadline, tie breaker, artist), never later than the real deadline
+    for artist, queue in queues.items():
+        push(ready, -len(queue), rng.random(), artist)
+        current = deadline(artist, 0) if artist in pins else None
+        if current is not None:
+            deadlines.append((current[0], rng.random(), artist))
+    heapq.heapify(deadlines)
+    average = sum(song.duration for song in order) / len(order)
+    total = 0          # duration of the songs before the current position
+
+    for position in range(len(order)):
+        if position in pinned_positions:
+            total += order[position].duration
+            continue
+
+        while waiting and waiting[0][0] <= position:
+            entry = heapq.heappop(waiting)
+            if live.get(entry[2]) is entry:
+                push(ready, -len(queues[entry[2]]), entry[1], entry[2])
+
+        # artists with a deadline only go first once they run out of slack: when the i earliest
+        # deadlines leave no more than i free positions, the earliest one that may play now goes
+        artist = None
+        checked = []       # current deadlines, earliest first
+        later = []         # nothing due yet, looked at again at a later position
+        tight = False
+        while deadlines and deadlines[0][0] <= position + len(checked) + min_gap:
+            key, tie, candidate = heapq.heappop(deadlines)
+            current = deadline(candidate, position) if queues[candidate] else None
+            if current is None:
+                continue
+            due, is_deadline = current
+            if due > key:
+                heapq.heappush(deadlines, (due, tie, candidate))  # it moved later, look again then
+                continue
+            if not is_deadline:
+                later.append((due, tie, candidate))
+                continue
+            checked.append((due, tie, candidate))
+            free = due - position + 1 - (bisect_right(pin_positions, due) - bisect_left(pin_positions, position))
+            if free <= len(checked):
+                tight = True
+                break
+        if tight:
+            for _, _, candidate in checked:
+                if earliest(candidate, position) == position:
+                    artist = candidate
+                    live.pop(artist, None)
+                    break
+        for entry in checked + later:
+            heapq.heappush(deadlines, entry)
+
+        while artist is None and ready:
+            entry = heapq.heappop(ready)
+            if live.get(entry[2]) is not entry:
+                continue
+            _, tie, candidate = entry
+            # the waiting heap already kept the gap after the artist's last song,
+            # so only artists with pins need a closer look
+            allowed = earliest(candidate, position) if candidate in pins else position
+            if allowed == position:
+                artist = candidate
+                del live[artist]
+            else:
+                push(waiting, allowed, tie, candidate)
+
+        if artist is None:
+            # every artist left is too close, take the one that would be allowed the soonest
+            while live.get(waiting[0][2]) is not waiting[0]:
+                heapq.heappop(waiting)
+            _, tie, artist = heapq.heappop(waiting)
+            del live[artist]
+
+        # when balancing, the queue is sorted by duration: running long takes the shortest
+        # song, running short the longest; otherwise the queue is already shuffled
+        queue = queues[artist]
+        if balance_durations and total > average * position:
+            song = queue.popleft()
+        else:
+            song = queue.pop()
+        order[position] = song
+        total += song.duration
+        last[artist] = position
+        if queue:
+            push(waiting, position + min_gap + 1, rng.random(), artist)
+
+    playlist.relink(order)
+
+    # count the songs that ended up too close to the previous song by their artist, in the final
+    # order, so pinned neighbours (and two pins close together) are counted too
+    violations = 0
+    previous = {}      # artist -> position of its latest song so far
+    for position, song in enumerate(order):
+        if position - previous.get(song.artist, -min_gap - 1) <= min_gap:
+            violations += 1
+        previous[song.artist] = position
+    if violations and pinned:
+        print(f"Smart shuffle complete, but {violations} song(s) are closer than {min_gap} songs to "
+              f"another song by the same artist (no way around it was found with these pins).")
+    elif violations:
+        print(f"Smart shuffle complete, but {violations} song(s) are closer than {min_gap} songs to "
+              f"another song by the same artist (there aren't enough other artists).")
+    else:
+        print(f"Smart shuffle complete. Songs by the same artist are at least {min_gap} songs apart.")
+    return violations
 
 # this menu lets the user interact with pin and shuffle options
 def handle_shuffle_menu(playlist):
@@ -84,6 +285,8 @@ def handle_shuffle_menu(playlist):
         print("2. Unpin a Song")
         print("3. Shuffle Unpinned Songs")
         print("4. Display Playlist")
+        print("5. Play in Shuffled Order (playlist order unchanged)")
+        print("6. Smart Shuffle (Spread Out Artists)")
         print("0. Back to Main Menu")
 
         choice = input("Enter your choice: ")
@@ -103,11 +306,33 @@ def handle_shuffle_menu(playlist):
                 print("Please enter a valid number.")
 
         elif choice == "3":
-            shuffle_with_pins(playlist)
+            seed = input("Enter a seed to repeat a shuffle (or press Enter for a random one): ").strip()
+            shuffle_with_pins(playlist, seed or None)
 
         elif choice == "4":
             playlist.display()
 
+        elif choice == "5":
+            # songs come from a lazy random order, ten at a time, each one once per cycle
+            order = ShuffledOrder(playlist)
+            played = 0
+            for song in order:
+                played += 1
+                print(f"{played}. {song.title} by {song.artist}" + (" (pinned)" if song.pinned else ""))
+                if played % 10 == 0 and len(order):
+                    if input("Press Enter for the next songs, or 0 to stop: ").strip() == "0":
+                        break
+            else:
+                print("🔁 Every song has been played once in this cycle.")
+
+        elif choice == "6":
+            try:
+                min_gap = int(input("Minimum number of songs between the same artist (e.g. 3): ") or 3)
+                balance = input("Balance song lengths too? (y/n): ").strip().lower() == "y"
+                smart_shuffle(playlist, max(min_gap, 0), balance)
+            except ValueError:
+                print("Please enter a valid number.")
+
         elif choice == "0":
             break
 
@@ -0,0 +1,287 @@
+# play_analytics.py
+
+import heapq
+import math
+import time
+from collections import Counter
+
+from playlist_events import DELETE
+from song_registry import default_registry
+
+# numpy is optional, without it batches are counted with plain Python loops
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TRENDING_HALF_LIFE = 7 * 24 * 3600   # seconds after which a play counts half as much for trending
+SKETCH_CAPACITY = 10_000             # songs tracked at most in "space_saving" mode
+RESCALE_AT = 500.0                   # trending weights are e ** (age / tau), rescaled before they overflow
+
+# this class keeps play statistics up to date as songs are played, so "most played" and
+# "trending" never need a scan of the playback history
+# in "exact" mode every song id gets a counter; in "space_saving" mode at most `capacity`
+# songs are tracked (the Space-Saving algorithm): a new song replaces the least played one
+# and inherits its count, so every count is an upper bound off by at most errors[id], and
+# any song played more than plays / capacity times is guaranteed to be tracked
+# trending scores decay exponentially with the given half-life; they are stored scaled to a
+# reference time (self.epoch) so a play only adds to one score and nothing decays in place
+# top-k queries are served from two max-heaps that get a fresh entry whenever a count or score
+# changes; outdated entries are skipped when they surface and dropped when a heap is rebuilt
+class PlayAnalytics:
+    def __init__(self, registry=None, mode="exact", capacity=SKETCH_CAPACITY, half_life=TRENDING_HALF_LIFE):
+        if mode not in ("exact", "space_saving"):
+            raise ValueError("mode must be 'exact' or 'space_saving'")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.registry = registry if registry is not None else default_registry  # song id -> song
+        self.mode = mode
+        self.capacity = capacity
+        self.counts = {}              # song id -> plays (an upper bound in space_saving mode)
+        self.errors = {}              # song id -> how much its count may overestimate (space_saving mode)
+        self.trending = {}            # song id -> decayed play score, scaled to time self.epoch
+        self.tau = half_life / math.log(2)  # seconds for a score to fall to 1/e
+        self.epoch = None             # reference time of the trending scores (the first play)
+        self.heap = []                # (count, song id) of tracked songs, least played first (space_saving mode)
+        self.most_played = []         # (-count, song id), most played first
+        self.most_trending = []       # (-score, song id), highest trending score first
+        self.plays = 0                # plays recorded so far
+
+    # records one play of a song (count=-1 takes a play back, e.g. on undo)
+    # it has the signature of a PlaybackHistory listener, so it can be subscribed directly
+    def record(self, song_id, timestamp=None, count=1):
+        """
+        Time Complexity: O(log n) amortized, n = tracked songs
+        Space Complexity: O(1)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.plays += count
+        self._add(song_id, count, count * self._weight(timestamp))
+
+    # records many plays at once from a sequence of song ids (and optionally their timestamps)
+    # the batch is counted per song first, so each distinct song is updated once
+    def record_many(self, song_ids, timestamps=None):
+        """
+        Time Complexity: O(k + d log n), k = plays in the batch, d = distinct songs (O(k + max id + d log n) with numpy)
+        Space Complexity: O(d)
+        """
+        if np is not None:
+            ids = np.asarray(song_ids, dtype=np.int64)
+            if not len(ids):
+                return
+            if timestamps is None:
+                stamps = np.full(len(ids), time.time())
+            else:
+                stamps = np.asarray(timestamps, dtype=np.float64)
+            self._weight(float(stamps.max()))  # rescales first if the newest play needs it
+            plays = np.bincount(ids)
+            weights = np.bincount(ids, weights=np.exp((stamps - self.epoch) / self.tau))
+            played = np.flatnonzero(plays)
+            batch = zip(played.tolist(), plays[played].tolist(), weights[played].tolist())
+        else:
+            song_ids = list(song_ids)
+            if not song_ids:
+                return
+            if timestamps is None:
+                timestamps = [time.time()] * len(song_ids)
+            self._weight(max(timestamps))
+            plays = Counter(song_ids)
+            weights = dict.fromkeys(plays, 0.0)
+            epoch, tau, exp = self.epoch, self.tau, math.exp
+            for song_id, timestamp in zip(song_ids, timestamps):
+                weights[song_id] += exp((timestamp - epoch) / tau)
+            batch = ((song_id, count, weights[song_id]) for song_id, count in plays.items())
+
+        for song_id, count, weight in batch:
+            self.plays += count
+            self._add(song_id, count, weight)
+
+    # ======================
+    # QUERIES
+    # ======================
+
+    # returns the k most played songs as (song, plays), most played first
+    def top_played(self, k=10):
+        """
+        Time Complexity: O(k log n) amortized, n = tracked songs (at most capacity in space_saving mode)
+        Space Complexity: O(k)
+        """
+        return self._resolve(self._top(self.most_played, self.counts, k))
+
+    # returns the k songs with the highest trending score as (song, score), highest first
+    # the score is the number of plays, each one weighted by 2 ** (-age / half_life)
+    def top_trending(self, k=10, now=None):
+        """
+        Time Complexity: O(k log n) amortized, n = tracked songs
+        Space Complexity: O(k)
+        """
+        if self.epoch is None:
+            return []
+        decay = math.exp((self.epoch - (time.time() if now is None else now)) / self.tau)
+        best = self._top(self.most_trending, self.trending, k)
+        return self._resolve((song_id, score * decay) for song_id, score in best)
+
+    # returns how often a song was played (an upper bound in space_saving mode, 0 if untracked)
+    def play_count(self, song):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        return self.counts.get(song if isinstance(song, int) else song.id, 0)
+
+    # this function is subscribed to the playlist, so deleted songs stop showing up
+    def playlist_changed(self, events):
+        """
+        Time Complexity: O(1) per deleted song
+        Space Complexity: O(1)
+        """
+        for event in events:
+            if event.kind == DELETE:
+                for song in event.songs:
+                    self._forget(song.id)
+
+    # pops the k highest live entries of a top heap and pushes them back
+    # an entry is live if it still matches the song's value; others are dropped on the way
+    def _top(self, heap, values, k):
+        """
+        Time Complexity: O(k log n) amortized (each dropped entry was paid for by its push)
+        Space Complexity: O(k)
+        """
+        best = []
+        seen = set()
+        while heap and len(best) < k:
+            value, song_id = heapq.heappop(heap)
+            if values.get(song_id) == -value and song_id not in seen:
+                seen.add(song_id)
+                best.append((song_id, -value))
+        for song_id, value in best:
+            heapq.heappush(heap, (-value, song_id))
+        return best
+
+    # turns (song id, value) pairs into (song, value), skipping songs that no longer exist
+    def _resolve(self, pairs):
+        get = self.registry.get
+        results = []
+        for song_id, value in pairs:
+            song = get(song_id)
+            if song is not None:
+                results.append((song, value))
+        return results
+
+    # ======================
+    # COUNTERS
+    # ======================
+
+    # adds `count` plays worth `weight` trending to a song
+    def _add(self, song_id, count, weight):
+        counts = self.counts
+        if song_id in counts:
+            total = counts[song_id] + count
+            if total <= 0:
+                self._forget(song_id)
+                return
+            counts[song_id] = total
+            score = self.trending[song_id] = self.trending[song_id] + weight
+            self._push_top(song_id, total, score)
+            if count < 0 and self.mode == "space_saving":
+                # the song's heap entry may now be above its count, push a fresh one
+                self._push(total, song_id)
+            return
+
+        if count <= 0:
+            return  # taking back a play the counters don't track (any more)
+        if self.mode == "exact" or len(counts) < self.capacity:
+            counts[song_id] = count
+            self.trending[song_id] = weight
+            self._push_top(song_id, count, weight)
+            if self.mode == "space_saving":
+                self.errors[song_id] = 0
+                self._push(count, song_id)
+            return
+
+        # the sketch is full: the least played song makes room, the new one takes over its count
+        victim, floor = self._pop_least()
+        score = self.trending.pop(victim)
+        del counts[victim], self.errors[victim]
+        counts[song_id] = floor + count
+        self.errors[song_id] = floor
+        self.trending[song_id] = score + weight
+        self._push(floor + count, song_id)
+        self._push_top(song_id, floor + count, score + weight)
+
+    # removes a song from every counter (its heap entries are dropped lazily)
+    def _forget(self, song_id):
+        if self.counts.pop(song_id, None) is not None:
+            self.trending.pop(song_id, None)
+            self.errors.pop(song_id, None)
+
+    # pushes a heap entry, rebuilding the heap once stale entries make up half of it
+    def _push(self, count, song_id):
+        heapq.heappush(self.heap, (count, song_id))
+        if len(self.heap) > 2 * self.capacity:
+            self.heap = [(count, song_id) for song_id, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    # pushes a song's new count and score onto the top heaps, rebuilding them from the
+    # counters once outdated entries make up more than half
+    def _push_top(self, song_id, count, score):
+        """
+        Time Complexity: O(log n) amortized, n = tracked songs
+        Space Complexity: O(1)
+        """
+        most_played = self.most_played
+        heapq.heappush(most_played, (-count, song_id))
+        heapq.heappush(self.most_trending, (-score, song_id))
+        if len(most_played) > 2 * len(self.counts) + 16:
+            self._rebuild_top()
+
+    # rebuilds both top heaps with one entry per tracked song
+    def _rebuild_top(self):
+        """
+        Time Complexity: O(n)
+        Space Complexity: O(n)
+        """
+        self.most_played = [(-count, song_id) for song_id, count in self.counts.items()]
+        self.most_trending = [(-score, song_id) for song_id, score in self.trending.items()]
+        heapq.heapify(self.most_played)
+        heapq.heapify(self.most_trending)
+
+    # pops the tracked song with the lowest count
+    # counts only grow between heap pushes, so an entry below the song's count is refreshed
+    # and an entry above it (or for an untracked song) is stale and dropped
+    def _pop_least(self):
+        """
+        Time Complexity: O(log capacity) amortized (each refresh pays for an earlier increment)
+        Space Complexity: O(1)
+        """
+        heap, counts = self.heap, self.counts
+        while True:
+            count, song_id = heapq.heappop(heap)
+            current = counts.get(song_id)
+            if current == count:
+                return song_id, count
+            if current is not None and current > count:
+                heapq.heappush(heap, (current, song_id))
+
+    # returns the trending weight of a play at `timestamp` relative to self.epoch
+    def _weight(self, timestamp):
+        if self.epoch is None:
+            self.epoch = timestamp
+        exponent = (timestamp - self.epoch) / self.tau
+        if exponent > RESCALE_AT:
+            self._rescale(timestamp)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    # moves the reference time forward, so the stored scores stay within float range
+    def _rescale(self, timestamp):
+        """
+        Time Complexity: O(n), once every RESCALE_AT * tau seconds of plays
+        Space Complexity: O(1)
+        """
+        factor = math.exp((self.epoch - timestamp) / self.tau)
+        for song_id in self.trending:
+            self.trending[song_id] *= factor
+        self.epoch = timestamp
+        self._rebuild_top()
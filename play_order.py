@@ -0,0 +1,121 @@
+# play_order.py
+
+import random
+from bisect import bisect_right
+
+MASK64 = (1 << 64) - 1
+FEISTEL_ROUNDS = 4  # four rounds of a Feistel network give a good pseudo-random permutation
+
+# this class plays a playlist in a random order without shuffling it: every song comes up once
+# per cycle, and the order is produced one song at a time, so nothing is done up front
+# pinned songs are played at their own position (the 5th song played is the song pinned at 5)
+# two ways to pick the next position, both O(1) per song:
+#   "fisher_yates" - the classic shuffle run one step at a time over a virtual array of
+#                    positions; only positions that were swapped are stored (a dict that
+#                    grows with the songs played so far)
+#   "feistel"      - a keyed permutation of [0, n) (a small block cipher with cycle walking),
+#                    the next position is computed from the step number alone, O(1) memory
+# fetching the song at a position is Playlist.get, O(log n)
+# changes to the playlist during a cycle are not followed, start a new cycle after editing it
+class ShuffledOrder:
+    def __init__(self, playlist, seed=None, method="fisher_yates"):
+        if method not in ("fisher_yates", "feistel"):
+            raise ValueError("method must be 'fisher_yates' or 'feistel'")
+        self.playlist = playlist
+        self.method = method
+        self.rng = random.Random(seed)
+        self.size = None      # playlist size, read when the first song is asked for
+        self.pinned = None    # sorted positions of the pinned songs
+        self.shifts = None    # pinned[i] - i, maps the k-th free position past the pins
+        self.free = 0         # number of unpinned positions
+        self.step = 0         # songs played so far in this cycle
+        self.free_step = 0    # unpinned songs played so far
+        self.next_pin = 0     # index in self.pinned of the next pinned position to come up
+        self.swaps = {}       # fisher_yates: virtual array slot -> position, only for moved slots
+        self.keys = None      # feistel: round keys
+        self.half_bits = 0    # feistel: bits per half of the block
+
+    def __iter__(self):
+        return self
+
+    # returns the next song of the cycle
+    def __next__(self):
+        """
+        Time Complexity: O(log n) (O(1) to pick the position, O(log n) to fetch the song)
+        Space Complexity: O(1) for feistel, O(1) amortized for fisher_yates
+        """
+        if self.size is None:
+            self._start()
+        while self.step < self.size:
+            position = self._next_position()
+            self.step += 1
+            song = self.playlist.get(position)
+            if song is not None:
+                return song
+        raise StopIteration
+
+    # songs left in this cycle
+    def __len__(self):
+        return (self.playlist.size if self.size is None else self.size) - self.step
+
+    # reads the playlist size and the pinned positions, on the first song
+    def _start(self):
+        """
+        Time Complexity: O(p log n), p = pinned songs
+        Space Complexity: O(p)
+        """
+        playlist = self.playlist
+        self.size = playlist.size
+        self.pinned = sorted(playlist.index_of(song) for song in playlist.pinned_songs)
+        self.shifts = [position - i for i, position in enumerate(self.pinned)]
+        self.free = self.size - len(self.pinned)
+        if self.method == "feistel":
+            self.half_bits = max(1, (max(self.free - 1, 1).bit_length() + 1) // 2)
+            self.keys = [self.rng.getrandbits(64) for _ in range(FEISTEL_ROUNDS)]
+
+    # the position (0-based) of the next song to play
+    def _next_position(self):
+        # a pinned song is played when its own position comes up
+        if self.next_pin < len(self.pinned) and self.pinned[self.next_pin] == self.step:
+            self.next_pin += 1
+            return self.step
+
+        if self.method == "fisher_yates":
+            rank = self._fisher_yates_step()
+        else:
+            rank = self._feistel(self.free_step)
+        self.free_step += 1
+
+        # the rank-th unpinned position: skip the pinned positions at or before it
+        return rank + bisect_right(self.shifts, rank)
+
+    # one step of Fisher-Yates over a virtual array [0, 1, ..., free - 1]
+    def _fisher_yates_step(self):
+        i = self.free_step
+        j = self.rng.randrange(i, self.free)
+        swaps = self.swaps
+        chosen = swaps.get(j, j)
+        # slot i is never read again, so its value moves to j and i is forgotten
+        swaps[j] = swaps.pop(i, i)
+        return chosen
+
+    # maps i in [0, free) to its place in the permutation
+    # the Feistel network permutes [0, 4 ** half_bits), which is less than 4 times larger than
+    # the range, so re-applying it until the value falls inside takes fewer than 4 tries on average
+    def _feistel(self, i):
+        bits = self.half_bits
+        mask = (1 << bits) - 1
+        value = i
+        while True:
+            left, right = value >> bits, value & mask
+            for key in self.keys:
+                left, right = right, left ^ (_mix(right ^ key) & mask)
+            value = (left << bits) | right
+            if value < self.free:
+                return value
+
+# a 64-bit integer mixing function (the splitmix64 finalizer), the round function of the network
+def _mix(x):
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
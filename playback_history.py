@@ -1,49 +1,306 @@
 # playback_history.py
 
+import struct
+import tempfile
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from song_registry import default_registry
+
+HISTORY_CAPACITY = 10_000          # plays kept in memory, older ones are moved to disk
+RECORD = struct.Struct("<IdI")     # one play on disk: song id, timestamp, previous play of the song
+READ_BLOCK = 4096                  # records read from disk at a time when paging back
+NO_PLAY = 0xFFFFFFFF               # "no previous play" marker in the previous-play column
+
 # first we define a class to manage the playback history using a stack
+# the newest plays live in a fixed-size ring buffer (typed arrays: song ids, timestamps, ...),
+# so memory stays bounded however long PlayWise runs; when the buffer is full its older half
+# is appended to a file on disk in one write, and undo reads it back in blocks when needed
+# the registry turns the stored song ids back into songs when they are shown
+# timestamps never go backwards, so the timestamp column is sorted and time queries use
+# binary search; every play also stores the position of the previous play of the same song,
+# which chains a song's plays together without a per-play index in memory
 class PlaybackHistory:
-    def __init__(self):
-        self.stack = []  # stack to store recently played songs
-# this function is called when a song is played
-    def play_song(self, song):
+    def __init__(self, registry=None, capacity=HISTORY_CAPACITY, spill_path=None):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.registry = registry if registry is not None else default_registry  # song id -> song
+        self.capacity = capacity
+        self.song_ids = array('I', bytes(4 * capacity))  # ring buffer of played song ids
+        self.times = array('d', bytes(8 * capacity))     # ring buffer of play timestamps (seconds)
+        self.prev_plays = array('I', bytes(4 * capacity))  # ring buffer of previous-play positions
+        self.last_play = {}           # song id -> position of its newest play
+        self.start = 0                # ring slot of the oldest play still in memory
+        self.count = 0                # plays in memory
+        self.spill_path = spill_path  # file for older plays (an anonymous temp file if None)
+        self.spill_file = None        # opened on the first spill
+        self.spilled = 0              # plays on disk
+        self.listeners = []           # called as listener(song_id, timestamp, count) on play (+1) and undo (-1)
+
+    # this function is called when a song is played
+    def play_song(self, song, timestamp=None):
         """
-        Time Complexity: O(1)
+        Time Complexity: O(1) amortized
         Space Complexity: O(1)
         """
-        self.stack.append(song)  # push the song onto the stack
+        self.record_play(self.registry.register(song), timestamp)
         print(f"🎧 Now playing: {song.title} by {song.artist}")
 
+    # registers a function that is told about every play and undo (e.g. PlayAnalytics.record)
+    def subscribe(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # records a play by song id without printing (timestamp defaults to now)
+    # a timestamp older than the newest play is raised to it, so the column stays sorted
+    def record_play(self, song_id, timestamp=None):
+        """
+        Time Complexity: O(1) amortized (a spill writes capacity / 2 plays once per capacity / 2 plays)
+        Space Complexity: O(1)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if self.count:
+            timestamp = max(timestamp, self.times[(self.start + self.count - 1) % self.capacity])
+        elif self.spilled:
+            timestamp = max(timestamp, self._record(self.spilled - 1)[1])
+
+        if self.count == self.capacity:
+            self._spill(self.capacity // 2)
+        slot = (self.start + self.count) % self.capacity
+        self.song_ids[slot] = song_id
+        self.times[slot] = timestamp
+        self.prev_plays[slot] = self.last_play.get(song_id, NO_PLAY)
+        self.last_play[song_id] = len(self)
+        self.count += 1
+        for listener in self.listeners:
+            listener(song_id, timestamp, 1)
+
     # this function undoes the last played song and returns it
+    # (None if the song has been deleted since it was played)
     def undo_last_play(self):
         """
-        Time Complexity: O(1)
+        Time Complexity: O(1) amortized
         Space Complexity: O(1)
         """
-        if not self.stack:
+        if self.count == 0 and self.spilled:
+            self._unspill(min(self.spilled, self.capacity // 2))
+        if self.count == 0:
             print("⚠️ No recently played songs to undo.")
             return None
 
-        # pop the last played song from the stack
-        last_song = self.stack.pop()
+        # pop the last played song from the top of the ring
+        self.count -= 1
+        slot = (self.start + self.count) % self.capacity
+        song_id = self.song_ids[slot]
+        if self.prev_plays[slot] == NO_PLAY:
+            del self.last_play[song_id]
+        else:
+            self.last_play[song_id] = self.prev_plays[slot]
+        for listener in self.listeners:
+            listener(song_id, self.times[slot], -1)
+        last_song = self.registry.get(song_id)
+        if last_song is None:
+            print("↩️ Undo last play: (a song that has since been deleted)")
+            return None
         print(f"↩️ Undo last play: {last_song.title} by {last_song.artist}")
         return last_song
 
-    # this function displays the current playback history
-    def show_history(self):
+    # number of plays, in memory and on disk
+    def __len__(self):
+        return self.count + self.spilled
+
+    # yields (song id, timestamp) pairs from the newest play back to the oldest, starting
+    # `offset` plays back; plays on disk are read lazily, one block at a time
+    def entries(self, offset=0):
         """
-        Time Complexity: O(n), n = number of played songs
+        Time Complexity: O(1) to start, O(1) per play
+        Space Complexity: O(READ_BLOCK)
+        """
+        for i in range(self.count - 1 - offset, -1, -1):
+            slot = (self.start + i) % self.capacity
+            yield self.song_ids[slot], self.times[slot]
+
+        position = self.spilled - max(0, offset - self.count)  # records on disk still to read
+        while position > 0:
+            block = min(position, READ_BLOCK)
+            records = list(RECORD.iter_unpack(self._read(position - block, block)))
+            for song_id, timestamp, _ in reversed(records):
+                yield song_id, timestamp
+            position -= block
+
+    # ======================
+    # TIME QUERIES (RETURN ITERATORS)
+    # ======================
+
+    # returns the song that was playing at time t (a timestamp in seconds), or None
+    # that is the last play that started at or before t, if the song hadn't ended by then
+    def playing_at(self, t):
+        """
+        Time Complexity: O(log n) (binary search, reads at most log n records from disk)
         Space Complexity: O(1)
         """
-        print("\n📜 Recently Played Songs:")
-        if not self.stack:
+        position = bisect_right(_TimeColumn(self), t) - 1
+        if position < 0:
+            return None
+        song_id, timestamp, _ = self._record(position)
+        song = self.registry.get(song_id)
+        if song is None or t >= timestamp + song.duration:
+            return None
+        return song
+
+    # returns an iterator of (song, timestamp) for the plays with t1 <= timestamp <= t2, oldest first
+    def plays_between(self, t1, t2):
+        """
+        Time Complexity: O(log n) to start, O(1) per play
+        Space Complexity: O(READ_BLOCK)
+        """
+        get = self.registry.get
+        position = bisect_left(_TimeColumn(self), t1)
+        for song_id, timestamp in self.entries_from(position):
+            if timestamp > t2:
+                return
+            song = get(song_id)
+            if song is not None:
+                yield song, timestamp
+
+    # returns an iterator over the timestamps of the last n plays of a song, newest first
+    def last_plays(self, song, n=None):
+        """
+        Time Complexity: O(1) to start, O(1) per play (one record read each for plays on disk)
+        Space Complexity: O(1)
+        """
+        position = self.last_play.get(song if isinstance(song, int) else song.id, NO_PLAY)
+        found = 0
+        while position != NO_PLAY and (n is None or found < n):
+            _, timestamp, position = self._record(position)
+            yield timestamp
+            found += 1
+
+    # yields (song id, timestamp) from a position (0 = oldest play) to the newest play
+    def entries_from(self, position=0):
+        """
+        Time Complexity: O(1) per play
+        Space Complexity: O(READ_BLOCK)
+        """
+        while position < self.spilled:
+            block = min(self.spilled - position, READ_BLOCK)
+            for song_id, timestamp, _ in RECORD.iter_unpack(self._read(position, block)):
+                yield song_id, timestamp
+            position += block
+        for i in range(position - self.spilled, self.count):
+            slot = (self.start + i) % self.capacity
+            yield self.song_ids[slot], self.times[slot]
+
+    # returns the (song id, timestamp, previous play) stored at a position (0 = oldest play)
+    def _record(self, position):
+        if position >= self.spilled:
+            slot = (self.start + position - self.spilled) % self.capacity
+            return self.song_ids[slot], self.times[slot], self.prev_plays[slot]
+        return RECORD.unpack(self._read(position, 1))
+
+    # this function displays one page of the playback history, newest first
+    # it returns True if there are older plays after this page
+    def show_history(self, offset=0, limit=20):
+        """
+        Time Complexity: O(limit), however long the history is
+        Space Complexity: O(READ_BLOCK)
+        """
+        if offset == 0:
+            print("\n📜 Recently Played Songs:")
+        if not len(self):
             print("No songs played yet.")
-        else:
-            # we print the songs in reverse because the last one played is on top
-            for i, song in enumerate(reversed(self.stack), 1):
-                print(f"{i}. {song.title} by {song.artist}")
-                
-    # this function provides a menu interface to interact with the playback stack
-def handle_playback_history(playlist, history):
+            return False
+
+        get = self.registry.get
+        shown = 0
+        for position, (song_id, timestamp) in enumerate(self.entries(offset), offset + 1):
+            song = get(song_id)
+            played = time.strftime("%H:%M:%S", time.localtime(timestamp))
+            print(f"{position}. {song.title} by {song.artist} ({played})" if song
+                  else f"{position}. (deleted song) ({played})")
+            shown += 1
+            if shown == limit:
+                break
+        return offset + shown < len(self)
+
+    # closes the spill file (an anonymous one is deleted)
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+    # ======================
+    # DISK SPILL
+    # ======================
+
+    # the spill file, opened on first use
+    def _file(self):
+        if self.spill_file is None:
+            if self.spill_path is None:
+                self.spill_file = tempfile.TemporaryFile()
+            else:
+                self.spill_file = open(self.spill_path, "w+b")
+        return self.spill_file
+
+    # appends the n oldest plays in memory to the spill file in one write
+    def _spill(self, n):
+        """
+        Time Complexity: O(n)
+        Space Complexity: O(n)
+        """
+        buffer = bytearray(RECORD.size * n)
+        for i in range(n):
+            slot = (self.start + i) % self.capacity
+            RECORD.pack_into(buffer, i * RECORD.size, self.song_ids[slot], self.times[slot], self.prev_plays[slot])
+
+        file = self._file()
+        file.seek(self.spilled * RECORD.size)
+        file.write(buffer)
+        self.start = (self.start + n) % self.capacity
+        self.count -= n
+        self.spilled += n
+
+    # moves the n newest plays on disk back into the (empty) ring and cuts them off the file
+    def _unspill(self, n):
+        """
+        Time Complexity: O(n)
+        Space Complexity: O(n)
+        """
+        data = self._read(self.spilled - n, n)
+        self.spilled -= n
+        self.spill_file.truncate(self.spilled * RECORD.size)
+        self.start = 0
+        for i, (song_id, timestamp, prev_play) in enumerate(RECORD.iter_unpack(data)):
+            self.song_ids[i] = song_id
+            self.times[i] = timestamp
+            self.prev_plays[i] = prev_play
+        self.count = n
+
+    # reads `count` records starting at record `first` of the spill file
+    def _read(self, first, count):
+        file = self._file()
+        file.seek(first * RECORD.size)
+        return file.read(count * RECORD.size)
+
+# read-only view of the timestamp column as a sequence, so bisect can search it directly
+class _TimeColumn:
+    def __init__(self, history):
+        self.history = history
+
+    def __len__(self):
+        return len(self.history)
+
+    def __getitem__(self, position):
+        return self.history._record(position)[1]
+
+# this function provides a menu interface to interact with the playback stack
+def handle_playback_history(playlist, history, analytics=None):
     while True:
         # Time Complexity: O(1) per menu operation (except play/show/undo which depend on PlaybackHistory methods)
         # Space Complexity: O(1)
@@ -51,6 +308,12 @@ def handle_playback_history(playlist, history):
         print("1. Play a Song")
         print("2. Undo Last Played Song")
         print("3. Show Playback History")
+        print("4. What Was Playing N Minutes Ago")
+        print("5. Plays in the Last N Minutes")
+        print("6. When Was a Song Last Played")
+        if analytics:
+            print("7. Most Played Songs")
+            print("8. Trending Songs")
         print("0. Back to Main Menu")
 
         choice = input("Enter your choice: ")
@@ -59,10 +322,7 @@ def handle_playback_history(playlist, history):
             playlist.display()
             try:
                 index = int(input("Enter index of song to play: ")) - 1
-                current = playlist.head
-                for _ in range(index):
-                    if current:
-                        current = current.next
+                current = playlist.get(index)
                 if current:
                     history.play_song(current)
                 else:
@@ -76,7 +336,71 @@ def handle_playback_history(playlist, history):
                 print("No song to undo.")
 
         elif choice == "3":
-            history.show_history()
+            # one page at a time, older pages are only read when asked for
+            offset = 0
+            while history.show_history(offset):
+                offset += 20
+                if input("Press Enter for older plays, or 0 to stop: ").strip() == "0":
+                    break
+
+        elif choice == "4":
+            try:
+                minutes = float(input("How many minutes ago: "))
+                song = history.playing_at(time.time() - minutes * 60)
+                if song:
+                    print(f"🎧 {song.title} by {song.artist} was playing.")
+                else:
+                    print("🔇 Nothing was playing then.")
+            except ValueError:
+                print("❌ Please enter a valid number.")
+
+        elif choice == "5":
+            try:
+                minutes = float(input("Show plays from the last how many minutes: "))
+                now = time.time()
+                found = False
+                for song, timestamp in history.plays_between(now - minutes * 60, now):
+                    played = time.strftime("%H:%M:%S", time.localtime(timestamp))
+                    print(f"  {played}  {song.title} by {song.artist}")
+                    found = True
+                if not found:
+                    print("No plays in that time.")
+            except ValueError:
+                print("❌ Please enter a valid number.")
+
+        elif choice == "6":
+            playlist.display()
+            try:
+                current = playlist.get(int(input("Enter index of song: ")) - 1)
+                if not current:
+                    print("❌ Invalid song index.")
+                    continue
+                times = [time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+                         for timestamp in history.last_plays(current, 5)]
+                if times:
+                    print(f"🕒 Last plays of {current.title}: " + ", ".join(times))
+                else:
+                    print(f"{current.title} hasn't been played yet.")
+            except ValueError:
+                print("❌ Please enter a valid number.")
+
+        elif choice == "7" and analytics:
+            top = analytics.top_played(10)
+            if not top:
+                print("No songs played yet.")
+                continue
+            print("\n🏆 Most Played Songs:")
+            for rank, (song, plays) in enumerate(top, 1):
+                print(f"{rank}. {song.title} by {song.artist} ({plays} plays)")
+
+        elif choice == "8" and analytics:
+            top = analytics.top_trending(10)
+            if not top:
+                print("No songs played yet.")
+                continue
+            print("\n🔥 Trending Songs:")
+            for rank, (song, score) in enumerate(top, 1):
+                print(f"{rank}. {song.title} by {song.artist} (score {score:.2f})")
 
         elif choice == "0":
             break
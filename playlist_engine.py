@@ -1,26 +1,136 @@
 # playlist_engine.py
 
+import csv
+import gc
+import random
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+from playlist_events import INSERT, DELETE, MOVE, REORDER, REVERSE, UPDATE, PIN, PlaylistEvent, merge_events
+from song_registry import default_registry
+from sorted_view import SortedView
+
+# numpy is optional, bulk imports use it to parse durations in one vectorized step
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BULK_CHUNK_SIZE = 50_000  # rows parsed together by add_songs / load_csv
+
 # first we define the structure of a single song node in a doubly linked list
+# each node is also a node of an implicit treap (a randomized balanced tree ordered
+# by position), which lets us reach the i-th song in O(log n) instead of walking the list
+# __slots__ removes the per-node __dict__, which is most of the memory of a small object
 class SongNode:
+    __slots__ = ("id", "title", "artist", "duration", "pinned", "prev", "next",
+                 "left", "right", "parent", "priority", "count")
+
     def __init__(self, title, artist, duration):
+        self.id = None            # stable integer id, given by a SongRegistry
         self.title = title
-        self.artist = artist
+        # interning shares one string object between the songs of an artist
+        # (titles are almost all different, so interning them would only cost time)
+        self.artist = sys.intern(artist)
         self.duration = duration  # duration stored as seconds
+        self.pinned = False       # pinned songs keep their position when shuffling
         self.prev = None
         self.next = None
+        self.left = None                   # left child in the position tree
+        self.right = None                  # right child in the position tree
+        self.parent = None                 # parent in the position tree
+        self.priority = random.random()    # random heap priority that keeps the tree balanced
+        self.count = 1                     # number of songs in this node's subtree
+
+# small helper that returns the subtree size of a (possibly missing) tree node
+def _count(node):
+    return node.count if node else 0
+
+# parses a batch of "mm:ss" strings into seconds, invalid (or negative) entries become 0
+# this is the quiet, batch version of Playlist._parse_duration used for bulk imports
+def parse_durations(values):
+    """
+    Time Complexity: O(k), k = number of values
+    Space Complexity: O(k)
+    """
+    if np is not None and len(values) > 1:
+        parsed = _parse_durations_numpy(values)
+        if parsed is not None:
+            return parsed
+
+    result = []
+    for value in values:
+        minutes, sep, seconds = value.partition(":")
+        try:
+            minutes, seconds = int(minutes), int(seconds)
+        except ValueError:
+            result.append(0)
+            continue
+        result.append(minutes * 60 + seconds if sep and minutes >= 0 and seconds >= 0 else 0)
+    return result
+
+# vectorized duration parsing, returns None if the batch has a malformed entry
+# so that the caller can fall back to the row-by-row parser
+def _parse_durations_numpy(values):
+    """
+    Time Complexity: O(k)
+    Space Complexity: O(k)
+    """
+    parts = np.char.partition(np.char.strip(np.asarray(values, dtype=str)), ":")
+    if not (parts[:, 1] == ":").all():
+        return None
+    try:
+        minutes = parts[:, 0].astype(np.int64)
+        seconds = parts[:, 2].astype(np.int64)
+    except ValueError:
+        return None
+    if (minutes < 0).any() or (seconds < 0).any():
+        return None
+    return (minutes * 60 + seconds).tolist()
 
 # then we define the structure of the playlist itself which is a doubly linked list
+# every song is registered in a SongRegistry, which gives it the id other modules refer to it by
+# indexes kept outside the playlist (lookup, ratings) subscribe to its changes, so every
+# add/delete/move/reorder/update reaches them as an event and they update themselves incrementally
 class Playlist:
-    def __init__(self, name="My Playlist"):
-        self.head = None         # points to the first song
-        self.tail = None         # points to the last song
+    def __init__(self, name="My Playlist", registry=None):
+        self.head = None         # points to the first song (in physical order)
+        self.tail = None         # points to the last song (in physical order)
+        self.root = None         # root of the position tree over the same nodes
         self.name = name         # name of the playlist
         self.size = 0            # number of songs in the playlist
+        self.reversed = False    # when True, the playlist is read from tail to head
+        self.views = {}          # field -> SortedView, kept in sync by add/insert/delete
+        self.registry = registry if registry is not None else default_registry  # song id -> song
+        self.listeners = []      # callables that receive a list of PlaylistEvents
+        self.batch_depth = 0     # > 0 while inside batch(), events are held back
+        self.pending = []        # events held back by batch()
+        self.pinned_songs = {}   # pinned song nodes (an ordered set), so shuffles don't search for them
+
+    # walks the songs in playlist order, honoring the reversal flag
+    def __iter__(self):
+        """
+        Time Complexity: O(n)
+        Space Complexity: O(1)
+        """
+        if self.reversed:
+            current = self.tail
+            while current:
+                yield current
+                current = current.prev
+        else:
+            current = self.head
+            while current:
+                yield current
+                current = current.next
 
     # helper function to convert "mm:ss" string to seconds
     def _parse_duration(self, duration_str):
         try:
             minutes, seconds = map(int, duration_str.strip().split(":"))
+            if minutes < 0 or seconds < 0:
+                raise ValueError("negative duration")
             return minutes * 60 + seconds
         except Exception:
             print("❌ Invalid duration format. Use mm:ss (e.g., 1:30).")
@@ -32,148 +142,649 @@ class Playlist:
         sec = seconds % 60
         return f"{minutes}:{sec:02d}"
 
-    # this adds a new song to the end of the playlist
-    def add_song(self, title, artist, duration):
+    # ======================
+    # POSITION TREE HELPERS
+    # ======================
+
+    # rotates a node above its parent while keeping the in-order (playlist) order intact
+    def _rotate_up(self, node):
         """
         Time Complexity: O(1)
         Space Complexity: O(1)
         """
-        duration_sec = self._parse_duration(duration)  # convert "mm:ss" to seconds
-        if duration_sec == 0:
-            return  # invalid format, skip adding
-
-        new_node = SongNode(title, artist, duration_sec)
-
-        if self.head is None:
-            self.head = self.tail = new_node
+        parent = node.parent
+        grand = parent.parent
+
+        if parent.left is node:
+            parent.left = node.right
+            if node.right:
+                node.right.parent = parent
+            node.right = parent
+        else:
+            parent.right = node.left
+            if node.left:
+                node.left.parent = parent
+            node.left = parent
+
+        parent.parent = node
+        node.parent = grand
+        if grand is None:
+            self.root = node
+        elif grand.left is parent:
+            grand.left = node
         else:
-            self.tail.next = new_node
-            new_node.prev = self.tail
-            self.tail = new_node
+            grand.right = node
 
-        self.size += 1
-        print(f"✅ Added: {title} by {artist} to '{self.name}' ({self._format_duration(duration_sec)})")
+        # the old parent is now below the node, so its count is fixed first
+        parent.count = 1 + _count(parent.left) + _count(parent.right)
+        node.count = 1 + _count(node.left) + _count(node.right)
 
-    # deletes the song at a given index (0-based)
-    def delete_song(self, index):
+    # places a node into the position tree just before `before` (or at the end if None)
+    def _tree_insert(self, node, before):
         """
-        Time Complexity: O(n), n = index (worst case: delete last song)
+        Time Complexity: O(log n) expected
         Space Complexity: O(1)
         """
-        if index < 0 or index >= self.size:
-            print("❌ Invalid index. No song deleted.")
+        if self.root is None:
+            self.root = node
             return
 
-        current = self.head
-        for _ in range(index):
-            current = current.next
-
-        # unlink the node
-        if current.prev:
-            current.prev.next = current.next
+        # the in-order neighbours of a position are exactly its linked list neighbours,
+        # so the free child slot for the new node is found without searching
+        if before is None:
+            parent = self.tail
+            parent.right = node
+        elif before.left is None:
+            parent = before
+            parent.left = node
         else:
-            self.head = current.next  # deleting the head
+            parent = before.prev
+            parent.right = node
+        node.parent = parent
 
-        if current.next:
-            current.next.prev = current.prev
-        else:
-            self.tail = current.prev  # deleting the tail
+        ancestor = parent
+        while ancestor:
+            ancestor.count += 1
+            ancestor = ancestor.parent
 
-        self.size -= 1
-        print(f"🗑️ Deleted song: {current.title} by {current.artist} from '{self.name}'.")
+        # restore the heap order on priorities
+        while node.parent and node.parent.priority < node.priority:
+            self._rotate_up(node)
 
-    # moves a song from one index to another
-    def move_song(self, from_index, to_index):
+    # removes a node from the position tree
+    def _tree_remove(self, node):
         """
-        Time Complexity: O(n), n = max(from_index, to_index)
+        Time Complexity: O(log n) expected
         Space Complexity: O(1)
         """
-        if from_index == to_index:
-            print("ℹ️ Song is already at the desired position.")
-            return
-        if from_index < 0 or from_index >= self.size or to_index < 0 or to_index >= self.size:
-            print("❌ Invalid indices. Cannot move song.")
-            return
+        # push the node down until it has at most one child
+        while node.left and node.right:
+            if node.left.priority > node.right.priority:
+                self._rotate_up(node.left)
+            else:
+                self._rotate_up(node.right)
+
+        child = node.left or node.right
+        parent = node.parent
+        if child:
+            child.parent = parent
+        if parent is None:
+            self.root = child
+        elif parent.left is node:
+            parent.left = child
+        else:
+            parent.right = child
 
-        # locate the node to move
-        current = self.head
-        for _ in range(from_index):
-            current = current.next
+        while parent:
+            parent.count -= 1
+            parent = parent.parent
 
-        # unlink the node from its current position
-        if current.prev:
-            current.prev.next = current.next
+        node.left = node.right = node.parent = None
+        node.count = 1
+
+    # links a node into the list and the tree just before `before` (or at the end if None)
+    def _link_before(self, node, before):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        self._tree_insert(node, before)
+
+        if before is None:
+            node.prev = self.tail
+            node.next = None
+            if self.tail:
+                self.tail.next = node
+            else:
+                self.head = node
+            self.tail = node
         else:
-            self.head = current.next
+            node.prev = before.prev
+            node.next = before
+            if before.prev:
+                before.prev.next = node
+            else:
+                self.head = node
+            before.prev = node
+
+        self.size += 1
+
+    # unlinks a node from both the list and the tree
+    def _unlink(self, node):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        self._tree_remove(node)
 
-        if current.next:
-            current.next.prev = current.prev
+        if node.prev:
+            node.prev.next = node.next
         else:
-            self.tail = current.prev
-
-        # reinsert at the new position
-        if to_index == 0:
-            current.next = self.head
-            current.prev = None
-            if self.head:
-                self.head.prev = current # pyright: ignore[reportAttributeAccessIssue]
-            self.head = current
+            self.head = node.next
+
+        if node.next:
+            node.next.prev = node.prev
         else:
-            temp = self.head
-            for _ in range(to_index - 1):
-                temp = temp.next
+            self.tail = node.prev
 
-            current.next = temp.next
-            current.prev = temp
-            if temp.next:
-                temp.next.prev = current
-            temp.next = current
+        node.prev = node.next = None
+        self.size -= 1
 
-            if current.next is None:
-                self.tail = current
+    # relinks the playlist so that it follows the order of `nodes` (all songs of this playlist)
+    # this is a single O(n) pass, used by code that computes a new order outside the list
+    def relink(self, nodes):
+        """
+        Time Complexity: O(n)
+        Space Complexity: O(n) for the index rebuild
+        """
+        prev = None
+        for node in nodes:
+            node.prev = prev
+            if prev:
+                prev.next = node
+            else:
+                self.head = node
+            prev = node
+
+        if prev is None:
+            self.head = None
+        else:
+            prev.next = None
+        self.tail = prev
+        self.reversed = False
+        self.rebuild_index()
+        self.publish(REORDER)
+
+    # rebuilds the position tree from the current linked list order
+    # this is needed after code (like sorting) relinks the nodes directly
+    def rebuild_index(self):
+        """
+        Time Complexity: O(n)
+        Space Complexity: O(n)
+        """
+        self.root = None
+        self.size = 0
+        stack = []  # right spine of the tree built so far
 
-        print(f"🔀 Moved: {current.title} by {current.artist} to position {to_index + 1}")
+        # build a treap from the in-order sequence using the classic stack method
+        current = self.head
+        while current:
+            current.left = current.right = current.parent = None
+            last = None
+            while stack and stack[-1].priority < current.priority:
+                last = stack.pop()
+            if last:
+                current.left = last
+                last.parent = current
+            if stack:
+                stack[-1].right = current
+                current.parent = stack[-1]
+            stack.append(current)
+            current = current.next
+            self.size += 1
 
-    # reverses the entire playlist
-    def reverse_playlist(self):
+        if not stack:
+            return
+        self.root = stack[0]
+
+        # fix subtree counts children-first (reverse of a pre-order walk)
+        order = []
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            if node.left:
+                pending.append(node.left)
+            if node.right:
+                pending.append(node.right)
+        for node in reversed(order):
+            node.count = 1 + _count(node.left) + _count(node.right)
+
+    # ======================
+    # SORTED VIEWS
+    # ======================
+
+    # returns a view of the songs sorted by a field ('title', 'artist' or 'duration')
+    # the view is built on first use and then updated on every add/insert/delete,
+    # so reading the playlist in sorted order never re-sorts it or changes the play order
+    def sorted_view(self, field):
+        """
+        Time Complexity: O(n log n) on first use, O(1) afterwards
+        Space Complexity: O(n) per view
+        """
+        view = self.views.get(field)
+        if view is None:
+            view = self.views[field] = SortedView(field, self)
+        return view
+
+    # ======================
+    # CHANGE EVENTS
+    # ======================
+
+    # registers a listener, it will be called with a list of PlaylistEvents after every change
+    # (subscribing the same listener twice has no effect)
+    def subscribe(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # reports a change to every listener, or holds it back while a batch is open
+    def publish(self, kind, songs=(), old_values=None):
+        """
+        Time Complexity: O(l), l = number of listeners (plus their own work)
+        Space Complexity: O(1)
+        """
+        if not self.listeners:
+            return
+        event = PlaylistEvent(kind, songs, old_values)
+        if self.batch_depth:
+            self.pending.append(event)
+            return
+        for listener in self.listeners:
+            listener([event])
+
+    # groups the events of many changes, listeners get them in a single call when the batch ends
+    # consecutive events of the same kind are merged into one (e.g. one INSERT with every new song)
+    @contextmanager
+    def batch(self):
+        """
+        Time Complexity: O(e), e = events in the batch
+        Space Complexity: O(e)
         """
-        Time Complexity: O(n), n = number of songs
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth and self.pending:
+                events, self.pending = merge_events(self.pending), []
+                for listener in self.listeners:
+                    listener(events)
+
+    # ======================
+    # PUBLIC PLAYLIST API
+    # ======================
+
+    # physically reverses the nodes if the playlist is only flagged as reversed
+    # code that works on head/next directly (like sorting) calls this first
+    def materialize_order(self):
+        """
+        Time Complexity: O(n) if the playlist is flagged as reversed, O(1) otherwise
         Space Complexity: O(1)
         """
+        if not self.reversed:
+            return
+
         current = self.head
         prev = None
         self.tail = self.head  # the old head becomes the new tail
 
+        # mirroring the position tree reverses its in-order as well, counts stay valid
         while current:
             next_node = current.next
             current.next = current.prev
             current.prev = next_node
+            current.left, current.right = current.right, current.left
             prev = current
             current = next_node
 
         self.head = prev
+        self.reversed = False
+
+    # returns the song node at a given index (0-based), or None if the index is invalid
+    def get(self, index):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        if index < 0 or index >= self.size:
+            return None
+        if self.reversed:
+            index = self.size - 1 - index
+        return self._node_at(index)
+
+    # returns the node at a physical (head-based) index, or None if index == size
+    def _node_at(self, index):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        node = self.root
+        while node:
+            left_count = _count(node.left)
+            if index < left_count:
+                node = node.left
+            elif index == left_count:
+                return node
+            else:
+                index -= left_count + 1
+                node = node.right
+        return None
+
+    # returns the current index (0-based) of a song node in this playlist
+    def index_of(self, node):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        index = _count(node.left)
+        while node.parent:
+            if node.parent.right is node:
+                index += _count(node.parent.left) + 1
+            node = node.parent
+        return self.size - 1 - index if self.reversed else index
+
+    # pins or unpins a song, pinned songs keep their position when the playlist is shuffled
+    # returns False if the song already had that state
+    def set_pinned(self, song, pinned=True):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        pinned = bool(pinned)
+        if (song in self.pinned_songs) == pinned:
+            return False
+        song.pinned = pinned
+        if pinned:
+            self.pinned_songs[song] = None
+        else:
+            self.pinned_songs.pop(song, None)
+        self.publish(PIN, [song])
+        return True
+
+    # links a node so that it ends up at the given index (0-based) in playlist order
+    def _insert_at(self, node, index):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        if self.reversed:
+            index = self.size - index
+        self._link_before(node, self._node_at(index))
+
+    # this adds a new song to the end of the playlist
+    def add_song(self, title, artist, duration):
+        """
+        Time Complexity: O(log n) expected (tree bookkeeping, list append itself is O(1))
+        Space Complexity: O(1)
+        """
+        duration_sec = self._parse_duration(duration)  # convert "mm:ss" to seconds
+        if duration_sec == 0:
+            return  # invalid format, skip adding
+
+        new_node = SongNode(title, artist, duration_sec)
+        self.registry.register(new_node)
+        self._insert_at(new_node, self.size)
+        for view in self.views.values():
+            view.add(new_node)
+        self.publish(INSERT, [new_node])
+        print(f"✅ Added: {title} by {artist} to '{self.name}' ({self._format_duration(duration_sec)})")
+        return new_node
+
+    # this adds many songs at once from any iterable of (title, artist, "mm:ss") rows
+    # rows are consumed in chunks, so a generator or an open file is never fully materialized
+    # if a lookup is given, each song is indexed there in the same pass
+    # subscribers get one INSERT event per chunk instead of one per song
+    def add_songs(self, rows, lookup=None):
+        """
+        Time Complexity: O(n), n = number of rows (one index rebuild instead of n inserts)
+        Space Complexity: O(n) for the new nodes, O(chunk) for parsing
+        """
+        # new rows are appended at the physical tail, so a pending reversal is applied first
+        self.materialize_order()
+
+        rows = iter(rows)
+        index_song = lookup.index_song if lookup is not None else None
+        views = list(self.views.values())
+        added = 0
+        skipped = 0
+        chunks = []  # new nodes per chunk, published once the position tree is rebuilt
+
+        # millions of new nodes would trigger the cyclic garbage collector over and over,
+        # and none of them can be garbage yet, so it is paused during the import
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while True:
+                chunk = list(islice(rows, BULK_CHUNK_SIZE))
+                if not chunk:
+                    break
+                valid = [row for row in chunk if len(row) == 3]
+                skipped += len(chunk) - len(valid)
+
+                durations = parse_durations([row[2] for row in valid])
+                nodes = [SongNode(title, artist, duration_sec)
+                         for (title, artist, _), duration_sec in zip(valid, durations) if duration_sec]
+                skipped += len(valid) - len(nodes)
+                self.registry.register_many(nodes)
+
+                tail = self.tail
+                for node in nodes:
+                    # append to the list only, the position tree is rebuilt once at the end
+                    node.prev = tail
+                    if tail:
+                        tail.next = node
+                    else:
+                        self.head = node
+                    tail = node
+
+                    if index_song:
+                        index_song(node)
+                    for view in views:
+                        view.add(node)
+                    added += 1
+                self.tail = tail
+                if self.listeners:
+                    chunks.append(nodes)
+
+            if added:
+                self.rebuild_index()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        # listeners may ask for positions (index_of), so they hear about the songs only now
+        for nodes in chunks:
+            self.publish(INSERT, nodes)
+
+        print(f"✅ Added {added} songs to '{self.name}'" + (f" ({skipped} invalid rows skipped)" if skipped else ""))
+        return added
+
+    # puts back song nodes that already have their ids (used when a journal is replayed)
+    # they end up at positions index, index + 1, ...; at the end they are linked in one pass
+    def restore_songs(self, songs, index=None):
+        """
+        Time Complexity: O(k) at the end (one index rebuild), O(k log n) in the middle
+        Space Complexity: O(n) at the end, O(1) in the middle
+        """
+        if index is None or index >= self.size:
+            self.materialize_order()
+            tail = self.tail
+            for node in songs:
+                node.prev = tail
+                if tail:
+                    tail.next = node
+                else:
+                    self.head = node
+                tail = node
+            self.tail = tail
+            self.rebuild_index()
+        else:
+            for offset, node in enumerate(songs):
+                self._insert_at(node, index + offset)
+
+        for view in self.views.values():
+            for node in songs:
+                view.add(node)
+        self.publish(INSERT, songs)
+
+    # this loads songs from a CSV file with title, artist, duration (mm:ss) columns
+    # a header row is detected and skipped
+    def load_csv(self, path, lookup=None):
+        """
+        Time Complexity: O(n), n = number of rows
+        Space Complexity: O(n) for the new nodes, rows are streamed from disk
+        """
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            first = next(reader, None)
+            if first is None:
+                print(f"⚠️ '{path}' is empty. No songs added.")
+                return 0
+
+            rows = reader
+            if not (len(first) == 3 and first[2].strip().lower() == "duration"):
+                rows = _prepend(first, reader)
+            return self.add_songs(rows, lookup)
+
+    # this inserts a new song so that it ends up at the given index (0-based)
+    def insert_song(self, index, title, artist, duration):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        if index < 0 or index > self.size:
+            print("❌ Invalid index. No song inserted.")
+            return None
+
+        duration_sec = self._parse_duration(duration)
+        if duration_sec == 0:
+            return None
+
+        new_node = SongNode(title, artist, duration_sec)
+        self.registry.register(new_node)
+        self._insert_at(new_node, index)
+        for view in self.views.values():
+            view.add(new_node)
+        self.publish(INSERT, [new_node])
+        print(f"✅ Inserted: {title} by {artist} at position {index + 1} in '{self.name}'")
+        return new_node
+
+    # deletes the song at a given index (0-based)
+    def delete_song(self, index):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        current = self.get(index)
+        if current is None:
+            print("❌ Invalid index. No song deleted.")
+            return
+
+        self._unlink(current)
+        for view in self.views.values():
+            view.remove(current)
+        self.pinned_songs.pop(current, None)
+        self.publish(DELETE, [current])
+        self.registry.remove(current.id)
+        print(f"🗑️ Deleted song: {current.title} by {current.artist} from '{self.name}'.")
+
+    # moves a song from one index to another
+    def move_song(self, from_index, to_index):
+        """
+        Time Complexity: O(log n) expected
+        Space Complexity: O(1)
+        """
+        if from_index == to_index:
+            print("ℹ️ Song is already at the desired position.")
+            return
+        if from_index < 0 or from_index >= self.size or to_index < 0 or to_index >= self.size:
+            print("❌ Invalid indices. Cannot move song.")
+            return
+
+        # take the node out, then put it back so that it lands on to_index
+        # (sorted views don't depend on the play order, so they need no update here)
+        current = self.get(from_index)
+        self._unlink(current)
+        self._insert_at(current, to_index)
+        self.publish(MOVE, [current])
+
+        print(f"🔀 Moved: {current.title} by {current.artist} to position {to_index + 1}")
+
+    # reverses the entire playlist
+    # only a direction flag is flipped, the nodes are reversed lazily by materialize_order()
+    def reverse_playlist(self):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        self.reversed = not self.reversed
+        self.publish(REVERSE)
         print("🔁 Playlist reversed.")
 
+    # changes the title, artist and/or duration (in seconds) of a song in place
+    # the fields left as None keep their value; returns False if nothing changed
+    def update_song(self, song, title=None, artist=None, duration=None):
+        """
+        Time Complexity: O(v * (log n + L)), v = sorted views, L = view chunk size
+        Space Complexity: O(1)
+        """
+        if duration is not None and duration < 0:
+            raise ValueError("duration must not be negative")
+        new_values = {"title": title, "artist": artist, "duration": duration}
+        old_values = {field: getattr(song, field) for field, value in new_values.items()
+                      if value is not None and value != getattr(song, field)}
+        if not old_values:
+            return False
+
+        views = [view for view in self.views.values() if song in view]
+        for view in views:
+            view.remove(song)
+        for field in old_values:
+            value = new_values[field]
+            setattr(song, field, sys.intern(value) if field == "artist" else value)
+        for view in views:
+            view.add(song)
+        self.publish(UPDATE, [song], [old_values])
+        return True
+
     # prints the full playlist
     def display(self):
         """
         Time Complexity: O(n)
         Space Complexity: O(1)
         """
-        current = self.head
         print(f"\n🎵 Playlist: {self.name}")
         print("-" * 40)
-        index = 1
-        while current:
+        for index, current in enumerate(self, 1):
             print(f"{index}. {current.title} by {current.artist} ({self._format_duration(current.duration)})")
-            current = current.next
-            index += 1
         print("-" * 40)
         print(f"Total songs: {self.size}")
 
+# small generator that puts an already read row back in front of a CSV reader
+def _prepend(first, rows):
+    yield first
+    yield from rows
+
 # this function gives a terminal menu for working with the playlist
 # note: you can pass `lookup` object if you want to sync new songs into hash map
+# (it is subscribed to the playlist's changes, so adds, deletes and edits all reach it)
 def handle_playlist_operations(playlist, lookup=None):
+    if lookup is not None:
+        playlist.subscribe(lookup.playlist_changed)
     while True:
         # Time Complexity: O(1) per menu operation (except add/delete/move/reverse which depend on Playlist methods)
         # Space Complexity: O(1)
@@ -183,6 +794,8 @@ def handle_playlist_operations(playlist, lookup=None):
         print("3. Move Song")
         print("4. Reverse Playlist")
         print("5. Display Playlist")
+        print("6. Import Songs from CSV")
+        print("7. Edit Song Details")
         print("0. Back to Main Menu")
 
         choice = input("Enter your choice: ")
@@ -193,11 +806,6 @@ def handle_playlist_operations(playlist, lookup=None):
             duration = input("Enter duration (mm:ss): ")
             playlist.add_song(title, artist, duration)
 
-            # auto-sync new song to lookup map (optional)
-            if lookup:
-                new_song = playlist.tail
-                lookup.add_song(new_song)
-
         elif choice == "2":
             try:
                 index = int(input("Enter index of song to delete: "))
@@ -219,6 +827,33 @@ def handle_playlist_operations(playlist, lookup=None):
         elif choice == "5":
             playlist.display()
 
+        elif choice == "6":
+            path = input("Enter CSV file path (title,artist,duration): ").strip()
+            try:
+                playlist.load_csv(path)
+            except OSError as e:
+                print(f"❌ Could not read '{path}': {e}")
+
+        elif choice == "7":
+            try:
+                current = playlist.get(int(input("Enter index of song to edit: ")) - 1)
+            except ValueError:
+                print("❌ Please enter a valid index.")
+                continue
+            if current is None:
+                print("❌ Invalid index.")
+                continue
+            title = input(f"New title [{current.title}]: ").strip() or None
+            artist = input(f"New artist [{current.artist}]: ").strip() or None
+            duration = input("New duration mm:ss (leave empty to keep): ").strip()
+            seconds = playlist._parse_duration(duration) if duration else None
+            if seconds == 0:
+                continue
+            if playlist.update_song(current, title, artist, seconds):
+                print(f"✏️ Updated: {current.title} by {current.artist} ({playlist._format_duration(current.duration)})")
+            else:
+                print("ℹ️ Nothing changed.")
+
         elif choice == "0":
             break
 
@@ -0,0 +1,35 @@
+# playlist_events.py
+
+# kinds of change a playlist reports to its subscribers
+INSERT = "insert"    # songs were added
+DELETE = "delete"    # songs were removed
+MOVE = "move"        # songs changed position
+REORDER = "reorder"  # the whole order changed (sort, shuffle), songs is empty
+REVERSE = "reverse"  # the play direction was flipped, songs is empty
+UPDATE = "update"    # song fields (title, artist, duration) changed
+PIN = "pin"          # songs were pinned or unpinned (song.pinned holds the new state)
+
+# one change reported by a playlist
+# for UPDATE, old_values[i] holds the previous values of the fields that changed in songs[i]
+class PlaylistEvent:
+    __slots__ = ("kind", "songs", "old_values")
+
+    def __init__(self, kind, songs=(), old_values=None):
+        self.kind = kind
+        self.songs = list(songs)
+        self.old_values = old_values
+
+# merges runs of same-kind events (a batch of 1,000 single-song deletes becomes one DELETE)
+def merge_events(events):
+    merged = []
+    for event in events:
+        last = merged[-1] if merged else None
+        # two reversals cancel out, so they are never merged into one
+        if last is None or last.kind != event.kind or event.kind == REVERSE:
+            old_values = list(event.old_values) if event.old_values is not None else None
+            merged.append(PlaylistEvent(event.kind, event.songs, old_values))
+        elif event.kind != REORDER:
+            last.songs.extend(event.songs)
+            if event.old_values is not None:
+                last.old_values.extend(event.old_values)
+    return merged
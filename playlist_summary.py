@@ -15,14 +15,12 @@ def generate_summary_report(playlist, filename="summary.txt"):
             file.write("Songs:\n")
             file.write("-" * 40 + "\n")
 
-            current = playlist.head
-            index = 1
             total_duration = 0
             pinned_count = 0
             longest_song = None
             shortest_song = None
 
-            while current:
+            for index, current in enumerate(playlist, 1):
                 minutes = current.duration // 60
                 seconds = current.duration % 60
                 duration_str = f"{minutes}:{seconds:02d}"
@@ -40,9 +38,6 @@ def generate_summary_report(playlist, filename="summary.txt"):
                 if not shortest_song or current.duration < shortest_song.duration:
                     shortest_song = current
 
-                index += 1
-                current = current.next
-
             file.write("-" * 40 + "\n")
 
             # Summary stats
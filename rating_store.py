@@ -0,0 +1,310 @@
+# rating_store.py
+
+from array import array
+
+from playlist_events import DELETE
+
+# numpy is optional, without it the aggregates are computed with plain Python loops
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TAIL_ROWS = 4096  # ratings added since the per-song row index was built before it is rebuilt (at least)
+
+# this class holds the aggregate scores of every song, indexed by the store's song index
+class RatingAggregates:
+    def __init__(self, counts, sums, means, bayesian, global_mean, prior_weight):
+        self.counts = counts            # number of ratings per song
+        self.sums = sums                # sum of scores per song
+        self.means = means              # plain average per song (0 if unrated)
+        self.bayesian = bayesian        # average pulled towards the global mean for songs with few ratings
+        self.global_mean = global_mean  # average over all ratings
+        self.prior_weight = prior_weight
+
+# this class stores the ratings of many listeners in a compact, columnar form
+# every rating is one row in three typed arrays (user id, song index, score), which costs
+# 9 bytes per rating instead of a Python object, and can be aggregated by numpy without copying
+class RatingStore:
+    def __init__(self):
+        self.user_ids = array('I')      # who rated
+        self.song_indexes = array('I')  # which song (index into self.songs)
+        self.scores = array('B')        # the score, 1 to 5
+        self.songs = []                 # song index -> song node (None once the song is dropped)
+        self.song_index = {}            # song node -> song index
+        self.dropped = set()            # indexes of dropped songs whose rows compact() still has to remove
+        self.needs_compaction = False   # True if a (user, song) pair may appear more than once
+        self.rows_by_song = None        # row numbers grouped by song index (numpy), built after compact()
+        self.song_starts = None         # rows_by_song[song_starts[i]:song_starts[i + 1]] are song i's rows
+        self.indexed_rows = 0           # rows covered by rows_by_song, later rows are scanned directly
+        self.version = 0                # bumped on every change, lets caches know they are stale
+        self.listeners = []             # called as listener(ratings) with a list of (user_id, song, score)
+                                        # per change, (None, song, None) when a song's ratings are removed
+
+    # registers a function that is told about every rating (e.g. the journal)
+    def subscribe(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # returns the compact index of a song, registering it on first use
+    def register_song(self, song):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        index = self.song_index.get(song)
+        if index is None:
+            index = self.song_index[song] = len(self.songs)
+            self.songs.append(song)
+        return index
+
+    # records one listener's rating of a song, a later rating by the same user replaces it
+    def add_rating(self, user_id, song, score):
+        """
+        Time Complexity: O(1) amortized
+        Space Complexity: O(1)
+        """
+        if not 1 <= score <= 5:
+            raise ValueError("score must be between 1 and 5")
+        self.user_ids.append(user_id)
+        self.song_indexes.append(self.register_song(song))
+        self.scores.append(score)
+        self.needs_compaction = True
+        self.version += 1
+        for listener in self.listeners:
+            listener([(user_id, song, score)])
+
+    # records many ratings at once from three parallel sequences (or numpy arrays)
+    # song_indexes must come from register_song
+    def add_ratings(self, user_ids, song_indexes, scores):
+        """
+        Time Complexity: O(k), k = number of new ratings
+        Space Complexity: O(k)
+        """
+        start = len(self.scores)
+        if np is not None:
+            self.user_ids.frombytes(np.asarray(user_ids, dtype=np.uint32).tobytes())
+            self.song_indexes.frombytes(np.asarray(song_indexes, dtype=np.uint32).tobytes())
+            self.scores.frombytes(np.asarray(scores, dtype=np.uint8).tobytes())
+        else:
+            self.user_ids.extend(user_ids)
+            self.song_indexes.extend(song_indexes)
+            self.scores.extend(scores)
+
+        if not (len(self.user_ids) == len(self.song_indexes) == len(self.scores)):
+            del self.user_ids[start:], self.song_indexes[start:], self.scores[start:]
+            raise ValueError("user_ids, song_indexes and scores must have the same length")
+        self.needs_compaction = True
+        self.version += 1
+        if self.listeners:
+            # one notification for the whole batch, so the journal syncs it once
+            songs = self.songs
+            ratings = list(zip(self.user_ids[start:], (songs[index] for index in self.song_indexes[start:]),
+                               self.scores[start:]))
+            for listener in self.listeners:
+                listener(ratings)
+
+    # removes every rating of a song (the rows go with the next compact()) and tells the listeners
+    # returns False if the song has no ratings here
+    def remove_song(self, song):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        if not self.drop_song(song):
+            return False
+        for listener in self.listeners:
+            listener([(None, song, None)])
+        return True
+
+    # forgets a song without scanning the ratings now, its rows are removed by the next compact()
+    # returns False if the song has no ratings here
+    def drop_song(self, song):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        index = self.song_index.pop(song, None)
+        if index is None:
+            return False
+        self.songs[index] = None
+        self.dropped.add(index)
+        self.needs_compaction = True
+        self.version += 1
+        return True
+
+    # keeps the store in sync with a playlist: Playlist.subscribe(rating_store.playlist_changed)
+    def playlist_changed(self, events):
+        """
+        Time Complexity: O(k) for k deleted songs
+        Space Complexity: O(1)
+        """
+        for event in events:
+            if event.kind == DELETE:
+                for song in event.songs:
+                    self.drop_song(song)
+
+    def __len__(self):
+        return len(self.scores)
+
+    # removes older duplicates so that every (user, song) pair keeps only its latest score,
+    # and the rows of dropped songs (the rows may be reordered, ratings have no meaningful
+    # order once they are unique)
+    def compact(self):
+        """
+        Time Complexity: O(m log m), m = number of stored ratings (only when new ratings arrived)
+        Space Complexity: O(m)
+        """
+        if not self.needs_compaction:
+            return
+
+        if np is not None:
+            users = np.frombuffer(self.user_ids, dtype=np.uint32)
+            songs = np.frombuffer(self.song_indexes, dtype=np.uint32)
+            scores = np.frombuffer(self.scores, dtype=np.uint8)
+            if self.dropped:
+                live = ~np.isin(songs, np.fromiter(self.dropped, dtype=np.uint32))
+                users, songs, scores = users[live], songs[live], scores[live]
+            pairs = (users.astype(np.uint64) << np.uint64(32)) | songs
+            # group equal pairs by sorting, then keep the highest row (the latest rating) of
+            # each group; the order of the kept rows doesn't matter once every pair is unique
+            order = np.argsort(pairs)
+            grouped = pairs[order]
+            starts = np.flatnonzero(np.concatenate(([True], grouped[1:] != grouped[:-1])))
+            keep = np.maximum.reduceat(order, starts) if len(order) else order
+            self.user_ids = array('I', users[keep].tobytes())
+            self.song_indexes = array('I', songs[keep].tobytes())
+            self.scores = array('B', scores[keep].tobytes())
+        else:
+            latest = {}
+            for row, pair in enumerate(zip(self.user_ids, self.song_indexes)):
+                if pair[1] not in self.dropped:
+                    latest[pair] = row
+            keep = sorted(latest.values())
+            self.user_ids = array('I', (self.user_ids[row] for row in keep))
+            self.song_indexes = array('I', (self.song_indexes[row] for row in keep))
+            self.scores = array('B', (self.scores[row] for row in keep))
+
+        self.dropped.clear()
+        self.needs_compaction = False
+        self.rows_by_song = None
+
+    # returns {user id: score} with the latest rating of every listener who rated the song
+    # with numpy, the song's rows come from a per-song row index plus a scan of the rows added
+    # since it was built; once those are more than TAIL_ROWS (or 1/32 of all rows) the store is
+    # compacted and the index rebuilt, so the scan stays short
+    def song_ratings(self, song):
+        """
+        Time Complexity: O(r + t) with numpy, r = ratings of the song, t = rows since the index was
+                         built (plus an amortized rebuild); O(m) without numpy
+        Space Complexity: O(r)
+        """
+        index = self.song_index.get(song)
+        if index is None:
+            return {}
+        if np is None:
+            rows = [row for row, song_index in enumerate(self.song_indexes) if song_index == index]
+        else:
+            rows = self._song_rows(index)
+        latest = {}
+        for row in rows:  # oldest first, so a later rating replaces an earlier one
+            latest[self.user_ids[row]] = self.scores[row]
+        return latest
+
+    # row numbers of one song's ratings, oldest first (numpy only)
+    def _song_rows(self, index):
+        if self.rows_by_song is None or len(self.scores) - self.indexed_rows > max(TAIL_ROWS, len(self.scores) // 32):
+            self.compact()
+            songs = np.frombuffer(self.song_indexes, dtype=np.uint32)
+            self.rows_by_song = np.argsort(songs, kind='stable')
+            self.song_starts = np.concatenate(([0], np.cumsum(np.bincount(songs, minlength=len(self.songs)))))
+            self.indexed_rows = len(songs)
+            del songs  # release the buffer, so the arrays can grow again
+
+        rows = []
+        if index + 1 < len(self.song_starts):
+            rows = self.rows_by_song[self.song_starts[index]:self.song_starts[index + 1]].tolist()
+        if len(self.scores) > self.indexed_rows:
+            tail = np.frombuffer(self.song_indexes, dtype=np.uint32, offset=4 * self.indexed_rows)
+            rows.extend((np.flatnonzero(tail == index) + self.indexed_rows).tolist())
+            del tail
+        return rows
+
+    # refreshes one song's average in a RatingBST after it was rated, instead of update_index()
+    # (only the plain mean: a Bayesian score depends on every rating through the global mean)
+    def update_song_rating(self, rating_tree, song, digits=1):
+        """
+        Time Complexity: O(r + t + log n), see song_ratings
+        Space Complexity: O(r)
+        """
+        latest = self.song_ratings(song)
+        if latest:
+            rating_tree.insert_song(song, round(sum(latest.values()) / len(latest), digits))
+        else:
+            rating_tree.delete_song(song)
+        return rating_tree.get_rating(song)
+
+    # computes count, sum, mean and Bayesian-adjusted score for every song in one batch
+    # bayesian = (prior_weight * global_mean + sum) / (prior_weight + count), so a song with
+    # a single 5-star rating doesn't outrank one with hundreds of 4.8 ratings
+    # prior_weight defaults to the average number of ratings per rated song
+    def aggregate(self, prior_weight=None):
+        """
+        Time Complexity: O(m + s), m = ratings, s = songs (plus compaction if needed)
+        Space Complexity: O(s)
+        """
+        self.compact()
+        song_count = len(self.songs)
+
+        if np is not None:
+            songs = np.frombuffer(self.song_indexes, dtype=np.uint32)
+            scores = np.frombuffer(self.scores, dtype=np.uint8)
+            counts = np.bincount(songs, minlength=song_count)
+            sums = np.bincount(songs, weights=scores, minlength=song_count)
+            total = int(counts.sum())
+            global_mean = float(sums.sum()) / total if total else 0.0
+            rated = int(np.count_nonzero(counts))
+            weight = prior_weight if prior_weight is not None else (total / rated if rated else 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means = np.where(counts > 0, sums / counts, 0.0)
+                bayesian = np.where(counts > 0, (weight * global_mean + sums) / (weight + counts), 0.0)
+            return RatingAggregates(counts, sums, means, bayesian, global_mean, weight)
+
+        counts = [0] * song_count
+        sums = [0] * song_count
+        for song, score in zip(self.song_indexes, self.scores):
+            counts[song] += 1
+            sums[song] += score
+        total = sum(counts)
+        global_mean = sum(sums) / total if total else 0.0
+        rated = sum(1 for count in counts if count)
+        weight = prior_weight if prior_weight is not None else (total / rated if rated else 0.0)
+        means = [s / c if c else 0.0 for s, c in zip(sums, counts)]
+        bayesian = [(weight * global_mean + s) / (weight + c) if c else 0.0 for s, c in zip(sums, counts)]
+        return RatingAggregates(counts, sums, means, bayesian, global_mean, weight)
+
+    # writes the aggregated score of every rated song into a RatingBST
+    # score is 'mean' or 'bayesian'; values are rounded so the tree keeps few distinct ratings
+    def update_index(self, rating_tree, score='mean', digits=1, aggregates=None):
+        """
+        Time Complexity: O(m + s log r)
+        Space Complexity: O(s)
+        """
+        if score not in ('mean', 'bayesian'):
+            raise ValueError("score must be 'mean' or 'bayesian'")
+        aggregates = aggregates or self.aggregate()
+        values = getattr(aggregates, 'means' if score == 'mean' else 'bayesian')
+        counts = aggregates.counts
+
+        for index, song in enumerate(self.songs):
+            if song is None:
+                continue
+            if counts[index]:
+                rating_tree.insert_song(song, round(float(values[index]), digits))
+            else:
+                rating_tree.delete_song(song)
+        return aggregates
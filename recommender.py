@@ -0,0 +1,203 @@
+# recommender.py
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+# numpy is optional, without it the similarities are computed with dictionaries
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# arrays shared with the pool workers, set once per worker by _init_worker
+_WORKER_DATA = None
+
+# this class precomputes "songs like this one" from the listeners' ratings
+# two songs are similar when the same listeners rated both of them (item-item collaborative
+# filtering), measured with cosine similarity on the scores or Jaccard on who rated them
+# the top-k neighbours of every song are computed offline by build(), so a query is a lookup
+class SimilarSongs:
+    def __init__(self, rating_store, rating_tree=None, lookup=None):
+        self.rating_store = rating_store  # per-user ratings (RatingStore)
+        self.rating_tree = rating_tree    # if given, only songs still rated there are recommended
+        self.lookup = lookup              # if given, songs can be looked up by title
+        self.neighbors = {}               # song index -> list of (neighbour index, similarity)
+        self.built_version = None         # rating_store.version the table was built from
+
+    # True if ratings changed since the table was built
+    def is_stale(self):
+        return self.built_version != self.rating_store.version
+
+    # computes the top-k neighbour table for every rated song
+    # metric is 'cosine' or 'jaccard'; with workers > 0 chunks of songs are computed in a process pool
+    def build(self, k=10, metric='cosine', workers=0, chunk_size=2048):
+        """
+        Time Complexity: O(sum over songs of the ratings by their listeners), i.e. the co-rating pairs
+        Space Complexity: O(m + s * k), m = ratings, s = songs
+        """
+        if metric not in ('cosine', 'jaccard'):
+            raise ValueError("metric must be 'cosine' or 'jaccard'")
+
+        store = self.rating_store
+        store.compact()
+        if np is not None:
+            self.neighbors = self._build_numpy(k, metric, workers, chunk_size)
+        else:
+            self.neighbors = self._build_python(k, metric)
+        self.built_version = store.version
+        return len(self.neighbors)
+
+    # returns up to k (song, similarity) pairs for songs similar to the given song
+    def similar(self, song, k=None):
+        """
+        Time Complexity: O(k) (a table lookup, the work was done by build)
+        Space Complexity: O(k)
+        """
+        index = self.rating_store.song_index.get(song)
+        if index is None:
+            return []
+
+        songs = self.rating_store.songs
+        result = []
+        for neighbor, similarity in self.neighbors.get(index, ()):
+            candidate = songs[neighbor]
+            # skip songs dropped from the store or whose rating was removed after the table was built
+            if candidate is None:
+                continue
+            if self.rating_tree is not None and self.rating_tree.get_rating(candidate) is None:
+                continue
+            result.append((candidate, similarity))
+            if k is not None and len(result) == k:
+                break
+        return result
+
+    # same as similar(), but the song is found by title through the SongLookup
+    def similar_to_title(self, title, k=None):
+        """
+        Time Complexity: O(k)
+        Space Complexity: O(k)
+        """
+        if self.lookup is None:
+            return []
+        song = self.lookup.get(title)
+        return self.similar(song, k) if song else []
+
+    # ======================
+    # NUMPY IMPLEMENTATION
+    # ======================
+
+    def _build_numpy(self, k, metric, workers, chunk_size):
+        store = self.rating_store
+        item_count = len(store.songs)
+        items = np.frombuffer(store.song_indexes, dtype=np.uint32).astype(np.int64)
+        _, users = np.unique(np.frombuffer(store.user_ids, dtype=np.uint32), return_inverse=True)
+        if metric == 'cosine':
+            scores = np.frombuffer(store.scores, dtype=np.uint8).astype(np.float64)
+        else:
+            scores = np.ones(len(items))
+
+        # the rating matrix in two compressed sparse layouts: rows per song and rows per user
+        by_item = np.argsort(items, kind='stable')
+        item_ptr = np.concatenate(([0], np.cumsum(np.bincount(items, minlength=item_count))))
+        by_user = np.argsort(users, kind='stable')
+        user_ptr = np.concatenate(([0], np.cumsum(np.bincount(users))))
+
+        if metric == 'cosine':
+            norms = np.sqrt(np.bincount(items, weights=scores * scores, minlength=item_count))
+        else:
+            norms = np.bincount(items, minlength=item_count).astype(np.float64)
+
+        data = (metric, k, item_ptr, users[by_item], scores[by_item],
+                user_ptr, items[by_user], scores[by_user], norms)
+        ranges = [(start, min(start + chunk_size, item_count)) for start in range(0, item_count, chunk_size)]
+
+        neighbors = {}
+        if workers > 0 and len(ranges) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+                for part in pool.map(_similar_chunk, ranges):
+                    neighbors.update(part)
+        else:
+            for start, stop in ranges:
+                neighbors.update(_similar_chunk((start, stop), data))
+        return neighbors
+
+    # ======================
+    # PURE PYTHON FALLBACK
+    # ======================
+
+    def _build_python(self, k, metric):
+        store = self.rating_store
+        by_item = {}
+        by_user = {}
+        for user, item, score in zip(store.user_ids, store.song_indexes, store.scores):
+            value = score if metric == 'cosine' else 1
+            by_item.setdefault(item, {})[user] = value
+            by_user.setdefault(user, {})[item] = value
+
+        if metric == 'cosine':
+            norms = {item: math.sqrt(sum(v * v for v in raters.values())) for item, raters in by_item.items()}
+        else:
+            norms = {item: len(raters) for item, raters in by_item.items()}
+
+        neighbors = {}
+        for item, raters in by_item.items():
+            dots = {}
+            for user, value in raters.items():
+                for other, other_value in by_user[user].items():
+                    if other != item:
+                        dots[other] = dots.get(other, 0) + value * other_value
+
+            if metric == 'cosine':
+                scored = [(other, dot / (norms[item] * norms[other])) for other, dot in dots.items()]
+            else:
+                scored = [(other, dot / (norms[item] + norms[other] - dot)) for other, dot in dots.items()]
+            scored.sort(key=lambda pair: (-pair[1], pair[0]))
+            neighbors[item] = scored[:k]
+        return neighbors
+
+# stores the shared arrays inside a pool worker
+def _init_worker(data):
+    global _WORKER_DATA
+    _WORKER_DATA = data
+
+# computes the top-k neighbours for the songs start..stop-1 (runs in the pool or in-process)
+def _similar_chunk(bounds, data=None):
+    metric, k, item_ptr, item_users, item_scores, user_ptr, user_items, user_scores, norms = data or _WORKER_DATA
+    start, stop = bounds
+    result = {}
+
+    for item in range(start, stop):
+        users = item_users[item_ptr[item]:item_ptr[item + 1]]
+        if len(users) == 0:
+            continue
+        values = item_scores[item_ptr[item]:item_ptr[item + 1]]
+
+        # gather every rating made by the listeners of this song (segments of the user layout)
+        begins = user_ptr[users]
+        lengths = user_ptr[users + 1] - begins
+        offsets = np.cumsum(lengths) - lengths
+        rows = np.arange(int(lengths.sum())) - np.repeat(offsets, lengths) + np.repeat(begins, lengths)
+        others = user_items[rows]
+        weights = np.repeat(values, lengths) * user_scores[rows]
+
+        # sum the products per co-rated song
+        candidates, inverse = np.unique(others, return_inverse=True)
+        dots = np.bincount(inverse, weights=weights)
+        mask = candidates != item
+        candidates, dots = candidates[mask], dots[mask]
+        if len(candidates) == 0:
+            continue
+
+        if metric == 'cosine':
+            similarity = dots / (norms[item] * norms[candidates])
+        else:
+            similarity = dots / (norms[item] + norms[candidates] - dots)
+
+        # partial selection of the k best, then sort only those
+        if len(candidates) > k:
+            best = np.argpartition(-similarity, k)[:k]
+            candidates, similarity = candidates[best], similarity[best]
+        order = np.lexsort((candidates, -similarity))
+        result[item] = [(int(candidates[i]), float(similarity[i])) for i in order]
+
+    return result
@@ -1,84 +1,334 @@
 # song_lookup.py
 
+from fuzzy_search import TrigramIndex
+from playlist_engine import parse_durations
+from playlist_events import INSERT, DELETE, UPDATE
+from song_registry import default_registry
+from sorted_view import SortedView
+
 # this class uses a dictionary (hash map) to store and find songs instantly by title
+# the maps hold song ids from the shared SongRegistry, so songs with the same title can coexist
+# next to it, a prefix index (titles kept in sorted order, searched with binary search)
+# answers type-ahead queries; it is built on the first autocomplete call and then kept in sync
+# trigram indexes over titles and artists answer typo-tolerant searches the same way
+# secondary indexes (songs per artist, songs sorted by duration) answer query() without
+# walking the whole playlist
 class SongLookup:
-    def __init__(self):
-        self.song_map = {}  # internal dictionary to map song title to song node
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else default_registry  # song id -> song
+        self.song_map = {}        # lowercased title -> id of the first song with that title
+        self.same_title = {}      # lowercased title -> ids of further songs with that title (rare)
+        self.artist_map = {}      # lowercased artist -> {song id: None} (an insertion-ordered set)
+        self.prefix_index = None  # SortedView of the same songs by title, built on first use
+        self.duration_index = None  # SortedView of the same songs by duration, built on first use
+        self.title_grams = None   # TrigramIndex over titles, built on the first fuzzy search
+        self.artist_grams = None  # TrigramIndex over artists, built on the first fuzzy search
 
     # this adds a song to the hash map using its title as the key
     def add_song(self, song):
         """
         Adds a song to the lookup map (case-insensitive).
-        Handles edge cases: ignores None, empty title, and avoids duplicates.
+        Handles edge cases: ignores None, empty title, and adding the same song twice.
+        Time Complexity: O(1), O(log n) once the prefix index exists
+        Space Complexity: O(1)
         """
         if not song or not getattr(song, 'title', None):
             print("❌ Invalid song object or missing title.")
             return
-        key = song.title.strip().lower()
-        if key in self.song_map:
+        if not self.index_song(song):
             print(f"⚠️ Song '{song.title}' already exists in lookup.")
+
+    # this indexes a song without printing anything (used by bulk imports)
+    # it returns False if this song is already in the map
+    def index_song(self, song):
+        """
+        Time Complexity: O(1), O(log n) once the prefix index exists
+        Space Complexity: O(1)
+        """
+        song_id = song.id if song.id is not None else self.registry.register(song)
+        key = song.title.strip().lower()
+        first = self.song_map.get(key)
+        if first is None:
+            self.song_map[key] = song_id
+        elif first == song_id or song_id in self.same_title.get(key, ()):
+            return False
         else:
-            self.song_map[key] = song
+            self.same_title.setdefault(key, []).append(song_id)
+
+        self.artist_map.setdefault(song.artist.strip().lower(), {})[song_id] = None
+        if self.prefix_index is not None:
+            self.prefix_index.add(song)
+        if self.duration_index is not None:
+            self.duration_index.add(song)
+        if self.title_grams is not None:
+            self.title_grams.add(song.title, song_id)
+            self.artist_grams.add(song.artist, song_id)
+        return True
+
+    # this removes one song from every index (other songs with the same title stay)
+    # old_values gives the title/artist it was indexed under, if they changed since
+    # it returns False if the song wasn't indexed
+    def remove_song(self, song, old_values=None):
         """
-        Time Complexity: O(1)
+        Time Complexity: O(1 + d), d = songs sharing the title, O(log n) once the sorted indexes exist
         Space Complexity: O(1)
         """
-        if song.title in self.song_map:
-            print(f"⚠️ Song '{song.title}' already exists in lookup.")
+        old_values = old_values or {}
+        title = old_values.get("title", song.title)
+        artist = old_values.get("artist", song.artist)
+        key = title.strip().lower()
+        song_id = song.id
+        others = self.same_title.get(key)
+        if self.song_map.get(key) == song_id:
+            if others:
+                self.song_map[key] = others.pop(0)
+            else:
+                del self.song_map[key]
+        elif others and song_id in others:
+            others.remove(song_id)
         else:
-            self.song_map[song.title] = song
+            return False
+        if others is not None and not others:
+            del self.same_title[key]
+
+        artist_key = artist.strip().lower()
+        bucket = self.artist_map.get(artist_key, {})
+        bucket.pop(song_id, None)
+        if not bucket:
+            self.artist_map.pop(artist_key, None)
+        if self.prefix_index is not None:
+            self.prefix_index.remove(song)
+        if self.duration_index is not None:
+            self.duration_index.remove(song)
+        if self.title_grams is not None:
+            self.title_grams.remove(title, song_id)
+            self.artist_grams.remove(artist, song_id)
+        return True
+
+    # keeps the lookup in sync with a playlist: Playlist.subscribe(lookup.playlist_changed)
+    # a batch that adds many songs at once drops the optional indexes instead of updating them
+    # song by song, they are rebuilt from the map (in one sort) the next time they are needed
+    def playlist_changed(self, events):
+        """
+        Time Complexity: O(k) for k changed songs (O(k log n) while the sorted indexes exist)
+        Space Complexity: O(1)
+        """
+        for event in events:
+            if event.kind == INSERT:
+                if len(event.songs) > len(self.song_map) // 4 + 1000:
+                    self.prefix_index = self.duration_index = None
+                    self.title_grams = self.artist_grams = None
+                for song in event.songs:
+                    self.index_song(song)
+            elif event.kind == DELETE:
+                for song in event.songs:
+                    self.remove_song(song)
+            elif event.kind == UPDATE:
+                for song, old_values in zip(event.songs, event.old_values):
+                    if self.remove_song(song, old_values):
+                        self.index_song(song)
+
+    # this returns every song with the given title (case-insensitive), in the order they were added
+    def find_all(self, title):
+        """
+        Time Complexity: O(1 + d), d = songs sharing the title
+        Space Complexity: O(d)
+        """
+        key = title.strip().lower()
+        first = self.song_map.get(key)
+        if first is None:
+            return []
+        return list(self.registry.resolve([first] + self.same_title.get(key, [])))
+
+    # this returns the first song with the given title, or None
+    def get(self, title):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        songs = self.find_all(title)
+        return songs[0] if songs else None
+
+    # walks every indexed song
+    def songs(self):
+        resolve = self.registry.resolve
+        yield from resolve(self.song_map.values())
+        for song_ids in self.same_title.values():
+            yield from resolve(song_ids)
 
     # this searches for a song by title and shows its info
     def find_song(self, title):
         """
         Finds a song by title (case-insensitive).
         Handles edge cases: trims whitespace, checks for empty input.
+        Time Complexity: O(1)
+        Space Complexity: O(1)
         """
         if not title or not title.strip():
             print("❌ Please enter a valid song title.")
             return
-        key = title.strip().lower()
-        song = self.song_map.get(key)
-        if song:
+        songs = self.find_all(title)
+        for song in songs:
             print(f"\n🔍 Found Song: {song.title}")
             print(f"Artist: {song.artist}")
             print(f"Duration: {song.duration // 60}:{song.duration % 60:02d}")
-        else:
+        if not songs:
             print(f"❌ No song found with title '{title}'.")
+            suggestions = self.search_fuzzy(title, k=3)
+            if suggestions:
+                print("Did you mean: " + ", ".join(f"'{match.title}' by {match.artist}" for match, _ in suggestions) + "?")
+
+    # this finds songs whose title or artist is close to the query, even with typos
+    # it returns up to k (song, distance) pairs, closest first (distance = edits needed,
+    # max_distance + 1 for songs that only share pieces of the text, e.g. "weeknd" -> "The Weeknd")
+    def search_fuzzy(self, query, k=5, max_distance=2):
         """
-        Time Complexity: O(1)
-        Space Complexity: O(1)
+        Time Complexity: see TrigramIndex.search (O(n) once, to build the indexes)
+        Space Complexity: O(k)
         """
-        song = self.song_map.get(title)
-        if song:
-            print(f"\n🔍 Found Song: {song.title}")
-            print(f"Artist: {song.artist}")
-            print(f"Duration: {song.duration // 60}:{song.duration % 60:02d}")
+        if not query or not query.strip():
+            return []
+        if self.title_grams is None:
+            self.title_grams, self.artist_grams = TrigramIndex(), TrigramIndex()
+            for song in self.songs():
+                self.title_grams.add(song.title, song.id)
+                self.artist_grams.add(song.artist, song.id)
+
+        ranked = []
+        for order, index in enumerate((self.title_grams, self.artist_grams)):
+            for song_ids, distance, similarity in index.search(query, k, max_distance):
+                for song in self.registry.resolve(song_ids):
+                    ranked.append((distance, -similarity, order, len(ranked), song))
+        ranked.sort()
+
+        results = []
+        seen = set()
+        for distance, _, _, _, song in ranked:
+            if song not in seen:
+                seen.add(song)
+                results.append((song, distance))
+                if len(results) == k:
+                    break
+        return results
+
+    # this returns up to k songs whose title starts with the prefix, in alphabetical order
+    def autocomplete(self, prefix, k=10):
+        """
+        Time Complexity: O(log n + k) (O(n log n) once, to build the prefix index)
+        Space Complexity: O(k)
+        """
+        matches = []
+        if k <= 0:
+            return matches
+        for song in self._titles_with_prefix(prefix.strip().lower()):
+            matches.append(song)
+            if len(matches) == k:
+                break
+        return matches
+
+    # this returns every song by an artist (case-insensitive), in the order they were added
+    def songs_by_artist(self, artist):
+        """
+        Time Complexity: O(1 + k), k = songs by the artist
+        Space Complexity: O(k)
+        """
+        return list(self.registry.resolve(self.artist_map.get(artist.strip().lower(), ())))
+
+    # this returns the songs with min_seconds <= duration <= max_seconds, shortest first
+    def songs_in_duration_range(self, min_seconds=None, max_seconds=None):
+        """
+        Time Complexity: O(log n + k) (O(n log n) once, to build the duration index)
+        Space Complexity: O(k)
+        """
+        return list(self._durations_between(min_seconds, max_seconds))
+
+    # this finds the songs matching every given condition (the ones left as None are ignored)
+    # each condition can list its songs from an index and can also test a single song in O(1),
+    # so the condition with the fewest songs produces the candidates and the others only filter them
+    def query(self, artist=None, title_prefix=None, min_duration=None, max_duration=None, limit=None):
+        """
+        Time Complexity: O(log n + n / LOAD + s), s = songs matching the most selective condition
+        Space Complexity: O(r), r = songs returned
+        """
+        conditions = []  # (number of songs, songs, test for one song)
+        if artist is not None:
+            bucket = self.artist_map.get(artist.strip().lower(), {})
+            conditions.append((len(bucket), lambda: self.registry.resolve(bucket),
+                               lambda song: song.id in bucket))
+        if title_prefix is not None:
+            prefix = title_prefix.strip().lower()
+            titles = self._titles()
+            size = titles.rank(prefix + "\U0010ffff") - titles.rank(prefix)
+            conditions.append((size, lambda: self._titles_with_prefix(prefix),
+                               lambda song: song.title.lower().startswith(prefix)))
+        if min_duration is not None or max_duration is not None:
+            low = min_duration if min_duration is not None else 0
+            high = max_duration if max_duration is not None else float('inf')
+            durations = self._durations()
+            size = durations.rank(high, inclusive=True) - durations.rank(low)
+            conditions.append((size, lambda: self._durations_between(low, high),
+                               lambda song: low <= song.duration <= high))
+
+        if not conditions:
+            songs, tests = self.songs(), []
         else:
-            print(f"❌ No song found with title '{title}'.")
+            conditions.sort(key=lambda condition: condition[0])
+            if conditions[0][0] == 0:
+                return []
+            songs, tests = conditions[0][1](), [condition[2] for condition in conditions[1:]]
+
+        results = []
+        if limit is not None and limit <= 0:
+            return results
+        for song in songs:
+            if all(test(song) for test in tests):
+                results.append(song)
+                if len(results) == limit:
+                    break
+        return results
+
+    # the title index, built from the map on first use
+    def _titles(self):
+        if self.prefix_index is None:
+            self.prefix_index = SortedView('title', self.songs())
+        return self.prefix_index
+
+    # the duration index, built from the map on first use
+    def _durations(self):
+        if self.duration_index is None:
+            self.duration_index = SortedView('duration', self.songs())
+        return self.duration_index
 
-    # this deletes a song from the lookup table by title (optional)
+    # walks the songs whose lowercased title starts with the prefix, alphabetically
+    def _titles_with_prefix(self, prefix):
+        for song in self._titles().iter_from(prefix):
+            if not song.title.lower().startswith(prefix):
+                break
+            yield song
+
+    # walks the songs whose duration is between low and high seconds (inclusive), shortest first
+    def _durations_between(self, low=None, high=None):
+        for song in self._durations().iter_from(low if low is not None else 0):
+            if high is not None and song.duration > high:
+                break
+            yield song
+
+    # this deletes the songs with a title from the lookup table (optional)
     def delete_song(self, title):
         """
-        Deletes a song by title (case-insensitive).
+        Deletes every song with this title (case-insensitive) from the lookup.
         Handles edge cases: trims whitespace, checks for empty input.
+        Time Complexity: O(1 + d), d = songs sharing the title, O(log n) per song once the sorted indexes exist
+        Space Complexity: O(d)
         """
         if not title or not title.strip():
             print("❌ Please enter a valid song title.")
             return
-        key = title.strip().lower()
-        if key in self.song_map:
-            del self.song_map[key]
-            print(f"🗑️ Deleted '{title}' from lookup.")
-        else:
-            print(f"❌ Song '{title}' not found in lookup.")
-        """
-        Time Complexity: O(1)
-        Space Complexity: O(1)
-        """
-        if title in self.song_map:
-            del self.song_map[title]
-            print(f"🗑️ Deleted '{title}' from lookup.")
+        songs = self.find_all(title)
+        for song in songs:
+            self.remove_song(song)
+        if songs:
+            print(f"🗑️ Deleted '{title}' from lookup" + (f" ({len(songs)} songs)." if len(songs) > 1 else "."))
         else:
             print(f"❌ Song '{title}' not found in lookup.")
 
@@ -90,6 +340,9 @@ def handle_song_lookup(lookup):
         print("\n🔎 Instant Song Lookup Menu")
         print("1. Search Song by Title")
         print("2. Delete Song from Lookup")
+        print("3. Autocomplete (titles starting with...)")
+        print("4. Fuzzy Search (title or artist, typos allowed)")
+        print("5. Find Songs by Artist and/or Duration Range")
         print("0. Back to Main Menu")
 
         choice = input("Enter your choice: ")
@@ -102,6 +355,38 @@ def handle_song_lookup(lookup):
             title = input("Enter song title to delete: ")
             lookup.delete_song(title)
 
+        elif choice == "3":
+            prefix = input("Start typing a title: ")
+            matches = lookup.autocomplete(prefix)
+            if not matches:
+                print(f"❌ No titles start with '{prefix}'.")
+            for i, song in enumerate(matches, 1):
+                print(f"{i}. {song.title} by {song.artist}")
+
+        elif choice == "4":
+            query = input("Enter title or artist: ")
+            matches = lookup.search_fuzzy(query)
+            if not matches:
+                print(f"❌ Nothing close to '{query}'.")
+            for i, (song, distance) in enumerate(matches, 1):
+                note = "" if distance == 0 else f" ({distance} typo(s))" if distance <= 2 else " (partial match)"
+                print(f"{i}. {song.title} by {song.artist}{note}")
+
+        elif choice == "5":
+            artist = input("Artist (leave empty for any): ").strip() or None
+            shortest = input("Shortest duration mm:ss (leave empty for any): ").strip()
+            longest = input("Longest duration mm:ss (leave empty for any): ").strip()
+            low = parse_durations([shortest])[0] if shortest else None
+            high = parse_durations([longest])[0] if longest else None
+            if (shortest and not low) or (longest and not high):
+                print("❌ Invalid duration format. Use mm:ss (e.g., 3:30).")
+                continue
+            matches = lookup.query(artist=artist, min_duration=low, max_duration=high, limit=50)
+            if not matches:
+                print("❌ No songs match.")
+            for i, song in enumerate(matches, 1):
+                print(f"{i}. {song.title} by {song.artist} ({song.duration // 60}:{song.duration % 60:02d})")
+
         elif choice == "0":
             break
 
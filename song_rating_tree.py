@@ -1,142 +1,424 @@
 # song_rating_tree.py
 
+from itertools import islice
+
+from playlist_events import DELETE
+from song_registry import default_registry
+
 # first, we define a node in our binary search tree
-# each node represents a rating (from 1 to 5)
+# each node represents a rating (e.g. 1 to 5)
 class RatingNode:
     def __init__(self, rating):
         self.rating = rating                # the actual rating value (1 to 5)
-        self.songs = []                     # this will hold all songs with this rating
+        self.songs = {}                     # ids of songs with this rating (dict keeps insertion order, O(1) removal)
         self.left = None                    # pointer to the left (lower ratings)
         self.right = None                   # pointer to the right (higher ratings)
+        self.height = 1                     # height of this subtree, used for AVL balancing
+        self.count = 0                      # number of songs in this subtree, used for rank queries
+
+# small helpers for the AVL bookkeeping
+def _height(node):
+    return node.height if node else 0
+
+def _count(node):
+    return node.count if node else 0
+
+def _update(node):
+    node.height = 1 + max(_height(node.left), _height(node.right))
+    node.count = len(node.songs) + _count(node.left) + _count(node.right)
 
 # this is the main class that manages the BST
-# it helps us insert and search songs by rating
+# it is an AVL tree, so its height stays O(log r) for r distinct ratings
+# next to the tree we keep two hash maps: rating -> node (direct access to a bucket)
+# and song -> rating (the reverse index), so re-rating and deleting a song don't search the tree
+# songs are stored by their registry id and turned back into song nodes when they are returned
 class RatingBST:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.root = None                    # start with an empty tree (no ratings yet)
+        self.nodes = {}                     # rating value -> RatingNode
+        self.song_ratings = {}              # song id -> its current rating
+        self.registry = registry if registry is not None else default_registry  # song id -> song
 
     # this function is used to add a new song into the BST
-    # we give it a song node and a rating (e.g., 5 stars)
+    # we give it a song node (or song id) and a rating (e.g., 5 stars)
+    # if the song was rated before, its old rating is replaced
     def insert_song(self, song, rating):
         """
-        Time Complexity: O(h), where h is the height of the BST (log n for balanced, n for skewed)
-        Space Complexity: O(h) due to recursion stack
+        Time Complexity: O(1) if the rating already has a bucket, O(log r) otherwise
+        Space Complexity: O(log r) recursion stack when a new rating node is added
         """
-        # we call a helper function that does the actual work
-        self.root = self._insert(self.root, song, rating)
+        song_id = song if isinstance(song, int) else self.registry.register(song)
+        old_rating = self.song_ratings.get(song_id)
+        if old_rating == rating:
+            return
+        if old_rating is not None:
+            self._remove_from_bucket(song_id, old_rating)
+
+        node = self.nodes.get(rating)
+        if node is None:
+            # we call a helper function that does the actual work
+            self.root = self._insert(self.root, rating)
+            node = self.nodes[rating]
 
-    # internal function that does the recursive insertion
-    def _insert(self, node, song, rating):
+        node.songs[song_id] = None
+        self.song_ratings[song_id] = rating
+        self._add_to_counts(rating, 1)
+
+    # internal function that does the recursive insertion of a new rating node
+    def _insert(self, node, rating):
         """
-        Time Complexity: O(h)
-        Space Complexity: O(h)
+        Time Complexity: O(log r)
+        Space Complexity: O(log r)
         """
-        # if we've reached a spot with no node, it means this rating doesn’t exist yet
+        # if we've reached a spot with no node, it means this rating doesn't exist yet
         # so we create a new rating node here
         if node is None:
-            new_node = RatingNode(rating)   # create a new node for this rating
-            new_node.songs.append(song)     # add the song to this new rating bucket
+            new_node = RatingNode(rating)
+            self.nodes[rating] = new_node
             return new_node
 
-        # if the rating is smaller, we move left in the tree
+        # if the rating is smaller, we move left in the tree, otherwise right
         if rating < node.rating:
-            node.left = self._insert(node.left, song, rating)
-        # if the rating is greater, we move right
-        elif rating > node.rating:
-            node.right = self._insert(node.right, song, rating)
-        # if the rating already exists, just add the song to the existing list
+            node.left = self._insert(node.left, rating)
         else:
-            node.songs.append(song)
+            node.right = self._insert(node.right, rating)
+
+        return self._rebalance(node)
 
-        return node  # return the unchanged node up the tree
+    # adds delta to the song count of every node on the path from the root to a rating
+    def _add_to_counts(self, rating, delta):
+        """
+        Time Complexity: O(log r)
+        Space Complexity: O(1)
+        """
+        node = self.root
+        while node:
+            node.count += delta
+            if rating == node.rating:
+                break
+            node = node.left if rating < node.rating else node.right
 
     # this function lets us find and print all songs with a specific rating
     def search_by_rating(self, rating):
         """
-        Time Complexity: O(h + k), h=height of BST, k=number of songs in bucket
+        Time Complexity: O(1 + k), k=number of songs in bucket
         Space Complexity: O(1)
         """
-        node = self._search(self.root, rating)
+        node = self.nodes.get(rating)
 
         if node is None:
             print(f"\n😕 No songs found with rating {rating}")
         else:
             print(f"\n⭐ Songs with Rating {rating}:")
-            for i, song in enumerate(node.songs, 1):
+            for i, song in enumerate(self.registry.resolve(node.songs), 1):
                 print(f"{i}. {song.title} by {song.artist}")
 
-    # this is the recursive search function that looks for the rating node
-    def _search(self, node, rating):
+    # ======================
+    # QUERIES (RETURN ITERATORS)
+    # ======================
+
+    # returns an iterator over the songs that have exactly this rating
+    def songs_with_rating(self, rating):
         """
-        Time Complexity: O(h)
-        Space Complexity: O(h)
+        Time Complexity: O(1) to start, O(1) per song
+        Space Complexity: O(1)
         """
-        # base case: rating not found
-        if node is None:
+        node = self.nodes.get(rating)
+        return self.registry.resolve(node.songs if node else ())
+
+    # returns an iterator of (song, rating) for low <= rating <= high, lowest rating first
+    # either bound can be None, e.g. songs_in_range(4) gives all songs rated 4 or more
+    def songs_in_range(self, low=None, high=None):
+        """
+        Time Complexity: O(log r) to start, O(1) amortized per song
+        Space Complexity: O(log r)
+        """
+        start = 0 if low is None else self.count_below(low)
+        for song, rating in self._resolve(self._iter_from_rank(start)):
+            if high is not None and rating > high:
+                return
+            yield song, rating
+
+    # returns how many rated songs have low <= rating <= high
+    def count_in_range(self, low=None, high=None):
+        """
+        Time Complexity: O(log r)
+        Space Complexity: O(1)
+        """
+        below = 0 if low is None else self.count_below(low)
+        upto = _count(self.root) if high is None else self.count_below(high, inclusive=True)
+        return max(0, upto - below)
+
+    # returns how many songs are rated below x (or at most x with inclusive=True)
+    def count_below(self, x, inclusive=False):
+        """
+        Time Complexity: O(log r)
+        Space Complexity: O(1)
+        """
+        total = 0
+        node = self.root
+        while node:
+            if node.rating < x or (inclusive and node.rating == x):
+                total += _count(node.left) + len(node.songs)
+                node = node.right
+            else:
+                node = node.left
+        return total
+
+    # returns an iterator over the n highest-rated songs as (song, rating), best first
+    def top_n(self, n):
+        """
+        Time Complexity: O(log r + n)
+        Space Complexity: O(log r)
+        """
+        return islice(self._resolve(self._iter_from_rank(0, descending=True)), n)
+
+    # returns the (song, rating) at position k (0-based) in rating order, or None
+    def kth(self, k, descending=False):
+        """
+        Time Complexity: O(log r + p), p = position of the song inside its rating bucket
+        Space Complexity: O(log r)
+        """
+        if k < 0:
             return None
+        return next(self._resolve(self._iter_from_rank(k, descending)), None)
 
-        # if this is the rating we're looking for, return the node
-        if rating == node.rating:
-            return node
-        # go left for lower rating
-        elif rating < node.rating:
-            return self._search(node.left, rating)
-        # go right for higher rating
-        else:
-            return self._search(node.right, rating)
+    # returns an iterator over one page of (song, rating) pairs in rating order
+    def page(self, offset, limit, descending=False):
+        """
+        Time Complexity: O(log r + limit) (plus the offset inside the first bucket)
+        Space Complexity: O(log r)
+        """
+        return islice(self._resolve(self._iter_from_rank(offset, descending)), limit)
+
+    # turns (song id, rating) pairs into (song, rating), skipping songs removed from the registry
+    def _resolve(self, pairs):
+        songs = self.registry.songs
+        for song_id, rating in pairs:
+            song = songs[song_id]
+            if song is not None:
+                yield song, rating
+
+    # in-order stream of (song id, rating) starting at a rank, without building any list
+    # the subtree counts let us jump to the rank in O(log r) instead of skipping songs
+    def _iter_from_rank(self, rank, descending=False):
+        """
+        Time Complexity: O(log r) to start, O(1) amortized per song
+        Space Complexity: O(log r)
+        """
+        near, far = ('right', 'left') if descending else ('left', 'right')
+        stack = []
+        node = self.root
+
+        # seek down to the bucket that holds the song with this rank
+        while node:
+            near_count = _count(getattr(node, near))
+            if rank < near_count:
+                stack.append(node)   # this node comes after everything on the near side
+                node = getattr(node, near)
+            elif rank < near_count + len(node.songs):
+                break
+            else:
+                rank -= near_count + len(node.songs)
+                node = getattr(node, far)
+        if node is None:
+            return
+
+        # the rest of the first bucket, then a normal iterative in-order walk
+        songs = reversed(node.songs) if descending else iter(node.songs)
+        for song in islice(songs, rank - near_count, None):
+            yield song, node.rating
+        node = getattr(node, far)
+
+        while stack or node:
+            if node:
+                stack.append(node)
+                node = getattr(node, near)
+            else:
+                node = stack.pop()
+                for song in (reversed(node.songs) if descending else node.songs):
+                    yield song, node.rating
+                node = getattr(node, far)
+
+    # this is the iterative search function that looks for the rating node in the tree
+    def _search(self, node, rating):
+        """
+        Time Complexity: O(log r)
+        Space Complexity: O(1)
+        """
+        while node is not None and rating != node.rating:
+            # go left for lower rating, right for higher rating
+            node = node.left if rating < node.rating else node.right
+        return node
 
-    # (optional) this function prints all songs in the tree in rating order
+    # this function prints all songs in the tree in rating order
     # we use an in-order traversal for this
     def inorder(self):
         """
-        Time Complexity: O(n), n=number of rating nodes
-        Space Complexity: O(h)
+        Time Complexity: O(r + n), r=number of rating nodes, n=number of rated songs
+        Space Complexity: O(log r)
         """
         print("\n🌳 All Rated Songs (from lowest to highest rating):")
-        self._inorder(self.root)
+        if self.root is None:
+            print("No songs rated yet.")
+        for node in self._inorder(self.root):
+            # print songs under this rating
+            print(f"\nRating {node.rating}:")
+            for song in self.registry.resolve(node.songs):
+                print(f"  - {song.title} by {song.artist}")
 
-    # recursive helper for in-order traversal
+    # iterative in-order traversal (an explicit stack instead of recursion)
     def _inorder(self, node):
         """
-        Time Complexity: O(n)
-        Space Complexity: O(h)
+        Time Complexity: O(r)
+        Space Complexity: O(log r)
+        """
+        stack = []
+        while stack or node:
+            if node:
+                stack.append(node)
+                node = node.left      # visit left side first (lower ratings)
+            else:
+                node = stack.pop()
+                yield node
+                node = node.right     # then visit right side (higher ratings)
+
+    # this returns the current rating of a song (node or id), or None if it isn't rated
+    def get_rating(self, song):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
         """
-        
-    # Deletes a song by song_id from the BST
-    def delete_song(self, song_id):
+        return self.song_ratings.get(song if isinstance(song, int) else song.id)
+
+    # Deletes a song from the BST and returns how many songs were removed
+    # song is a song node or a song id; a title string is also accepted, which removes
+    # every rated song with that title (this has to scan the reverse index)
+    def delete_song(self, song):
+        """
+        Time Complexity: O(1), or O(log r) if a bucket becomes empty (O(n) for a title)
+        Space Complexity: O(log r)
+        """
+        if isinstance(song, str):
+            get = self.registry.get
+            song_ids = [song_id for song_id in self.song_ratings
+                        if getattr(get(song_id), 'title', None) == song]
+        else:
+            song_id = song if isinstance(song, int) else song.id
+            song_ids = [song_id] if song_id in self.song_ratings else []
+
+        for song_id in song_ids:
+            self._remove_from_bucket(song_id, self.song_ratings.pop(song_id))
+        return len(song_ids)
+
+    # keeps the ratings in sync with a playlist: Playlist.subscribe(rating_tree.playlist_changed)
+    # only deletes matter here, ratings are stored by song id so other changes don't affect them
+    def playlist_changed(self, events):
         """
-        Time Complexity: O(h + k), h=height of BST, k=number of songs in bucket
-        Space Complexity: O(h)
+        Time Complexity: O(k log r) for k deleted songs
+        Space Complexity: O(log r)
         """
-        self.root = self._delete_song(self.root, song_id)
+        for event in events:
+            if event.kind == DELETE:
+                for song in event.songs:
+                    self.delete_song(song.id)
 
-    def _delete_song(self, node, song_id):
+    # removes a song from its rating bucket and drops the rating node once it is empty
+    def _remove_from_bucket(self, song_id, rating):
+        """
+        Time Complexity: O(1), or O(log r) if the bucket becomes empty
+        Space Complexity: O(log r)
+        """
+        node = self.nodes[rating]
+        del node.songs[song_id]
+        self._add_to_counts(rating, -1)
+        if not node.songs:
+            del self.nodes[rating]
+            self.root = self._delete_node(self.root, rating)
+
+    # recursive AVL deletion of a rating node
+    def _delete_node(self, node, rating):
+        """
+        Time Complexity: O(log r)
+        Space Complexity: O(log r)
+        """
         if node is None:
             return None
-        # Remove song from current node's bucket
-        node.songs = [song for song in node.songs if getattr(song, 'title', None) != song_id and getattr(song, 'id', None) != song_id]
-        # Recursively delete in left and right subtrees
-        node.left = self._delete_song(node.left, song_id)
-        node.right = self._delete_song(node.right, song_id)
+
+        if rating < node.rating:
+            node.left = self._delete_node(node.left, rating)
+        elif rating > node.rating:
+            node.right = self._delete_node(node.right, rating)
+        else:
+            if node.left is None:
+                return node.right
+            if node.right is None:
+                return node.left
+
+            # two children: take over the smallest rating of the right subtree
+            successor = node.right
+            while successor.left:
+                successor = successor.left
+            node.rating, node.songs = successor.rating, successor.songs
+            self.nodes[node.rating] = node
+            node.right = self._delete_node(node.right, successor.rating)
+
+        return self._rebalance(node)
+
+    # ======================
+    # AVL ROTATIONS
+    # ======================
+
+    # restores the AVL balance of a node after an insert/delete below it
+    def _rebalance(self, node):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        _update(node)
+        balance = _height(node.left) - _height(node.right)
+
+        if balance > 1:
+            if _height(node.left.left) < _height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if _height(node.right.right) < _height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
         return node
-        if node:
-            self._inorder(node.left)  # visit left side first (lower ratings)
 
-            # print songs under this rating
-            print(f"\nRating {node.rating}:")
-            for song in node.songs:
-                print(f"  - {song.title} by {song.artist}")
+    def _rotate_left(self, node):
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        _update(node)
+        _update(pivot)
+        return pivot
+
+    def _rotate_right(self, node):
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        _update(node)
+        _update(pivot)
+        return pivot
 
-            self._inorder(node.right)  # then visit right side (higher ratings)
-            
-    # this function provides a terminal menu to interact with the rating system
+# this function provides a terminal menu to interact with the rating system
 # it takes the playlist and tree and handles rating, searching, and showing all
-def handle_song_ratings(playlist, rating_tree):
+# with a RatingStore, ratings are kept per listener and the tree holds each song's average
+# with a SimilarSongs recommender, the menu can also suggest songs similar to a given one
+def handle_song_ratings(playlist, rating_tree, rating_store=None, recommender=None):
     while True:
         print("\n⭐ Song Rating Menu ⭐")
         print("1. Rate a Song from Playlist")
         print("2. Show All Songs with a Given Rating")
         print("3. Show All Rated Songs (Inorder)")
+        print("4. Remove a Song's Rating")
+        print("5. Show Songs in a Rating Range")
+        print("6. Show Top Rated Songs")
+        if recommender is not None:
+            print("7. Recommend Songs Similar to a Song")
         print("0. Back to Main Menu")
 
         choice = input("Enter your choice: ")
@@ -146,10 +428,7 @@ def handle_song_ratings(playlist, rating_tree):
             playlist.display()
             try:
                 index = int(input("Enter index of song to rate: ")) - 1
-                current = playlist.head
-                for _ in range(index):
-                    if current:
-                        current = current.next
+                current = playlist.get(index)
                 if not current:
                     print("❌ Invalid song index.")
                     continue
@@ -160,9 +439,18 @@ def handle_song_ratings(playlist, rating_tree):
                     print("❌ Rating must be between 1 and 5.")
                     continue
 
-                # add song to the BST
-                rating_tree.insert_song(current, rating)
-                print(f"✅ Rated '{current.title}' {rating} stars.")
+                if rating_store is None:
+                    # add song to the BST (a previous rating of this song is replaced)
+                    rating_tree.insert_song(current, rating)
+                    print(f"✅ Rated '{current.title}' {rating} stars.")
+                    continue
+
+                # store the listener's rating and refresh this song's average in the BST
+                user_id = int(input("Enter your user id: ") or 0)
+                rating_store.add_rating(user_id, current, rating)
+                rating_store.update_song_rating(rating_tree, current)
+                print(f"✅ Rated '{current.title}' {rating} stars "
+                      f"(average is now {rating_tree.get_rating(current)}⭐).")
 
             except ValueError:
                 print("❌ Please enter valid numbers only.")
@@ -177,6 +465,53 @@ def handle_song_ratings(playlist, rating_tree):
         elif choice == "3":
             rating_tree.inorder()
 
+        elif choice == "4":
+            playlist.display()
+            try:
+                index = int(input("Enter index of song to remove the rating from: ")) - 1
+                current = playlist.get(index)
+                if not current:
+                    print("❌ Invalid song index.")
+                elif rating_tree.delete_song(current):
+                    if rating_store is not None:
+                        rating_store.remove_song(current)
+                    print(f"🗑️ Removed the rating of '{current.title}'.")
+                else:
+                    print(f"ℹ️ '{current.title}' has no rating.")
+            except ValueError:
+                print("❌ Please enter a valid number.")
+
+        elif choice == "5":
+            try:
+                low = int(input("Enter the lowest rating (1–5): "))
+                high = int(input("Enter the highest rating (1–5): "))
+                print(f"\n⭐ {rating_tree.count_in_range(low, high)} song(s) rated {low} to {high}:")
+                for i, (song, rating) in enumerate(rating_tree.songs_in_range(low, high), 1):
+                    print(f"{i}. {song.title} by {song.artist} ({rating}⭐)")
+            except ValueError:
+                print("❌ Please enter valid numbers only.")
+
+        elif choice == "6":
+            try:
+                n = int(input("How many songs? "))
+                print(f"\n🏆 Top {n} Rated Songs:")
+                for i, (song, rating) in enumerate(rating_tree.top_n(n), 1):
+                    print(f"{i}. {song.title} by {song.artist} ({rating}⭐)")
+            except ValueError:
+                print("❌ Please enter a valid number.")
+
+        elif choice == "7" and recommender is not None:
+            title = input("Enter song title: ")
+            if recommender.is_stale():
+                recommender.build()  # ratings changed since the last build
+            similar = recommender.similar_to_title(title, k=5)
+            if not similar:
+                print(f"😕 No recommendations for '{title}' yet (it needs ratings shared with other songs).")
+            else:
+                print(f"\n🎯 Listeners who rated '{title}' also liked:")
+                for i, (song, similarity) in enumerate(similar, 1):
+                    print(f"{i}. {song.title} by {song.artist} (similarity {similarity:.2f})")
+
         elif choice == "0":
             break
 
@@ -0,0 +1,114 @@
+# song_registry.py
+
+# this class gives every song a small integer id that never changes and is never reused
+# the other parts of PlayWise (lookup, ratings, history) store these ids instead of song
+# objects or titles, so two songs with the same title stay apart, and get() turns an id
+# back into its song with a single list index
+class SongRegistry:
+    def __init__(self):
+        self.songs = []   # song id -> song node, None once the song is removed
+        self.live = 0     # number of registered songs that haven't been removed
+
+    # gives a song its id (a song that is already registered keeps the id it has)
+    def register(self, song):
+        """
+        Time Complexity: O(1) amortized
+        Space Complexity: O(1)
+        """
+        if song.id is not None:
+            if self.get(song.id) is not song:
+                raise ValueError(f"song '{song.title}' is registered in another registry")
+            return song.id
+
+        song.id = len(self.songs)
+        self.songs.append(song)
+        self.live += 1
+        return song.id
+
+    # registers many new songs at once (used by bulk imports), returns the first new id
+    def register_many(self, songs):
+        """
+        Time Complexity: O(k), k = number of songs
+        Space Complexity: O(k)
+        """
+        first = song_id = len(self.songs)
+        for song in songs:
+            if song.id is not None:
+                raise ValueError(f"song '{song.title}' is already registered")
+            song.id = song_id
+            song_id += 1
+        self.songs.extend(songs)
+        self.live += song_id - first
+        return first
+
+    # puts a song back under the id it had before (used when a journal is replayed)
+    def restore(self, song, song_id):
+        """
+        Time Complexity: O(1) amortized
+        Space Complexity: O(1)
+        """
+        if self.get(song_id) is not None:
+            raise ValueError(f"song id {song_id} is already in use")
+        self.reserve(song_id + 1)
+        song.id = song_id
+        self.songs[song_id] = song
+        self.live += 1
+        return song_id
+
+    # makes sure the next new id is at least next_id, the ids skipped belong to removed songs
+    def reserve(self, next_id):
+        """
+        Time Complexity: O(k), k = ids skipped
+        Space Complexity: O(k)
+        """
+        if next_id > len(self.songs):
+            self.songs.extend([None] * (next_id - len(self.songs)))
+
+    # returns the song with this id, or None if there is none (or it was removed)
+    def get(self, song_id):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        if 0 <= song_id < len(self.songs):
+            return self.songs[song_id]
+        return None
+
+    # removes a song, its id keeps pointing at nothing so it can't be mistaken for another song
+    # returns the removed song, or None if the id wasn't registered
+    def remove(self, song_id):
+        """
+        Time Complexity: O(1)
+        Space Complexity: O(1)
+        """
+        song = self.get(song_id)
+        if song is not None:
+            self.songs[song_id] = None
+            self.live -= 1
+        return song
+
+    # turns an iterable of ids into their songs, skipping ids of removed songs
+    def resolve(self, song_ids):
+        """
+        Time Complexity: O(1) per id
+        Space Complexity: O(1)
+        """
+        songs = self.songs
+        for song_id in song_ids:
+            song = songs[song_id]
+            if song is not None:
+                yield song
+
+    def __len__(self):
+        return self.live
+
+    def __contains__(self, song_id):
+        return self.get(song_id) is not None
+
+    # walks every registered song in id order
+    def __iter__(self):
+        return (song for song in self.songs if song is not None)
+
+# the registry used when a Playlist, SongLookup, RatingBST or PlaybackHistory isn't given one,
+# so that by default they all agree on the same ids
+default_registry = SongRegistry()
@@ -1,41 +1,112 @@
 # sort_utils.py
 
-# this file contains the logic for sorting the playlist using Merge Sort or Quick Sort
-# user can sort by either title or duration
-# both sorting algorithms work on the doubly linked list used in the playlist
+import csv
+import heapq
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from playlist_events import REORDER
+
+# this file contains the logic for sorting the playlist using Timsort, Merge Sort or Quick Sort
+# user can sort by title, artist or duration, and Timsort also takes several keys at once
+# merge and quick sort work on the doubly linked list used in the playlist, Timsort
+# extracts the keys into a list once, sorts that, and relinks the nodes in one pass
+# the external merge sort at the bottom handles playlists that are too large for memory
+
+# the fields a playlist can be sorted by, and how the sort value is read from a song node
+SORT_FIELDS = {
+    'title': lambda node: node.title.lower(),
+    'artist': lambda node: node.artist.lower(),
+    'duration': lambda node: node.duration,
+}
+
+# the same fields for (title, artist, "mm:ss") rows, used by the external merge sort
+ROW_FIELDS = {
+    'title': lambda row: row[0].lower(),
+    'artist': lambda row: row[1].lower(),
+    'duration': lambda row: _row_seconds(row[2]),
+}
+
+EXTERNAL_RUN_SIZE = 200_000  # default number of songs held in memory per sorted run
+EXTERNAL_FAN_IN = 64         # default number of run files merged at the same time
 
 # ============================
 # PUBLIC FUNCTION TO BE CALLED
 # ============================
 
 # this function performs sorting on the playlist using the selected algorithm and field
-def sort_playlist(playlist, key='title', algorithm='merge'):
+# key is a field name ('title'), a descending field ('-duration') or a list of those
+# (e.g. ['artist', '-duration']); merge and quick sort only take a single ascending field
+def sort_playlist(playlist, key='title', algorithm='timsort'):
     """
-    Time Complexity: O(n log n), n = number of songs
-    Space Complexity: O(log n) for merge sort, O(log n) for quick sort (recursion stack)
+    Time Complexity: O(n log n), n = number of songs (also the worst case for quick sort)
+    Space Complexity: O(n) for timsort, O(1) for merge sort, O(log n) for quick sort (recursion stack)
     """
+    keys = parse_sort_keys(key)
+    if keys is None:
+        print("Invalid sort key.")
+        return
+    label = ", ".join(f"-{field}" if descending else field for field, descending in keys)
+
+    if algorithm == 'timsort':
+        timsort_playlist(playlist, keys)
+        print(f"Playlist has been sorted by {label} using {algorithm}.")
+        return
+
+    if algorithm not in ('merge', 'quick'):
+        print("Invalid sorting algorithm.")
+        return
+    if len(keys) > 1 or keys[0][1]:
+        print("Merge and quick sort only support a single ascending key. Use timsort instead.")
+        return
+    key = keys[0][0]
+
+    # the sorts walk head/next, so a pending lazy reversal is applied first
+    playlist.materialize_order()
+
     if algorithm == 'merge':
         playlist.head = merge_sort(playlist.head, key)  # call merge sort
-    elif algorithm == 'quick':
-        playlist.head = quick_sort(playlist.head, key)  # call quick sort
     else:
-        print("Invalid sorting algorithm.")
-        return
+        playlist.head = quick_sort(playlist.head, key)  # call quick sort
 
     # after sorting we fix the prev pointers and update the tail
     current = playlist.head
     prev = None
-    playlist.size = 0
 
     while current:
         current.prev = prev
         prev = current
         current = current.next
-        playlist.size += 1
 
     playlist.tail = prev
+
+    # the nodes were relinked directly, so the position index is rebuilt (also recounts size)
+    # and subscribers are told that the order changed
+    playlist.rebuild_index()
+    playlist.publish(REORDER)
     print(f"Playlist has been sorted by {key} using {algorithm} sort.")
 
+# this turns a key argument into a list of (field, descending) pairs, or None if invalid
+def parse_sort_keys(key):
+    """
+    Time Complexity: O(k), k = number of keys
+    Space Complexity: O(k)
+    """
+    if isinstance(key, str):
+        key = key.split(",")
+
+    keys = []
+    for item in key:
+        item = item.strip()
+        descending = item.startswith("-")
+        field = item.lstrip("-+")
+        if field not in SORT_FIELDS:
+            return None
+        keys.append((field, descending))
+    return keys or None
+
 # this function shows a menu for the user to choose how to sort the playlist
 def handle_sort_menu(playlist):
     while True:
@@ -44,22 +115,29 @@ def handle_sort_menu(playlist):
         print("\nSort Playlist")
         print("1. Sort by Title")
         print("2. Sort by Duration")
+        print("3. Sort by Artist")
+        print("4. Sort by Several Keys (Timsort)")
+        print("5. Show Sorted View (play order unchanged)")
+        print("6. External Sort to CSV File (large playlists)")
         print("0. Back to Main Menu")
 
         choice = input("Enter your choice: ")
 
-        if choice in ["1", "2"]:
-            key = 'title' if choice == "1" else 'duration'
+        if choice in ["1", "2", "3"]:
+            key = {"1": 'title', "2": 'duration', "3": 'artist'}[choice]
 
             print("\nChoose Sorting Algorithm")
             print("1. Merge Sort")
             print("2. Quick Sort")
+            print("3. Timsort (cached keys)")
             algo_choice = input("Enter your choice: ")
 
             if algo_choice == "1":
                 algorithm = 'merge'
             elif algo_choice == "2":
                 algorithm = 'quick'
+            elif algo_choice == "3":
+                algorithm = 'timsort'
             else:
                 print("Invalid algorithm choice.")
                 continue
@@ -67,21 +145,187 @@ def handle_sort_menu(playlist):
             sort_playlist(playlist, key=key, algorithm=algorithm)
             playlist.display()
 
+        elif choice == "4":
+            key = input("Enter keys in order, '-' for descending (e.g. artist, -duration): ")
+            sort_playlist(playlist, key=key, algorithm='timsort')
+            playlist.display()
+
+        elif choice == "5":
+            field = input("View by (title/artist/duration, '-' for descending): ").strip()
+            descending = field.startswith("-")
+            field = field.lstrip("-")
+            if field not in SORT_FIELDS:
+                print("Invalid sort key.")
+                continue
+            show_sorted_view(playlist, field, descending)
+
+        elif choice == "6":
+            key = input("Enter keys in order, '-' for descending (e.g. artist, title): ")
+            output_path = input("Enter output CSV file (default is 'sorted_playlist.csv'): ").strip()
+            try:
+                external_sort(playlist, output_path or "sorted_playlist.csv", key=key)
+            except (OSError, ValueError) as e:
+                print("External sort failed:", e)
+
         elif choice == "0":
             break
 
         else:
             print("Invalid choice. Please try again.")
 
+# this prints the playlist in sorted order using its maintained sorted view
+def show_sorted_view(playlist, field, descending=False):
+    """
+    Time Complexity: O(n) (O(n log n) the first time a view is built)
+    Space Complexity: O(1)
+    """
+    view = playlist.sorted_view(field)
+    songs = reversed(view) if descending else iter(view)
+
+    print(f"\nPlaylist: {playlist.name} (sorted view by {'-' if descending else ''}{field})")
+    print("-" * 40)
+    for index, song in enumerate(songs, 1):
+        print(f"{index}. {song.title} by {song.artist} ({song.duration // 60}:{song.duration % 60:02d})")
+    print("-" * 40)
+
+# ======================
+# TIMSORT (DECORATE-SORT-UNDECORATE)
+# ======================
+
+# this sorts the playlist with Python's built-in Timsort
+# each key is computed once per song into a column, the song positions are sorted by
+# those columns, and the nodes are relinked in the resulting order in a single pass
+def timsort_playlist(playlist, keys):
+    """
+    Time Complexity: O(k * n log n), k = number of distinct sort directions (usually 1)
+    Space Complexity: O(k * n)
+    """
+    nodes = list(playlist)  # playlist order, honoring a lazy reversal
+    columns = [[SORT_FIELDS[field](node) for node in nodes] for field, _ in keys]
+    order = list(range(len(nodes)))
+
+    if all(descending == keys[0][1] for _, descending in keys):
+        # one direction for every key: a single sort on the combined key tuples
+        combined = columns[0] if len(columns) == 1 else list(zip(*columns))
+        order.sort(key=combined.__getitem__, reverse=keys[0][1])
+    else:
+        # mixed directions: stable sorts from the last key to the first
+        for column, (_, descending) in zip(reversed(columns), reversed(keys)):
+            order.sort(key=column.__getitem__, reverse=descending)
+
+    playlist.relink(nodes[i] for i in order)
+
 # ======================
 # MERGE SORT IMPLEMENTATION
 # ======================
 
-# this is the recursive merge sort function
+# this is the bottom-up (iterative) merge sort used by sort_playlist
+# it merges runs of 1, 2, 4, ... nodes by relinking them in place, so there is no
+# recursion at all and only a handful of pointers are kept as extra space
 def merge_sort(head, key):
     """
     Time Complexity: O(n log n)
-    Space Complexity: O(log n)
+    Space Complexity: O(1)
+    """
+    if head is None or head.next is None:
+        return head
+
+    length = 0
+    current = head
+    while current:
+        length += 1
+        current = current.next
+
+    step = 1
+    while step < length:
+        current = head
+        head = None
+        tail = None
+
+        # cut the list into pairs of runs of `step` nodes and merge each pair
+        while current:
+            left = current
+            right = cut_after(left, step)
+            current = cut_after(right, step)
+
+            merged_head, merged_tail = merge_runs(left, right, key)
+            if tail:
+                tail.next = merged_head
+                merged_head.prev = tail
+            else:
+                head = merged_head
+                head.prev = None
+            tail = merged_tail
+
+        step *= 2
+
+    return head
+
+# this detaches the first `count` nodes starting at node and returns the node after them
+def cut_after(node, count):
+    """
+    Time Complexity: O(count)
+    Space Complexity: O(1)
+    """
+    for _ in range(count - 1):
+        if node is None:
+            return None
+        node = node.next
+    if node is None:
+        return None
+
+    rest = node.next
+    node.next = None
+    return rest
+
+# this merges two sorted runs iteratively and returns (head, tail) of the result
+# on ties the node from the left run goes first, which keeps the sort stable
+def merge_runs(left, right, key):
+    """
+    Time Complexity: O(n), n = nodes in both runs
+    Space Complexity: O(1)
+    """
+    if right is None:
+        tail = left
+        while tail.next:
+            tail = tail.next
+        return left, tail
+
+    if compare(left, right, key):
+        head = left
+        left = left.next
+    else:
+        head = right
+        right = right.next
+    tail = head
+
+    while left and right:
+        if compare(left, right, key):
+            tail.next = left
+            left.prev = tail
+            left = left.next
+        else:
+            tail.next = right
+            right.prev = tail
+            right = right.next
+        tail = tail.next
+
+    # one run is used up, the other one is already linked and sorted
+    rest = left or right
+    tail.next = rest
+    while rest:
+        rest.prev = tail
+        tail = rest
+        rest = rest.next
+
+    return head, tail
+
+# this is the original top-down recursive merge sort, kept for comparison in benchmarks.py
+# it recurses once per merged node, so it hits Python's recursion limit on large playlists
+def merge_sort_recursive(head, key):
+    """
+    Time Complexity: O(n log n)
+    Space Complexity: O(n) recursion stack (from merge_sorted_lists)
     """
     if head is None or head.next is None:
         return head
@@ -90,8 +334,8 @@ def merge_sort(head, key):
     left, right = split(head)
 
     # recursively sort each half
-    left = merge_sort(left, key)
-    right = merge_sort(right, key)
+    left = merge_sort_recursive(left, key)
+    right = merge_sort_recursive(right, key)
 
     # merge the sorted halves
     return merge_sorted_lists(left, right, key)
@@ -116,11 +360,11 @@ def split(head):
 
     return head, middle
 
-# this merges two sorted linked lists into one
+# this merges two sorted linked lists into one (recursive, used by merge_sort_recursive)
 def merge_sorted_lists(left, right, key):
     """
     Time Complexity: O(n)
-    Space Complexity: O(1)
+    Space Complexity: O(n) recursion stack
     """
     if not left:
         return right
@@ -147,53 +391,106 @@ def merge_sorted_lists(left, right, key):
 # ======================
 
 # this is the main quick sort function
+# it is introsort-style: median-of-three pivots, and once the recursion gets deeper than
+# 2*log2(n) the remaining sublist is handed to the merge sort, so the worst case stays O(n log n)
 def quick_sort(head, key):
     """
-    Time Complexity: O(n log n) average, O(n^2) worst case
-    Space Complexity: O(log n)
+    Time Complexity: O(n log n)
+    Space Complexity: O(log n) recursion stack
     """
-    tail = last_node(head)
-    quick_sort_recursive(head, tail, key)
+    length = 0
+    current = head
+    while current:
+        length += 1
+        current = current.next
+
+    head, _ = quick_sort_recursive(head, key, 2 * max(length, 1).bit_length())
     return head
 
-# this is the recursive quick sort helper
-def quick_sort_recursive(start, end, key):
+# this is the recursive quick sort helper, it returns (head, tail) of the sorted sublist
+# nodes are moved into less/equal/greater lists instead of swapping their fields,
+# and since every node keeps its relative order inside its list, the sort is also stable
+def quick_sort_recursive(head, key, depth_limit):
     """
-    Time Complexity: O(n log n) average, O(n^2) worst case
+    Time Complexity: O(n log n)
     Space Complexity: O(log n)
     """
-    if not start or start == end or start == end.next:
-        return
+    if head is None:
+        return None, None
+    if head.next is None:
+        return head, head
+
+    # too many unbalanced partitions, switch to the guaranteed O(n log n) sort
+    if depth_limit == 0:
+        head = merge_sort(head, key)
+        return head, last_node(head)
 
-    # partition and get pivot
-    pivot_node = partition(start, end, key)
+    pivot = sort_key(median_of_three(head, key), key)
 
-    # recursively sort left and right halves
-    if pivot_node and pivot_node.prev:
-        quick_sort_recursive(start, pivot_node.prev, key)
+    less_head = less_tail = None
+    equal_head = equal_tail = None
+    greater_head = greater_tail = None
 
-    if pivot_node and pivot_node.next:
-        quick_sort_recursive(pivot_node.next, end, key)
+    # partition: every node is unlinked and appended to one of three lists
+    current = head
+    while current:
+        next_node = current.next
+        current.next = None
+        value = sort_key(current, key)
 
-# this partitions the list and returns the pivot node
-def partition(start, end, key):
+        if value < pivot:
+            if less_tail:
+                less_tail.next = current
+            else:
+                less_head = current
+            less_tail = current
+        elif value > pivot:
+            if greater_tail:
+                greater_tail.next = current
+            else:
+                greater_head = current
+            greater_tail = current
+        else:
+            if equal_tail:
+                equal_tail.next = current
+            else:
+                equal_head = current
+            equal_tail = current
+
+        current = next_node
+
+    # the equal list already is in its final order, only the other two need sorting
+    less_head, less_tail = quick_sort_recursive(less_head, key, depth_limit - 1)
+    greater_head, greater_tail = quick_sort_recursive(greater_head, key, depth_limit - 1)
+
+    # concatenate less + equal + greater (the equal list always holds at least the pivot)
+    equal_tail.next = greater_head
+    tail = greater_tail or equal_tail
+    if less_head:
+        less_tail.next = equal_head
+        return less_head, tail
+    return equal_head, tail
+
+# this picks the median of the first, middle and last node as the pivot
+# sorted and reverse-sorted playlists then split evenly instead of degrading to O(n^2)
+def median_of_three(head, key):
     """
     Time Complexity: O(n)
     Space Complexity: O(1)
     """
-    pivot = end
-    i = start.prev
-    j = start
-
-    while j != end:
-        if compare(j, pivot, key):
-            i = i.next if i else start
-            swap_node_data(i, j)
-        j = j.next
+    slow = head
+    fast = head
+    while fast.next and fast.next.next:
+        fast = fast.next.next
+        slow = slow.next
+    last = fast.next or fast
 
-    i = i.next if i else start
-    swap_node_data(i, end)
-    return i
+    a, b, c = sort_key(head, key), sort_key(slow, key), sort_key(last, key)
+    if a <= b <= c or c <= b <= a:
+        return slow
+    if b <= a <= c or c <= a <= b:
+        return head
+    return last
 
 # helper to find the last node in the list
 def last_node(node):
@@ -205,20 +502,154 @@ def last_node(node):
         node = node.next
     return node
 
-# helper that swaps data of two nodes (doesn't change their links)
-def swap_node_data(a, b):
+# ======================
+# EXTERNAL MERGE SORT
+# ======================
+
+# this sorts songs that don't fit comfortably in memory
+# songs are read in runs of `run_size`, each run is sorted and written to a temporary CSV
+# file, and the runs are then k-way merged with a heap (heapq.merge) into `output`
+# source: a Playlist, an iterable of (title, artist, "mm:ss") rows, or a CSV file path
+# output: a CSV file path to write, or a Playlist that the sorted songs are added to
+# with workers > 0, runs are sorted and written by a process pool; at most `workers`
+# runs are in flight, so peak memory stays around (workers + 1) * run_size songs
+def external_sort(source, output, key='title', run_size=EXTERNAL_RUN_SIZE, workers=0,
+                  fan_in=EXTERNAL_FAN_IN, tmp_dir=None):
     """
-    Time Complexity: O(1)
-    Space Complexity: O(1)
+    Time Complexity: O(n log n), n = number of songs
+    Space Complexity: O(run_size * (workers + 1)) in memory, O(n) on disk
     """
-    a.title, b.title = b.title, a.title
-    a.artist, b.artist = b.artist, a.artist
-    a.duration, b.duration = b.duration, a.duration
+    keys = parse_sort_keys(key)
+    if keys is None:
+        raise ValueError(f"invalid sort key: {key!r}")
+    if any(descending != keys[0][1] for _, descending in keys):
+        raise ValueError("external sort needs every key in the same direction")
+    fields = tuple(field for field, _ in keys)
+    reverse = keys[0][1]
+    if run_size < 1 or fan_in < 2:
+        raise ValueError("run_size must be at least 1 and fan_in at least 2")
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+        runs = _write_sorted_runs(_source_rows(source), fields, reverse, run_size, workers, directory)
+
+        # merge in several passes if there are more runs than files we want open at once
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                path = os.path.join(directory, f"merge-{len(merged)}-{os.path.basename(runs[i])}")
+                _write_rows(path, _merge_runs(runs[i:i + fan_in], fields, reverse))
+                merged.append(path)
+            runs = merged
+
+        rows = _merge_runs(runs, fields, reverse)
+        if isinstance(output, str):
+            count = _write_rows(output, rows, header=True)
+            print(f"Sorted {count} songs by {', '.join(fields)} into '{output}' ({len(runs)} runs merged).")
+        else:
+            count = output.add_songs(rows)
+        return count
+
+# this turns any supported source into a stream of (title, artist, "mm:ss") rows
+def _source_rows(source):
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            for number, row in enumerate(reader):
+                if number == 0 and len(row) == 3 and row[2].strip().lower() == "duration":
+                    continue  # header row
+                if len(row) == 3:
+                    yield row
+        return
+
+    for item in source:
+        if hasattr(item, "title"):
+            yield item.title, item.artist, f"{item.duration // 60}:{item.duration % 60:02d}"
+        else:
+            yield item
+
+# this cuts the row stream into sorted run files and returns their paths in input order
+def _write_sorted_runs(rows, fields, reverse, run_size, workers, directory):
+    """
+    Time Complexity: O(n log run_size)
+    Space Complexity: O(run_size * (workers + 1))
+    """
+    rows = iter(rows)
+    paths = []
+
+    if workers <= 0:
+        while True:
+            chunk = list(islice(rows, run_size))
+            if not chunk:
+                return paths
+            paths.append(_sort_run(chunk, fields, reverse, os.path.join(directory, f"run-{len(paths)}.csv")))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        while True:
+            chunk = list(islice(rows, run_size))
+            if chunk:
+                path = os.path.join(directory, f"run-{len(paths) + len(pending)}.csv")
+                pending.append(pool.submit(_sort_run, chunk, fields, reverse, path))
+            # keep at most `workers` runs in flight so memory stays bounded
+            while pending and (len(pending) >= workers or not chunk):
+                paths.append(pending.pop(0).result())
+            if not chunk:
+                return paths
+
+# this sorts one run in memory and writes it to disk (also runs inside pool workers)
+def _sort_run(rows, fields, reverse, path):
+    rows.sort(key=_row_key(fields), reverse=reverse)
+    _write_rows(path, rows)
+    return path
+
+# this k-way merges sorted run files into one sorted stream of rows
+def _merge_runs(paths, fields, reverse):
+    files = [open(path, newline="", encoding="utf-8") for path in paths]
+    try:
+        yield from heapq.merge(*(csv.reader(file) for file in files), key=_row_key(fields), reverse=reverse)
+    finally:
+        for file in files:
+            file.close()
+
+# this writes rows to a CSV file and returns how many rows were written
+def _write_rows(path, rows, header=False):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(("title", "artist", "duration"))
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+# this builds the key function for rows from a tuple of field names
+def _row_key(fields):
+    if len(fields) == 1:
+        return ROW_FIELDS[fields[0]]
+    getters = [ROW_FIELDS[field] for field in fields]
+    return lambda row: tuple(getter(row) for getter in getters)
+
+# this converts an "mm:ss" string to seconds (0 if it is malformed)
+def _row_seconds(value):
+    minutes, sep, seconds = value.partition(":")
+    try:
+        return int(minutes) * 60 + int(seconds) if sep else 0
+    except ValueError:
+        return 0
 
 # ======================
 # COMPARISON LOGIC (COMMON FOR BOTH ALGORITHMS)
 # ======================
 
+# this returns the value a song node is sorted by for the selected key
+def sort_key(node, key):
+    """
+    Time Complexity: O(1)
+    Space Complexity: O(1)
+    """
+    return SORT_FIELDS[key](node)
+
 # this compares two song nodes based on the selected key
 def compare(a, b, key):
     """
@@ -227,4 +658,4 @@ def compare(a, b, key):
     """
     if key == 'duration':
         return a.duration <= b.duration
-    return a.title.lower() <= b.title.lower()
+    return SORT_FIELDS[key](a) <= SORT_FIELDS[key](b)
@@ -0,0 +1,133 @@
+# sorted_view.py
+
+from bisect import bisect_left, insort
+from itertools import count
+
+from sort_utils import SORT_FIELDS
+
+# this class keeps the songs of a playlist sorted by one field without touching the play order
+# it is a chunked sorted list: the entries live in many short sorted lists, and a separate
+# list holds the last entry of every chunk, so a song is found with two binary searches and
+# an insert/delete only shifts the items of one short chunk
+class SortedView:
+    LOAD = 512  # target chunk length, chunks are split when they grow past 2 * LOAD
+
+    def __init__(self, field, nodes=()):
+        self.field = field
+        self._value = SORT_FIELDS[field]   # reads the sort value from a song node
+        self._counter = count()            # tie breaker, equal values keep insertion order
+        self._entries = {}                 # song node -> its (value, seq, node) entry
+        self._chunks = []                  # sorted lists of entries
+        self._maxes = []                   # last entry of each chunk
+        self.rebuild(nodes)
+
+    # rebuilds the whole view from an iterable of song nodes
+    def rebuild(self, nodes):
+        """
+        Time Complexity: O(n log n)
+        Space Complexity: O(n)
+        """
+        value = self._value
+        entries = sorted((value(node), next(self._counter), node) for node in nodes)
+        self._entries = {entry[2]: entry for entry in entries}
+        self._chunks = [entries[i:i + self.LOAD] for i in range(0, len(entries), self.LOAD)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    # adds a song to the view
+    def add(self, node):
+        """
+        Time Complexity: O(log n + LOAD)
+        Space Complexity: O(1)
+        """
+        entry = (self._value(node), next(self._counter), node)
+        self._entries[node] = entry
+
+        if not self._chunks:
+            self._chunks.append([entry])
+            self._maxes.append(entry)
+            return
+
+        i = bisect_left(self._maxes, entry)
+        if i == len(self._maxes):
+            # larger than everything so far, goes to the end of the last chunk
+            i -= 1
+            self._chunks[i].append(entry)
+            self._maxes[i] = entry
+        else:
+            insort(self._chunks[i], entry)
+
+        chunk = self._chunks[i]
+        if len(chunk) > 2 * self.LOAD:
+            self._chunks[i:i + 1] = [chunk[:self.LOAD], chunk[self.LOAD:]]
+            self._maxes[i:i + 1] = [chunk[self.LOAD - 1], chunk[-1]]
+
+    # removes a song from the view (does nothing if the song isn't in it)
+    def remove(self, node):
+        """
+        Time Complexity: O(log n + LOAD)
+        Space Complexity: O(1)
+        """
+        entry = self._entries.pop(node, None)
+        if entry is None:
+            return
+
+        i = bisect_left(self._maxes, entry)
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, entry)
+        del chunk[j]
+
+        if not chunk:
+            del self._chunks[i]
+            del self._maxes[i]
+        elif j == len(chunk):
+            self._maxes[i] = chunk[-1]
+
+    # walks the songs from the smallest to the largest value
+    def __iter__(self):
+        for chunk in self._chunks:
+            for entry in chunk:
+                yield entry[2]
+
+    # walks the songs whose value is >= start, from the smallest up
+    # (a bare (value,) tuple sorts before every (value, seq, node) entry with the same value)
+    def iter_from(self, start):
+        """
+        Time Complexity: O(log n) to start, O(1) per song
+        Space Complexity: O(1)
+        """
+        probe = (start,)
+        i = bisect_left(self._maxes, probe)
+        if i == len(self._chunks):
+            return
+        j = bisect_left(self._chunks[i], probe)
+        while i < len(self._chunks):
+            chunk = self._chunks[i]
+            while j < len(chunk):
+                yield chunk[j][2]
+                j += 1
+            i += 1
+            j = 0
+
+    # counts the songs whose value is < value (or <= value with inclusive=True)
+    def rank(self, value, inclusive=False):
+        """
+        Time Complexity: O(log n + n / LOAD)
+        Space Complexity: O(1)
+        """
+        probe = (value, float('inf')) if inclusive else (value,)
+        i = bisect_left(self._maxes, probe)
+        if i == len(self._chunks):
+            return len(self._entries)
+        return sum(map(len, self._chunks[:i])) + bisect_left(self._chunks[i], probe)
+
+    # walks the songs from the largest to the smallest value
+    def __reversed__(self):
+        for chunk in reversed(self._chunks):
+            for entry in reversed(chunk):
+                yield entry[2]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, node):
+        return node in self._entries
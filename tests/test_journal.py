@@ -0,0 +1,100 @@
+# test_journal.py
+
+import random
+
+from journal import Journal
+from playback_history import PlaybackHistory
+from playlist_engine import Playlist
+from rating_store import RatingStore
+from song_registry import SongRegistry
+
+# opens a fresh playlist (with history and ratings) on a journal and replays it
+def open_session(path, **options):
+    registry = SongRegistry()
+    playlist = Playlist(registry=registry)
+    history = PlaybackHistory(registry)
+    store = RatingStore()
+    playlist.subscribe(store.playlist_changed)  # wired like main.py
+    journal = Journal(str(path), playlist, history, store, **options)
+    journal.open()
+    return playlist, history, store, journal
+
+def state(playlist, history, store):
+    songs = [(song.id, song.title, song.artist, song.duration, song.pinned) for song in playlist]
+    plays = [song_id for song_id, _ in history.entries_from(0)]
+    store.compact()
+    ratings = sorted((user_id, store.songs[index].id, score)
+                     for user_id, index, score in zip(store.user_ids, store.song_indexes, store.scores)
+                     if store.songs[index] is not None)
+    return songs, plays, ratings
+
+# a group that filled up in the middle of a batch used to trigger a snapshot that already held
+# the whole batch, and the rest of the batch was then replayed on top of it
+def test_compaction_waits_for_the_whole_change(tmp_path):
+    path = tmp_path / "journal"
+    playlist, history, store, journal = open_session(path, group_size=4, compact_bytes=1)
+    playlist.add_songs([("a", "x", "1:00"), ("b", "y", "2:00")])
+    with playlist.batch():
+        for i in range(30):
+            playlist.insert_song(0, f"s{i}", "z", "3:00")
+    expected = state(playlist, history, store)
+    journal.close()
+    history.close()
+
+    playlist, history, store, journal = open_session(path)
+    assert state(playlist, history, store) == expected
+    journal.close()
+    history.close()
+
+def test_reopen_round_trip_with_small_snapshots(tmp_path):
+    rng = random.Random(5)
+    path = tmp_path / "journal"
+    session = open_session(path, group_size=3, compact_bytes=512)
+    for step in range(400):
+        playlist, history, store, journal = session
+        action = rng.random()
+        if action < 0.25 or playlist.size < 3:
+            with playlist.batch():
+                for i in range(rng.randint(1, 4)):
+                    playlist.insert_song(rng.randrange(playlist.size + 1), f"s{step}.{i}", f"a{i}", "2:30")
+        elif action < 0.35:
+            playlist.move_song(rng.randrange(playlist.size), rng.randrange(playlist.size))
+        elif action < 0.45:
+            playlist.delete_song(rng.randrange(playlist.size))
+        elif action < 0.5:
+            playlist.reverse_playlist()
+        elif action < 0.6:
+            playlist.set_pinned(playlist.get(rng.randrange(playlist.size)), rng.random() < 0.7)
+        elif action < 0.8:
+            history.record_play(playlist.get(rng.randrange(playlist.size)).id)
+        else:
+            songs = [playlist.get(rng.randrange(playlist.size)) for _ in range(rng.randint(1, 5))]
+            store.add_ratings([rng.randrange(20) for _ in songs], [store.register_song(song) for song in songs],
+                              [rng.randint(1, 5) for _ in songs])
+
+        if rng.random() < 0.1:
+            expected = state(playlist, history, store)
+            journal.close()
+            history.close()
+            session = open_session(path, group_size=3, compact_bytes=512)
+            assert state(*session[:3]) == expected
+    session[3].close()
+    session[1].close()
+
+# a bulk rating import reaches the journal as one change, so it is synced once
+def test_bulk_ratings_share_one_sync(tmp_path, monkeypatch):
+    playlist, history, store, journal = open_session(tmp_path / "journal")
+    playlist.add_songs((f"s{i}", "x", "1:00") for i in range(100))
+    syncs = []
+    monkeypatch.setattr(journal, "flush", lambda flush=journal.flush: syncs.append(1) or flush())
+    songs = list(playlist)
+    store.add_ratings(range(1000), [store.register_song(songs[i % 100]) for i in range(1000)], [4] * 1000)
+    assert len(syncs) == 1
+    expected = state(playlist, history, store)
+    journal.close()
+    history.close()
+
+    playlist, history, store, journal = open_session(tmp_path / "journal")
+    assert state(playlist, history, store) == expected
+    journal.close()
+    history.close()
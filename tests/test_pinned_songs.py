@@ -0,0 +1,59 @@
+# test_pinned_songs.py
+
+import random
+
+from playlist_engine import Playlist
+from song_registry import SongRegistry
+import pinned_songs
+
+# builds a playlist from artist names and pins the songs at the given positions
+def make_playlist(artists, pinned=()):
+    playlist = Playlist(registry=SongRegistry())
+    for i, artist in enumerate(artists):
+        playlist.add_song(f"Song {i}", artist, "3:00")
+    for index in pinned:
+        playlist.set_pinned(playlist.get(index))
+    return playlist
+
+# counts the songs closer than min_gap to the previous song by the same artist
+def gap_violations(playlist, min_gap):
+    previous = {}
+    violations = 0
+    for position, song in enumerate(playlist):
+        if position - previous.get(song.artist, -min_gap - 1) <= min_gap:
+            violations += 1
+        previous[song.artist] = position
+    return violations
+
+# a probe of an artist that is then not placed used to skip its pin, so the next song by
+# that artist went right next to the pin while the shuffle reported no violations
+def test_smart_shuffle_counts_gap_next_to_pin():
+    for seed in range(20):
+        playlist = make_playlist(["a1", "a0", "a1", "a1"], pinned=[3])
+        violations = pinned_songs.smart_shuffle(playlist, 1, False, seed=seed)
+        assert [song.artist for song in playlist] == ["a1", "a0", "a1", "a1"]
+        assert violations == gap_violations(playlist, 1) == 1
+
+def test_smart_shuffle_reports_real_violations():
+    rng = random.Random(7)
+    for trial in range(500):
+        n = rng.randint(4, 30)
+        min_gap = rng.randint(1, 3)
+        artists = [f"a{rng.randrange(rng.randint(2, 6))}" for _ in range(n)]
+        pinned = rng.sample(range(n), rng.randint(0, n // 3))
+        playlist = make_playlist(artists, pinned)
+        pinned_songs_before = {index: playlist.get(index) for index in pinned}
+
+        violations = pinned_songs.smart_shuffle(playlist, min_gap, trial % 2 == 1, seed=trial)
+
+        assert violations == gap_violations(playlist, min_gap)
+        assert sorted(song.title for song in playlist) == sorted(f"Song {i}" for i in range(n))
+        for index, song in pinned_songs_before.items():
+            assert playlist.get(index) is song
+
+def test_smart_shuffle_keeps_gap_with_late_pin():
+    artists = [f"a{i % 6}" for i in range(1000)]
+    for seed in range(5):
+        playlist = make_playlist(artists, pinned=[0, 5, 17, 999])
+        assert pinned_songs.smart_shuffle(playlist, 4, False, seed=seed) == 0
+        assert gap_violations(playlist, 4) == 0
@@ -0,0 +1,36 @@
+# test_play_analytics.py
+
+import random
+
+from play_analytics import PlayAnalytics
+from playlist_engine import SongNode
+from song_registry import SongRegistry
+
+# the heap-served top-k must agree with sorting the counters, through undos, deletes and rescales
+def test_top_k_matches_the_counters():
+    rng = random.Random(3)
+    registry = SongRegistry()
+    songs = [SongNode(f"s{i}", "a", 1) for i in range(60)]
+    registry.register_many(songs)
+    for mode in ("exact", "space_saving"):
+        analytics = PlayAnalytics(registry, mode, capacity=25, half_life=50)
+        now = 0.0
+        for step in range(10000):
+            now += rng.random() * 5
+            song_id = songs[min(int(rng.expovariate(0.1)), 59)].id
+            roll = rng.random()
+            if roll < 0.1:
+                analytics.record(song_id, now, -1)
+            elif roll < 0.12:
+                analytics._forget(song_id)
+            elif roll < 0.15:
+                analytics.record_many([rng.choice(songs).id for _ in range(20)], [now] * 20)
+            else:
+                analytics.record(song_id, now)
+            if step % 37 == 0:
+                k = rng.randint(0, 12)
+                played = [(song.id, count) for song, count in analytics.top_played(k)]
+                assert played == sorted(analytics.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+                trending = [song.id for song, _ in analytics.top_trending(k, now)]
+                ranked = sorted(analytics.trending.items(), key=lambda item: (-item[1], item[0]))
+                assert trending == [song_id for song_id, _ in ranked[:k]]
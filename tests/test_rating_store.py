@@ -0,0 +1,36 @@
+# test_rating_store.py
+
+import random
+
+import rating_store
+from playlist_engine import SongNode
+from rating_store import RatingStore
+from song_rating_tree import RatingBST
+
+# refreshing one song after every rating must give the same averages as a full update_index()
+def test_update_song_rating_matches_full_update(monkeypatch):
+    monkeypatch.setattr(rating_store, "TAIL_ROWS", 5)  # rebuild the row index often
+    for with_numpy in (True, False):
+        if not with_numpy:
+            monkeypatch.setattr(rating_store, "np", None)
+        rng = random.Random(7)
+        songs = [SongNode(f"s{i}", "a", 100) for i in range(20)]
+        store = RatingStore()
+        tree = RatingBST()
+        expected = {}
+        for _ in range(1500):
+            song = rng.choice(songs)
+            if rng.random() < 0.03:
+                store.remove_song(song)
+                tree.delete_song(song)
+                expected = {key: score for key, score in expected.items() if key[1] is not song}
+                continue
+            user, score = rng.randrange(15), rng.randint(1, 5)
+            store.add_rating(user, song, score)
+            expected[(user, song)] = score
+            scores = [value for (_, rated), value in expected.items() if rated is song]
+            assert store.update_song_rating(tree, song) == round(sum(scores) / len(scores), 1)
+
+        full = RatingBST()
+        store.update_index(full)
+        assert all(full.get_rating(song) == tree.get_rating(song) for song in songs)
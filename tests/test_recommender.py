@@ -0,0 +1,36 @@
+# test_recommender.py
+
+from playlist_engine import Playlist
+from rating_store import RatingStore
+from recommender import SimilarSongs
+from song_rating_tree import RatingBST
+from song_registry import SongRegistry
+
+# three songs rated by the same listeners, so each one is similar to the other two
+def rated_playlist():
+    registry = SongRegistry()
+    playlist = Playlist(registry=registry)
+    store = RatingStore()
+    tree = RatingBST(registry)
+    playlist.subscribe(store.playlist_changed)
+    playlist.subscribe(tree.playlist_changed)
+    playlist.add_songs([("a", "x", "3:00"), ("b", "y", "3:00"), ("c", "z", "3:00")])
+    songs = list(playlist)
+    for user in range(4):
+        for song in songs:
+            store.add_rating(user, song, 3 + (user + song.id) % 3)
+    store.update_index(tree)
+    return playlist, store, tree, songs
+
+# a song deleted after build() is still in the neighbour table, but must not be returned
+def test_similar_skips_songs_dropped_after_build():
+    for with_tree in (False, True):
+        playlist, store, tree, songs = rated_playlist()
+        recommender = SimilarSongs(store, tree if with_tree else None)
+        recommender.build(k=5)
+        assert {song for song, _ in recommender.similar(songs[0])} == {songs[1], songs[2]}
+
+        playlist.delete_song(1)
+        similar = recommender.similar(songs[0])
+        assert [song for song, _ in similar] == [songs[2]]
+        assert recommender.similar(songs[1]) == []